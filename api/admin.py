@@ -1,12 +1,23 @@
-import secrets
-import string
 from django import forms
+from django.conf import settings
 from django.contrib import admin
 from django.contrib import messages
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.db.models import Q, Sum
 from django.utils.html import format_html
-from django.urls import reverse
-from django.http import HttpResponseRedirect
-from .models import ApiKey, Log
+from django.urls import path, reverse
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from . import hotids, profiling
+from .archive import search_archive
+from .constants import NATIONAL_ID_LENGTH
+from .models import (
+    ApiKey, ApiKeyUsage, DroppedLogCount, Log, NationalIDStats, ValidationJob
+)
+from .pagination import EstimatedCountPaginator, decode_cursor, encode_cursor
+
+ARCHIVE_SEARCH_LIMIT = 500
+CURSOR_VAR = 'before'
 
 
 class ApiKeyAdminForm(forms.ModelForm):
@@ -22,7 +33,7 @@ class ApiKeyAdminForm(forms.ModelForm):
 
     class Meta:
         model = ApiKey
-        fields = ['user', 'is_active']
+        fields = ['user', 'is_active', 'log_sample_rate']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -44,14 +55,36 @@ class ApiKeyAdminForm(forms.ModelForm):
 
     def _generate_api_key(self):
         """Generate secure 32-character API key"""
-        alphabet = string.ascii_letters + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(32))
+        return ApiKey.generate_key(32)
+
+
+class ArchiveSearchForm(forms.Form):
+    """Search form for archived validation logs"""
+
+    national_id = forms.CharField(max_length=14, required=False)
+    api_key_used = forms.CharField(
+        max_length=8, required=False, label='API key preview')
+    start_date = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (cleaned_data.get('national_id') or cleaned_data.get('api_key_used')):
+            raise forms.ValidationError(
+                'Enter a national ID or an API key preview')
+        start, end = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start and end and start > end:
+            raise forms.ValidationError('Start date must be before end date')
+        return cleaned_data
 
 
 @admin.register(ApiKey)
 class ApiKeyAdmin(admin.ModelAdmin):
     form = ApiKeyAdminForm
-    list_display = ['user', 'key_preview_display', 'created_at', 'is_active']
+    list_display = ['user', 'key_preview_display', 'created_at', 'is_active',
+                    'total_requests', 'total_validations']
     list_filter = ['is_active', 'created_at']
     search_fields = ['user']
 
@@ -82,6 +115,22 @@ class ApiKeyAdmin(admin.ModelAdmin):
         else:
             return base_fields
 
+    def get_queryset(self, request):
+        """Annotate usage totals from ApiKeyUsage for the list columns"""
+        return super().get_queryset(request).annotate(
+            total_requests=Sum('usage__requests'),
+            total_valid=Sum('usage__valid'),
+            total_invalid=Sum('usage__invalid'),
+        )
+
+    @admin.display(description='Requests', ordering='total_requests')
+    def total_requests(self, obj):
+        return obj.total_requests or 0
+
+    @admin.display(description='Validations')
+    def total_validations(self, obj):
+        return (obj.total_valid or 0) + (obj.total_invalid or 0)
+
     def key_preview_display(self, obj):
         """Display masked key preview"""
         return f"****{obj.key_preview}"
@@ -156,7 +205,7 @@ class ApiKeyAdmin(admin.ModelAdmin):
                 'fields': ('display_generated_key',),
                 'description': 'Copy your API key now - it cannot be retrieved later!'
             }),
-            ('Key Details', {'fields': ('user', 'is_active')}),
+            ('Key Details', {'fields': ('user', 'is_active', 'log_sample_rate')}),
             ('System Info', {
                 'fields': ('key_hash', 'encrypted_key', 'key_preview', 'created_at'),
                 'classes': ('collapse',)
@@ -166,7 +215,7 @@ class ApiKeyAdmin(admin.ModelAdmin):
     def _get_edit_fieldsets(self):
         """Fieldsets for editing existing key"""
         return (
-            (None, {'fields': ('user', 'is_active')}),
+            (None, {'fields': ('user', 'is_active', 'log_sample_rate')}),
             ('System Info', {
                 'fields': ('key_hash', 'encrypted_key', 'key_preview', 'created_at'),
                 'classes': ('collapse',)
@@ -176,7 +225,7 @@ class ApiKeyAdmin(admin.ModelAdmin):
     def _get_add_fieldsets(self):
         """Fieldsets for adding new key"""
         return (
-            (None, {'fields': ('user', 'api_key_input', 'is_active')}),
+            (None, {'fields': ('user', 'api_key_input', 'is_active', 'log_sample_rate')}),
             ('System Info', {
                 'fields': ('key_hash', 'encrypted_key', 'key_preview', 'created_at'),
                 'classes': ('collapse',)
@@ -184,19 +233,237 @@ class ApiKeyAdmin(admin.ModelAdmin):
         )
 
 
+class LogChangeList(ChangeList):
+    """Changelist with keyset pagination on the default timestamp ordering"""
+
+    keyset_ordering = ['-timestamp', '-pk']
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = decode_cursor(request.GET.get(CURSOR_VAR))
+        self.next_cursor_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, sort and page links always start again from the newest rows
+        remove = list(remove or [])
+        if CURSOR_VAR not in (new_params or {}):
+            remove.append(CURSOR_VAR)
+        return super().get_query_string(new_params, remove)
+
+    def get_queryset(self, request, exclude_parameters=None):
+        qs = super().get_queryset(request, exclude_parameters)
+        self.uses_keyset = list(qs.query.order_by) == self.keyset_ordering
+        if self.cursor and self.uses_keyset:
+            timestamp, pk = self.cursor
+            qs = qs.filter(Q(timestamp__lt=timestamp) |
+                           Q(timestamp=timestamp, pk__lt=pk))
+        # Only load what the list shows, never the extracted_data JSON
+        columns = {field.name for field in self.opts.concrete_fields}
+        return qs.only(*[name for name in self.list_display if name in columns])
+
+    def get_results(self, request):
+        if self.cursor:
+            self.page_num = 1
+        super().get_results(request)
+        if not self.uses_keyset or self.show_all:
+            return
+
+        # Evaluate the page once so the last row can seed the next cursor
+        self.result_list = list(self.result_list[:self.list_per_page])
+        if len(self.result_list) == self.list_per_page:
+            last = self.result_list[-1]
+            self.next_cursor_url = self.get_query_string(
+                {CURSOR_VAR: encode_cursor(last.timestamp, last.pk)},
+                remove=[PAGE_VAR])
+
+
 @admin.register(Log)
 class LogAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'national_id', 'valid', 'api_key_used']
     list_filter = ['valid', 'timestamp']
     search_fields = ['national_id', 'api_key_used']
+    search_help_text = 'Exact or prefix national ID, or exact API key preview'
+    date_hierarchy = 'timestamp'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['timestamp', 'national_id',
                        'valid', 'extracted_data', 'error', 'api_key_used']
 
+    def get_changelist(self, request, **kwargs):
+        return LogChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Indexed exact/prefix lookups instead of icontains scans"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            if len(term) == NATIONAL_ID_LENGTH:
+                return queryset.filter(national_id=term), False
+            # A range rather than LIKE so the index is usable on every backend;
+            # ':' sorts right after '9'
+            return queryset.filter(national_id__gte=term,
+                                   national_id__lt=term + ':'), False
+        return queryset.filter(api_key_used=term), False
+
     def has_add_permission(self, request):
         return False
 
+    def get_urls(self):
+        custom_urls = [
+            path('archive/', self.admin_site.admin_view(self.archive_search_view),
+                 name='api_log_archive'),
+            path('hot-ids/', self.admin_site.admin_view(self.hot_ids_view),
+                 name='api_log_hot_ids'),
+            path('profiles/', self.admin_site.admin_view(self.profiles_view),
+                 name='api_log_profiles'),
+            path('profiles/<str:profile_id>/', self.admin_site.admin_view(self.profile_view),
+                 name='api_log_profile'),
+            path('profiles/<str:profile_id>/download/',
+                 self.admin_site.admin_view(self.profile_download_view),
+                 name='api_log_profile_download'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def archive_search_view(self, request):
+        """Search archived log segments by national ID or key"""
+        form = ArchiveSearchForm(request.GET or None)
+        results = None
+        if form.is_valid():
+            results = list(search_archive(
+                national_id=form.cleaned_data['national_id'] or None,
+                api_key=form.cleaned_data['api_key_used'] or None,
+                start=form.cleaned_data['start_date'],
+                end=form.cleaned_data['end_date'],
+                limit=ARCHIVE_SEARCH_LIMIT,
+            ))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Search archived logs',
+            'form': form,
+            'results': results,
+            'limit': ARCHIVE_SEARCH_LIMIT,
+        }
+        return TemplateResponse(request, 'admin/api/log/archive_search.html', context)
+
+    def hot_ids_view(self, request):
+        """National IDs validated most often in the current window"""
+        changelist_url = reverse('admin:api_log_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Hot national IDs',
+            'hot_ids': [(national_id, count, f'{changelist_url}?q={national_id}')
+                        for national_id, count in hotids.hot_ids.top()],
+            'enabled': settings.HOT_ID_ENABLED,
+            'window': settings.HOT_ID_WINDOW,
+            'threshold': settings.HOT_ID_THRESHOLD,
+        }
+        return TemplateResponse(request, 'admin/api/log/hot_ids.html', context)
+
+    def profiles_view(self, request):
+        """Stored request profiles, and profiling tokens for staff"""
+        if request.method == 'POST':
+            token = profiling.make_token(request.user.get_username())
+            messages.success(request, format_html(
+                'Send <code>{}: {}</code> with API requests to profile them '
+                '(valid for {} seconds).',
+                profiling.PROFILE_HEADER, token, settings.PROFILE_TOKEN_MAX_AGE))
+            return HttpResponseRedirect(request.path)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Request profiles',
+            'profiles': profiling.list_profiles(),
+            'enabled': settings.PROFILE_ENABLED,
+            'max_files': settings.PROFILE_MAX_FILES,
+        }
+        return TemplateResponse(request, 'admin/api/log/profiles.html', context)
+
+    def profile_view(self, request, profile_id):
+        """The most expensive functions of one profiled request"""
+        info = profiling.get_profile(profile_id)
+        if info is None:
+            raise Http404("Profile not found")
+        sort = request.GET.get('sort')
+        if sort not in profiling.SORT_KEYS:
+            sort = profiling.SORT_KEYS[0]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Profile {profile_id}',
+            'profile': info,
+            'sort': sort,
+            'sort_keys': profiling.SORT_KEYS,
+            'stats': profiling.format_stats(profile_id, sort),
+        }
+        return TemplateResponse(request, 'admin/api/log/profile.html', context)
+
+    def profile_download_view(self, request, profile_id):
+        """Raw cProfile dump, for snakeviz, pstats and similar tools"""
+        if profiling.get_profile(profile_id) is None:
+            raise Http404("Profile not found")
+        return FileResponse(open(profiling.profile_path(profile_id), 'rb'),
+                            as_attachment=True, filename=f'{profile_id}.prof')
+
     def has_change_permission(self, request, obj=None):
         return True
 
     def has_delete_permission(self, request, obj=None):
         return True
+
+
+@admin.register(ValidationJob)
+class ValidationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'api_key', 'status', 'processed', 'total',
+                    'created_at', 'finished_at']
+    list_filter = ['status']
+    list_select_related = ['api_key']
+    readonly_fields = [field.name for field in ValidationJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ApiKeyUsage)
+class ApiKeyUsageAdmin(admin.ModelAdmin):
+    list_display = ['date', 'api_key', 'requests', 'valid', 'invalid', 'throttled']
+    list_filter = ['date']
+    list_select_related = ['api_key']
+    date_hierarchy = 'date'
+    readonly_fields = [field.name for field in ApiKeyUsage._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DroppedLogCount)
+class DroppedLogCountAdmin(admin.ModelAdmin):
+    list_display = ['date', 'api_key', 'outcome', 'dropped']
+    list_filter = ['outcome', 'date']
+    list_select_related = ['api_key']
+    date_hierarchy = 'date'
+    readonly_fields = [field.name for field in DroppedLogCount._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(NationalIDStats)
+class NationalIDStatsAdmin(admin.ModelAdmin):
+    list_display = ['national_id', 'api_key', 'count', 'first_seen', 'last_seen', 'last_outcome']
+    list_filter = ['last_outcome']
+    list_select_related = ['api_key']
+    search_fields = ['=national_id']
+    date_hierarchy = 'last_seen'
+    readonly_fields = [field.name for field in NationalIDStats._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+        if settings.WARMUP_ENABLED:
+            from . import warmup
+            warmup.prepare()
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from django.conf import settings
+from .models import Log
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, gzip is always available
+    zstandard = None
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx.json'
+SEGMENT_SUFFIXES = {
+    'gzip': '.jsonl.gz',
+    'zstd': '.jsonl.zst',
+}
+
+
+class ArchiveError(Exception):
+    """Raised when an archive segment cannot be written or verified."""
+
+
+def get_archive_dir() -> Path:
+    """Get the configured archive root directory."""
+    return Path(settings.LOG_ARCHIVE_DIR)
+
+
+def check_compression(compression: str) -> None:
+    """Ensure the requested compression codec is usable."""
+    if compression not in SEGMENT_SUFFIXES:
+        raise ArchiveError(f"Unknown compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ArchiveError(
+            "zstd compression requires the 'zstandard' package")
+
+
+def partition_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Get the UTC [start, end) range covered by a daily partition."""
+    start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def partition_dir(root: Path, day: date) -> Path:
+    """Get the directory holding segments for a day."""
+    return root / f"{day:%Y}" / f"{day:%m}"
+
+
+def _open(path: Path, mode: str, compression: str):
+    """Open a segment file in text mode with the given codec."""
+    if compression == 'zstd':
+        return zstandard.open(path, mode, encoding='utf-8')
+    return gzip.open(path, mode, encoding='utf-8')
+
+
+def _file_sha256(path: Path) -> str:
+    """Hash a file on disk in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Atomically write a small JSON document."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_segment(root: Path, day: date, logs: Iterable[Log],
+                  compression: str = 'gzip') -> Optional[Dict[str, Any]]:
+    """
+    Stream logs for one day into a compressed JSONL segment
+
+    The segment is written to a temporary file, re-read and checked
+    against its row count and checksum, and only then moved into place
+    next to its index. Returns the index, or None if there were no rows.
+    """
+    check_compression(compression)
+    directory = partition_dir(root, day)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f".{day.isoformat()}-{os.getpid()}.tmp"
+
+    index = {
+        'version': INDEX_VERSION,
+        'compression': compression,
+        'date': day.isoformat(),
+        'rows': 0,
+        'valid': 0,
+    }
+    api_keys = set()
+    try:
+        with _open(tmp_path, 'wt', compression) as f:
+            for log in logs:
+                record = log.to_record()
+                f.write(json.dumps(record, separators=(',', ':')))
+                f.write('\n')
+                if index['rows'] == 0:
+                    index['first_id'] = record['id']
+                    index['start'] = record['timestamp']
+                index['last_id'] = record['id']
+                index['end'] = record['timestamp']
+                index['rows'] += 1
+                index['valid'] += record['valid']
+                if record['api_key_used']:
+                    api_keys.add(record['api_key_used'])
+
+        if not index['rows']:
+            tmp_path.unlink()
+            return None
+
+        index['api_keys'] = sorted(api_keys)
+        index['sha256'] = _file_sha256(tmp_path)
+        index['bytes'] = tmp_path.stat().st_size
+        verify_segment(tmp_path, index)
+
+        name = f"{day.isoformat()}-{index['first_id']}"
+        segment_path = directory / (name + SEGMENT_SUFFIXES[compression])
+        index['segment'] = segment_path.name
+        os.replace(tmp_path, segment_path)
+        _write_json(directory / (name + INDEX_SUFFIX), index)
+        return index
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def verify_segment(path: Path, index: Dict[str, Any]) -> None:
+    """Check a segment file against its index."""
+    if _file_sha256(path) != index['sha256']:
+        raise ArchiveError(f"Checksum mismatch for {path.name}")
+
+    rows = 0
+    with _open(path, 'rt', index['compression']) as f:
+        for line in f:
+            json.loads(line)
+            rows += 1
+    if rows != index['rows']:
+        raise ArchiveError(
+            f"Row count mismatch for {path.name}: "
+            f"expected {index['rows']}, found {rows}")
+
+
+def remove_segment(root: Path, index: Dict[str, Any]) -> None:
+    """Remove a segment and its index from the archive."""
+    directory = partition_dir(root, date.fromisoformat(index['date']))
+    segment_path = directory / index['segment']
+    index_path = segment_path.with_name(
+        segment_path.name[:-len(SEGMENT_SUFFIXES[index['compression']])]
+        + INDEX_SUFFIX)
+    for path in (index_path, segment_path):
+        if path.exists():
+            path.unlink()
+
+
+def iter_segments(root: Path, start: Optional[date] = None,
+                  end: Optional[date] = None,
+                  api_key: Optional[str] = None) -> Iterator[Tuple[Path, Dict[str, Any]]]:
+    """
+    Yield (segment path, index) pairs relevant to a date range
+
+    Year and month directories outside the range are skipped without
+    being listed, and segments are filtered on their index before any
+    compressed data is read.
+    """
+    if not root.exists():
+        return
+
+    for year_dir in sorted(root.iterdir()):
+        if not year_dir.is_dir() or not year_dir.name.isdigit():
+            continue
+        year = int(year_dir.name)
+        if (start and year < start.year) or (end and year > end.year):
+            continue
+
+        for month_dir in sorted(year_dir.iterdir()):
+            if not month_dir.is_dir() or not month_dir.name.isdigit():
+                continue
+            month = (year, int(month_dir.name))
+            if ((start and month < (start.year, start.month)) or
+                    (end and month > (end.year, end.month))):
+                continue
+
+            for index_path in sorted(month_dir.glob('*' + INDEX_SUFFIX)):
+                day = date.fromisoformat(index_path.name[:10])
+                if (start and day < start) or (end and day > end):
+                    continue
+
+                with open(index_path, encoding='utf-8') as f:
+                    index = json.load(f)
+                if api_key and api_key not in index.get('api_keys', []):
+                    continue
+                yield month_dir / index['segment'], index
+
+
+def search_archive(national_id: Optional[str] = None,
+                   api_key: Optional[str] = None,
+                   start: Optional[date] = None,
+                   end: Optional[date] = None,
+                   limit: Optional[int] = None,
+                   root: Optional[Path] = None) -> Iterator[Log]:
+    """Find archived logs matching a national ID and/or key in a date range."""
+    root = root or get_archive_dir()
+    found = 0
+    for path, index in iter_segments(root, start, end, api_key):
+        with _open(path, 'rt', index['compression']) as f:
+            for line in f:
+                record = json.loads(line)
+                if national_id and record['national_id'] != national_id:
+                    continue
+                if api_key and record['api_key_used'] != api_key:
+                    continue
+                yield Log.from_record(record)
+                found += 1
+                if limit and found >= limit:
+                    return
@@ -1,9 +1,12 @@
 import logging
+from django.conf import settings
 from django.db import DatabaseError
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from .models import ApiKey
 from .constants import API_KEY_HEADER, ErrorMessages
+from .keyfilter import key_filter
+from .throttling import record_auth_failure
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +22,19 @@ class ApiKeyAuthentication(BaseAuthentication):
                 return None  # No API key provided, let other auth handle it
 
             try:
-                key_obj = ApiKey.authenticate(api_key)
+                key_hash = ApiKey.hash_key(api_key)
+                use_filter = settings.API_KEY_FILTER_ENABLED
+                if use_filter and key_filter.is_known_invalid(key_hash):
+                    # Unknown keys are rejected without a query; not logged
+                    # per attempt so floods of random keys stay cheap
+                    record_auth_failure(request)
+                    raise AuthenticationFailed(ErrorMessages.INVALID_API_KEY)
+
+                key_obj = ApiKey.authenticate_hash(key_hash)
                 if not key_obj:
+                    if use_filter:
+                        key_filter.remember_invalid(key_hash)
+                    record_auth_failure(request)
                     logger.warning(
                         f"Invalid API key attempt: {api_key[:8]}...")
                     raise AuthenticationFailed(ErrorMessages.INVALID_API_KEY)
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker tripping on the failure rate of recent calls
+
+    The last ``window`` call outcomes are kept; calls slower than
+    ``slow_call_seconds`` count as failures. Once at least ``min_calls``
+    outcomes are known and the failure rate reaches ``failure_rate`` the
+    breaker opens for ``open_seconds``, during which ``allow()`` is False.
+    After that one trial call is let through (half-open): success closes
+    the breaker, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int, min_calls: int, failure_rate: float,
+                 slow_call_seconds: float, open_seconds: float):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if (self.state == self.OPEN and
+                    time.monotonic() - self._opened_at >= self.open_seconds):
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, succeeded: bool, seconds: float) -> str:
+        """Record a call's outcome; returns the state it leaves the breaker in."""
+        ok = succeeded and seconds < self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                if ok:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return self.state
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls and
+                    failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+            return self.state
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest, Least
+from . import querybudget
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement, well under SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 100
+
+
+def bulk_increment(model, rows: List[Dict[str, Any]], unique_fields: Sequence[str],
+                   counter_fields: Sequence[str], batch_size: int = UPSERT_BATCH_SIZE,
+                   min_fields: Sequence[str] = (), max_fields: Sequence[str] = (),
+                   latest_by: Optional[str] = None) -> None:
+    """
+    Add counters to rows identified by unique_fields, creating missing rows
+
+    Each row maps the same field names (attnames for foreign keys, e.g.
+    ``api_key_id``) to values: the unique fields, the counter increments
+    and any other fields. Fields in min_fields and max_fields keep the
+    smaller or larger of the stored and new value (e.g. first and last
+    seen times); the rest overwrite the stored values, only if the row's
+    latest_by value is not older than the stored one when it is given, so
+    a late write cannot replace newer data. On SQLite and PostgreSQL every
+    batch is a single ``INSERT ... ON CONFLICT (...) DO UPDATE SET c = c +
+    EXCLUDED.c``, so concurrent writers add to each other's counts instead
+    of racing on a read-modify-write; the unique fields need a unique
+    constraint. Other databases update or create row by row.
+    """
+    if not rows:
+        return
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        _increment_rows(model, rows, unique_fields, counter_fields, min_fields, max_fields,
+                        latest_by, using)
+        return
+
+    names = list(rows[0])
+    fields = [model._meta.get_field(name) for name in names]
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ', '.join(qn(field.column) for field in fields)
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    conflict = ', '.join(qn(model._meta.get_field(name).column) for name in unique_fields)
+    # Two-argument MIN()/MAX() are scalar functions on SQLite
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+    newer = None
+    if latest_by:
+        order = qn(model._meta.get_field(latest_by).column)
+        newer = f'EXCLUDED.{order} >= {table}.{order}'
+
+    def update(name, column):
+        stored, new = f'{table}.{column}', f'EXCLUDED.{column}'
+        if name in counter_fields:
+            return f'{column} = {stored} + {new}'
+        if name in min_fields:
+            return f'{column} = {least}({stored}, {new})'
+        if name in max_fields:
+            return f'{column} = {greatest}({stored}, {new})'
+        if newer:
+            return f'{column} = CASE WHEN {newer} THEN {new} ELSE {stored} END'
+        return f'{column} = {new}'
+
+    updates = ', '.join(update(name, qn(field.column))
+                        for name, field in zip(names, fields) if name not in unique_fields)
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [field.get_db_prep_save(row[name], connection)
+                      for row in batch for name, field in zip(names, fields)]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES '
+                f'{", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params
+            )
+
+
+def _increment_rows(model, rows, unique_fields, counter_fields, min_fields, max_fields,
+                    latest_by, using):
+    with transaction.atomic(using=using):
+        for row in rows:
+            lookup = {name: row[name] for name in unique_fields}
+            changes = {}
+            for name, value in row.items():
+                if name in unique_fields:
+                    continue
+                new = Value(value, output_field=model._meta.get_field(name))
+                if name in counter_fields:
+                    changes[name] = F(name) + value
+                elif name in min_fields:
+                    changes[name] = Least(F(name), new)
+                elif name in max_fields:
+                    changes[name] = Greatest(F(name), new)
+                elif latest_by:
+                    changes[name] = Case(When(**{f'{latest_by}__lte': row[latest_by]},
+                                              then=new), default=F(name))
+                else:
+                    changes[name] = value
+            updated = model._default_manager.using(using).filter(**lookup).update(**changes)
+            if not updated:
+                model._default_manager.using(using).create(**row)
+
+
+class CounterBuffer:
+    """
+    Per-process counts added to a model's counter fields in periodic upserts
+
+    ``add(key, field=amount)`` only touches memory; every ``interval``
+    seconds (checked on add) or on ``flush()`` the pending counts are
+    written with one bulk_increment. Counts that fail to write are kept for
+    the next flush. Subclasses can add fields to each row or drop rows.
+
+    Buffers with ``value_fields`` take per-key values as well, e.g.
+    ``add(key, {'last_seen': now}, count=1)``, merged in memory the way
+    bulk_increment merges them into the database: ``min_fields`` and
+    ``max_fields`` keep the smallest or largest value, the rest the latest
+    one, or the one with the largest ``latest_by`` value when given.
+    """
+
+    def __init__(self, model, unique_fields: Sequence[str], counter_fields: Sequence[str],
+                 interval: Callable[[], float], value_fields: Sequence[str] = (),
+                 min_fields: Sequence[str] = (), max_fields: Sequence[str] = (),
+                 latest_by: Optional[str] = None):
+        self.model = model
+        self.unique_fields = list(unique_fields)
+        self.counter_fields = list(counter_fields)
+        self.value_fields = list(value_fields)
+        self.min_fields = list(min_fields)
+        self.max_fields = list(max_fields)
+        self.latest_by = latest_by
+        self.interval = interval
+        self._pending = defaultdict(Counter)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, key: Tuple, values: Optional[Dict[str, Any]] = None, **counts: int) -> None:
+        with self._lock:
+            pending = self._pending[key]
+            for field, amount in counts.items():
+                if amount:
+                    pending[field] += amount
+            if values:
+                self._merge_values(key, values)
+            if time.monotonic() - self._last_flush < self.interval():
+                return
+        self.flush()
+
+    def _merge_values(self, key, values, newer=True):
+        stored = self._values.get(key)
+        if stored is None:
+            self._values[key] = dict(values)
+            return
+        if self.latest_by:
+            newer = values[self.latest_by] >= stored[self.latest_by]
+        for field, value in values.items():
+            if field in self.min_fields:
+                stored[field] = min(stored[field], value)
+            elif field in self.max_fields:
+                stored[field] = max(stored[field], value)
+            elif newer:
+                stored[field] = value
+
+    def pending(self) -> Dict[Tuple, Dict[str, int]]:
+        with self._lock:
+            return {key: dict(counts) for key, counts in self._pending.items() if counts}
+
+    def flush(self) -> None:
+        with self._lock:
+            pending = self._pending
+            values = self._values
+            self._pending = defaultdict(Counter)
+            self._values = {}
+            self._last_flush = time.monotonic()
+        pending = {key: counts for key, counts in pending.items() if counts}
+        if not pending:
+            return
+
+        rows = [
+            {**dict(zip(self.unique_fields, key)),
+             **{field: counts.get(field, 0) for field in self.counter_fields},
+             **{field: values.get(key, {}).get(field) for field in self.value_fields},
+             **self.extra_fields()}
+            for key, counts in pending.items()
+        ]
+        try:
+            with querybudget.exempt():
+                bulk_increment(self.model, self.filter_rows(rows),
+                               unique_fields=self.unique_fields,
+                               counter_fields=self.counter_fields,
+                               min_fields=self.min_fields,
+                               max_fields=self.max_fields,
+                               latest_by=self.latest_by)
+        except DatabaseError as e:
+            logger.error(f"Failed to write {self.model.__name__} counts, will retry: {str(e)}")
+            with self._lock:
+                for key, counts in pending.items():
+                    self._pending[key].update(counts)
+                    if key in values:
+                        self._merge_values(key, values[key], newer=False)
+
+    def extra_fields(self) -> Dict[str, Any]:
+        """Non-counter values stored with every flushed row"""
+        return {}
+
+    def filter_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows to write, e.g. without those whose foreign keys were deleted"""
+        return rows
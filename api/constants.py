@@ -58,3 +58,39 @@ class ErrorMessages:
 class ResponseMessages:
     SUCCESS = 'Validation successful'
     VALIDATION_FAILED = 'National ID validation failed'
+
+# Compact response formats
+
+
+class ErrorCodes:
+    INVALID_REQUEST = 1
+    INVALID_LENGTH = 2
+    INVALID_FORMAT = 3
+    INVALID_CENTURY = 4
+    INVALID_GOVERNORATE = 5
+    INVALID_DATE_FORMAT = 6
+    FUTURE_DATE = 7
+    VALIDATION_ERROR = 8
+    VALIDATION_FAILED = 9
+    INTERNAL_ERROR = 10
+
+
+INVALID_REQUEST_MESSAGE = 'Invalid request data'
+INTERNAL_ERROR_MESSAGE = 'Internal server error'
+
+ERROR_CODES = {
+    INVALID_REQUEST_MESSAGE: ErrorCodes.INVALID_REQUEST,
+    ErrorMessages.INVALID_LENGTH: ErrorCodes.INVALID_LENGTH,
+    ErrorMessages.INVALID_FORMAT: ErrorCodes.INVALID_FORMAT,
+    ErrorMessages.INVALID_CENTURY: ErrorCodes.INVALID_CENTURY,
+    ErrorMessages.INVALID_GOVERNORATE: ErrorCodes.INVALID_GOVERNORATE,
+    ErrorMessages.INVALID_DATE_FORMAT: ErrorCodes.INVALID_DATE_FORMAT,
+    ErrorMessages.FUTURE_DATE: ErrorCodes.FUTURE_DATE,
+    ErrorMessages.VALIDATION_ERROR: ErrorCodes.VALIDATION_ERROR,
+    ResponseMessages.VALIDATION_FAILED: ErrorCodes.VALIDATION_FAILED,
+    INTERNAL_ERROR_MESSAGE: ErrorCodes.INTERNAL_ERROR,
+}
+
+GENDER_CODES = {'Male': 'M', 'Female': 'F'}
+
+GOVERNORATE_CODES_BY_NAME = {name: code for code, name in GOVERNORATE_CODES.items()}
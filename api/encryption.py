@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import logging
+from functools import lru_cache
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+ENCRYPTION_SETTINGS = ('ENCRYPTION_KEY', 'ENCRYPTION_KEYS_PREVIOUS', 'SECRET_KEY')
+
+
+def derived_key() -> bytes:
+    """Fernet key derived from SECRET_KEY, used when ENCRYPTION_KEY is not set"""
+    digest = hashlib.sha256(f'api.encryption:{settings.SECRET_KEY}'.encode()).digest()
+    return base64.urlsafe_b64encode(digest)
+
+
+@lru_cache(maxsize=None)
+def primary_cipher() -> Fernet:
+    """Fernet for the current encryption key"""
+    if settings.ENCRYPTION_KEY:
+        return Fernet(settings.ENCRYPTION_KEY)
+    logger.warning("ENCRYPTION_KEY is not set; encrypting API keys with a key "
+                   "derived from SECRET_KEY")
+    return Fernet(derived_key())
+
+
+@lru_cache(maxsize=None)
+def get_keyring() -> MultiFernet:
+    """
+    Keyring that encrypts with the current key and decrypts with any of
+    ENCRYPTION_KEY, ENCRYPTION_KEYS_PREVIOUS or the SECRET_KEY-derived key
+
+    Built once per process; the derived key stays readable so values stored
+    before ENCRYPTION_KEY was configured can still be rotated.
+    """
+    ciphers = [primary_cipher()]
+    ciphers += [Fernet(key) for key in settings.ENCRYPTION_KEYS_PREVIOUS]
+    if settings.ENCRYPTION_KEY:
+        ciphers.append(Fernet(derived_key()))
+    return MultiFernet(ciphers)
+
+
+def encrypt(value: str) -> str:
+    return get_keyring().encrypt(value.encode()).decode()
+
+
+def decrypt(token: str) -> str:
+    return get_keyring().decrypt(token.encode()).decode()
+
+
+def is_current(token: str) -> bool:
+    """Whether a token is already encrypted with the current key"""
+    try:
+        primary_cipher().decrypt(token.encode())
+    except InvalidToken:
+        return False
+    return True
+
+
+def rotate(token: str) -> str:
+    """Re-encrypt a token under the current key; raises InvalidToken if no key reads it"""
+    return get_keyring().rotate(token.encode()).decode()
+
+
+@receiver(setting_changed)
+def _reset_keyring(setting, **kwargs):
+    if setting in ENCRYPTION_SETTINGS:
+        primary_cipher.cache_clear()
+        get_keyring.cache_clear()
@@ -0,0 +1,166 @@
+import json
+import struct
+from datetime import date
+from typing import Any, Dict, List
+from .constants import ERROR_CODES, GENDER_CODES, GOVERNORATE_CODES_BY_NAME
+from .exceptions import NationalIDValidationError
+
+DATE_STYLES = ('iso', 'ordinal')
+RESULT_COLUMNS = ('national_id', 'valid', 'error', 'birth_date', 'gender', 'governorate')
+
+# Binary records: a kind byte, the national ID (empty for single responses),
+# then either the extracted fields, an error code or a JSON document
+RECORD_INVALID = 0
+RECORD_VALID = 1
+RECORD_JSON = 2
+UNKNOWN_ERROR = 0
+
+GENDER_BYTES = {'M': 1, 'F': 2}
+GENDERS_BY_BYTE = {value: key for key, value in GENDER_BYTES.items()}
+
+# Validator errors reach result payloads as str(NationalIDValidationError)
+RESULT_ERROR_CODES = {
+    **ERROR_CODES,
+    **{str(NationalIDValidationError(message)): code for message, code in ERROR_CODES.items()},
+}
+
+RESULT_ERROR_MESSAGES = {
+    str(NationalIDValidationError(message)): message for message in ERROR_CODES
+}
+
+_length = struct.Struct('!I')
+_id_length = struct.Struct('!BH')
+_extracted = struct.Struct('!iBB')
+
+
+def is_result(data: Any) -> bool:
+    """Whether data is a single validation result payload."""
+    return isinstance(data, dict) and 'valid' in data
+
+
+def is_batch(data: Any) -> bool:
+    """Whether data is a multi-ID response payload."""
+    return isinstance(data, dict) and isinstance(data.get('results'), list)
+
+
+def parse_birth_date(value: str) -> date:
+    """Parse the ``%d/%m/%Y`` birth date of a result payload."""
+    return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+
+
+def plain_error(error: str) -> str:
+    """Error message of a result payload without the ValidationError wrapping."""
+    return RESULT_ERROR_MESSAGES.get(error, error)
+
+
+def compact_result(result: Dict[str, Any], dates: str = 'iso') -> Dict[str, Any]:
+    """
+    Compact form of one validation result
+
+    Drops the redundant message and birth year, and replaces names with
+    codes: errors with ERROR_CODES (unknown messages are kept as text),
+    gender with M/F and governorate with its numeric code.
+    """
+    compact = {}
+    if 'national_id' in result:
+        compact['national_id'] = result['national_id']
+    compact['valid'] = result['valid']
+    if not result['valid']:
+        error = result.get('error')
+        compact['error'] = RESULT_ERROR_CODES.get(error, error)
+        if 'details' in result:
+            compact['details'] = result['details']
+        return compact
+
+    birth_date = parse_birth_date(result['birth_date'])
+    compact['birth_date'] = (birth_date.toordinal() if dates == 'ordinal'
+                             else birth_date.isoformat())
+    compact['gender'] = GENDER_CODES[result['gender']]
+    compact['governorate'] = int(GOVERNORATE_CODES_BY_NAME[result['governorate']])
+    return compact
+
+
+def columnar(results: List[Dict[str, Any]], dates: str = 'iso') -> Dict[str, list]:
+    """Compact results as one array per field, null where a field is absent."""
+    columns = {name: [] for name in RESULT_COLUMNS}
+    for result in results:
+        row = compact_result(result, dates)
+        for name, values in columns.items():
+            values.append(row.get(name))
+    return columns
+
+
+def compact_payload(data: Any, dates: str = 'iso') -> Any:
+    """Compact form of any API response; other payloads are returned as is."""
+    if is_batch(data):
+        return columnar(data['results'], dates)
+    if is_result(data):
+        return compact_result(data, dates)
+    return data
+
+
+def _encode_record(data: Any) -> bytes:
+    if not is_result(data) or 'details' in data:
+        return bytes([RECORD_JSON]) + json.dumps(
+            compact_payload(data), ensure_ascii=False, separators=(',', ':')).encode()
+
+    national_id = data.get('national_id', '').encode()
+    if data['valid']:
+        row = compact_result(data, 'ordinal')
+        return (_id_length.pack(RECORD_VALID, len(national_id)) + national_id +
+                _extracted.pack(row['birth_date'], GENDER_BYTES[row['gender']],
+                                row['governorate']))
+
+    error = data.get('error')
+    code = RESULT_ERROR_CODES.get(error, UNKNOWN_ERROR)
+    message = (error or '').encode() if code == UNKNOWN_ERROR else b''
+    return (_id_length.pack(RECORD_INVALID, len(national_id)) + national_id +
+            bytes([code]) + message)
+
+
+def encode_binary(data: Any) -> bytes:
+    """
+    Length-prefixed binary form of an API response
+
+    A record count followed by that many length-prefixed records: one per
+    ID for multi-ID responses, a single record otherwise. All integers are
+    big-endian; see decode_binary for the record layout.
+    """
+    results = data['results'] if is_batch(data) else [data]
+    records = [_encode_record(result) for result in results]
+    parts = [_length.pack(len(records))]
+    for record in records:
+        parts.append(_length.pack(len(record)))
+        parts.append(record)
+    return b''.join(parts)
+
+
+def decode_binary(content: bytes) -> List[Any]:
+    """Decode encode_binary output into compact results with ordinal dates."""
+    (count,) = _length.unpack_from(content)
+    offset = _length.size
+    decoded = []
+    for _ in range(count):
+        (size,) = _length.unpack_from(content, offset)
+        offset += _length.size
+        record = content[offset:offset + size]
+        offset += size
+
+        if record[0] == RECORD_JSON:
+            decoded.append(json.loads(record[1:]))
+            continue
+        kind, id_size = _id_length.unpack_from(record)
+        position = _id_length.size + id_size
+        row = {}
+        if id_size:
+            row['national_id'] = record[_id_length.size:position].decode()
+        row['valid'] = kind == RECORD_VALID
+        if kind == RECORD_VALID:
+            ordinal, gender, governorate = _extracted.unpack_from(record, position)
+            row.update(birth_date=ordinal, gender=GENDERS_BY_BYTE[gender],
+                       governorate=governorate)
+        else:
+            code = record[position]
+            row['error'] = code if code != UNKNOWN_ERROR else record[position + 1:].decode() or None
+        decoded.append(row)
+    return decoded
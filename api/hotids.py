@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'hot_ids:'
+WORKERS_KEY = CACHE_PREFIX + 'workers'
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class CountMinSketch:
+    """
+    Fixed-memory frequency estimates: never under the true count
+
+    ``depth`` rows of ``width`` counters; an item increments one counter per
+    row and its estimate is the smallest of them. Row positions come from
+    two halves of one blake2b digest (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, width: int, depth: int, counts: Optional[array] = None):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else array('Q', [0]) * (width * depth)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, item: str, amount: int = 1) -> int:
+        """Count an item; returns its new estimate."""
+        counts = self.counts
+        estimate = None
+        for position in self._positions(item):
+            counts[position] += amount
+            if estimate is None or counts[position] < estimate:
+                estimate = counts[position]
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        counts = self.counts
+        return min(counts[position] for position in self._positions(item))
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        """Add another sketch of the same dimensions into this one."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge sketches of different dimensions")
+        self.counts = array('Q', map(int.__add__, self.counts, other.counts))
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth, 'counts': self.counts.tobytes()}
+
+    @classmethod
+    def from_dict(cls, data) -> 'CountMinSketch':
+        counts = array('Q')
+        counts.frombytes(data['counts'])
+        return cls(data['width'], data['depth'], counts)
+
+
+class HotIDTracker:
+    """
+    Most frequently validated national IDs in the current time window
+
+    Each process counts IDs in its own sketch and keeps the HOT_ID_TOP_K
+    IDs with the highest estimates. Every HOT_ID_PUBLISH_INTERVAL seconds
+    it stores both in the cache under its own key and reads back the other
+    processes' sketches, so ``is_hot()`` answers for all workers without a
+    cache round trip. Windows of HOT_ID_WINDOW seconds are aligned to the
+    clock, so every process starts a new one at the same time.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def after_fork(self) -> None:
+        """Start over as a new process, e.g. a worker forked from a preloaded master."""
+        self.worker_id = default_worker_id()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._start_window(self._window())
+            self._last_publish = time.monotonic()
+
+    def _window(self) -> int:
+        return int(time.time() // settings.HOT_ID_WINDOW)
+
+    def _new_sketch(self) -> CountMinSketch:
+        return CountMinSketch(settings.HOT_ID_SKETCH_WIDTH, settings.HOT_ID_SKETCH_DEPTH)
+
+    def _start_window(self, window: int) -> None:
+        self.window = window
+        self.sketch = self._new_sketch()
+        self._others = None
+        self._top: Dict[str, int] = {}
+        self._floor = 0
+
+    def record(self, national_id: str) -> None:
+        """Count one validation of an ID."""
+        with self._lock:
+            window = self._window()
+            if window != self.window:
+                self._start_window(window)
+            estimate = self.sketch.add(national_id)
+            top = self._top
+            if national_id in top or len(top) < settings.HOT_ID_TOP_K:
+                top[national_id] = estimate
+                if len(top) == settings.HOT_ID_TOP_K and not self._floor:
+                    self._floor = min(top.values())
+            elif estimate > self._floor:
+                # Counts only grow within a window, so the floor may be
+                # stale (too low); check the current minimum before evicting
+                lowest = min(top, key=top.get)
+                self._floor = top[lowest]
+                if estimate > self._floor:
+                    del top[lowest]
+                    top[national_id] = estimate
+                    self._floor = min(top.values())
+            if time.monotonic() - self._last_publish < settings.HOT_ID_PUBLISH_INTERVAL:
+                return
+        self.publish()
+
+    def publish(self) -> None:
+        """Share this process's counts and pick up the other processes'."""
+        with self._lock:
+            self._last_publish = time.monotonic()
+            snapshot = {'window': self.window, 'top': dict(self._top),
+                        **self.sketch.to_dict()}
+        try:
+            cache.set(CACHE_PREFIX + self.worker_id, snapshot,
+                      timeout=2 * settings.HOT_ID_WINDOW)
+            self._register()
+            snapshots = self._snapshots(snapshot['window'], exclude=self.worker_id)
+        except Exception as e:
+            logger.warning(f"Could not share hot ID counts: {str(e)}")
+            return
+
+        others = self._merge(snapshots)
+        with self._lock:
+            if self.window == snapshot['window']:
+                self._others = others
+
+    def _register(self) -> None:
+        """
+        Add this process to the set of workers in the cache, on every publish
+
+        The set is read and written back without a lock, which the cache API
+        does not offer, so a concurrent registration or pruning can drop a
+        worker. Checking again on every publish puts it back: the other
+        processes miss its counts for at most HOT_ID_PUBLISH_INTERVAL.
+        """
+        workers = cache.get(WORKERS_KEY) or set()
+        if self.worker_id not in workers:
+            cache.set(WORKERS_KEY, workers | {self.worker_id}, timeout=None)
+
+    def _snapshots(self, window: int, exclude: Optional[str] = None) -> List[dict]:
+        workers = cache.get(WORKERS_KEY) or set()
+        keys = [CACHE_PREFIX + worker for worker in workers if worker != exclude]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            # Forget processes whose snapshots expired; like _register()
+            # this can race, and a live worker dropped here registers again
+            alive = {key[len(CACHE_PREFIX):] for key in found}
+            if exclude in workers:
+                alive.add(exclude)
+            cache.set(WORKERS_KEY, alive, timeout=None)
+        return [snapshot for snapshot in found.values()
+                if snapshot['window'] == window and
+                (snapshot['width'], snapshot['depth']) == (self.sketch.width, self.sketch.depth)]
+
+    def _merge(self, snapshots) -> Optional[CountMinSketch]:
+        if not snapshots:
+            return None
+        merged = CountMinSketch.from_dict(snapshots[0])
+        for snapshot in snapshots[1:]:
+            merged.merge(CountMinSketch.from_dict(snapshot))
+        return merged
+
+    def estimate(self, national_id: str) -> int:
+        """Validations of an ID in the current window across all processes"""
+        with self._lock:
+            if self.window != self._window():
+                return 0
+            count = self.sketch.estimate(national_id)
+            if self._others is not None:
+                count += self._others.estimate(national_id)
+            return count
+
+    def is_hot(self, national_id: str) -> bool:
+        """
+        Whether an ID was validated at least HOT_ID_THRESHOLD times this window
+
+        Cheap enough for the request path, e.g. as a cache admission policy
+        that only stores results for IDs requested over and over. Counts
+        from other processes are at most HOT_ID_PUBLISH_INTERVAL seconds old.
+        """
+        return self.estimate(national_id) >= settings.HOT_ID_THRESHOLD
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        The most validated IDs of the current window across all processes
+
+        Candidates are every process's top IDs, ranked by their estimate in
+        the merged sketch.
+        """
+        self.publish()
+        with self._lock:
+            window = self.window
+        snapshots = self._snapshots(window)
+        merged = self._merge(snapshots)
+        if merged is None:
+            return []
+        candidates = set()
+        for snapshot in snapshots:
+            candidates.update(snapshot['top'])
+        ranked = sorted(((national_id, merged.estimate(national_id))
+                         for national_id in candidates), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit or settings.HOT_ID_TOP_K]
+
+
+hot_ids = HotIDTracker()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=hot_ids.after_fork)
+
+
+def record(national_id: str) -> None:
+    if settings.HOT_ID_ENABLED:
+        hot_ids.record(national_id)
+
+
+def is_hot(national_id: str) -> bool:
+    return settings.HOT_ID_ENABLED and hot_ids.is_hot(national_id)
+
+
+@receiver(setting_changed)
+def _reset_hot_ids(setting, **kwargs):
+    if setting.startswith('HOT_ID_'):
+        hot_ids.reset()
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+from django.conf import settings
+from django.utils import timezone
+from .constants import NATIONAL_ID_LENGTH
+from .models import ApiKey, NationalIDStats
+from .sampling import outcome
+from .usage import ApiKeyCounterBuffer
+
+_buffer = ApiKeyCounterBuffer(
+    NationalIDStats, ['national_id', 'api_key_id'], ['count'],
+    interval=lambda: settings.NATIONAL_ID_STATS_FLUSH_INTERVAL,
+    value_fields=['first_seen', 'last_seen', 'last_outcome'],
+    min_fields=['first_seen'], max_fields=['last_seen'], latest_by='last_seen',
+)
+
+
+def record(national_id: str, result, api_key: Optional[ApiKey],
+           when: Optional[datetime] = None) -> None:
+    """
+    Count a validation in NationalIDStats when NATIONAL_ID_STATS_ENABLED
+
+    Repeated validations of an ID only add to an in-memory counter; the
+    pairs seen since the last flush are upserted at most every
+    NATIONAL_ID_STATS_FLUSH_INTERVAL seconds.
+    """
+    if not settings.NATIONAL_ID_STATS_ENABLED or not isinstance(api_key, ApiKey):
+        return
+    when = when or timezone.now()
+    _buffer.add((national_id[:NATIONAL_ID_LENGTH], api_key.pk),
+                {'first_seen': when, 'last_seen': when, 'last_outcome': outcome(result)},
+                count=1)
+
+
+def flush() -> None:
+    """Write this process's buffered ID stats to the database now."""
+    _buffer.flush()
@@ -0,0 +1,245 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .logsinks import write_logs
+from .models import Log, ValidationJob
+from .renderers import FastJSONRenderer
+from .services import batch_result, build_log, validate_national_id
+from . import hotids, idstats, sampling, usage
+
+logger = logging.getLogger(__name__)
+
+RESULT_BLOCK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_recovery = 0.0
+
+
+def job_dir(job: ValidationJob) -> Path:
+    """Directory holding a job's input and result chunks."""
+    return Path(settings.JOB_DIR) / str(job.pk)
+
+
+def input_path(job: ValidationJob) -> Path:
+    return job_dir(job) / 'input.txt'
+
+
+def chunk_path(job: ValidationJob, index: int) -> Path:
+    return job_dir(job) / 'results' / f'chunk-{index:06d}.jsonl'
+
+
+def write_input(job: ValidationJob, national_ids: Iterable[str]) -> int:
+    """Store submitted IDs one per line, returning how many were stored."""
+    path = input_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for national_id in national_ids:
+            # One line per ID, whatever whitespace the submitted value held
+            national_id = ' '.join(national_id.split())
+            if national_id:
+                f.write(national_id)
+                f.write('\n')
+                total += 1
+        f.flush()
+        os.fsync(f.fileno())
+    return total
+
+
+def read_uploaded_ids(uploaded_file) -> Iterator[str]:
+    """National IDs from an uploaded text/CSV file, one per line (first column)."""
+    for line in uploaded_file:
+        yield line.decode('utf-8', 'replace').split(',', 1)[0].strip().strip('"')
+
+
+def remove_job_files(job: ValidationJob) -> None:
+    shutil.rmtree(job_dir(job), ignore_errors=True)
+
+
+def _write_chunk(path: Path, lines: Iterable[bytes]) -> None:
+    """Atomically write one result chunk."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _claimable(now) -> Q:
+    """Pending jobs and running jobs whose worker stopped reporting."""
+    stale = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    return (Q(status=ValidationJob.Status.PENDING) |
+            Q(status=ValidationJob.Status.RUNNING, heartbeat_at__lt=stale))
+
+
+def claim_job(job_id, worker: str) -> bool:
+    """Take a claimable job for one worker, returning whether it succeeded."""
+    now = timezone.now()
+    return ValidationJob.objects.filter(_claimable(now), pk=job_id).update(
+        status=ValidationJob.Status.RUNNING, worker=worker, heartbeat_at=now,
+        started_at=Coalesce(F('started_at'), now)) == 1
+
+
+def process_chunk(job: ValidationJob, worker: str) -> bool:
+    """
+    Validate the next chunk of a job and commit it
+
+    The chunk's results are written to disk first, then its logs and the
+    job's progress are committed together, so a crashed worker leaves at
+    most an uncommitted chunk file that the next worker overwrites. With
+    logs routed to a separate database the two commits are not atomic and
+    a crash between them can log one chunk twice.
+
+    Returns False if another worker has taken the job over.
+    """
+    index = job.chunks_done
+    with open(input_path(job), 'rb') as f:
+        f.seek(job.input_offset)
+        national_ids = []
+        for _ in range(job.chunk_size):
+            line = f.readline()
+            if not line:
+                break
+            national_ids.append(line.decode('utf-8').rstrip('\n'))
+        offset = f.tell()
+    if not national_ids:
+        raise ValueError(f"Input ended after {job.processed} of {job.total} IDs")
+
+    results = [(national_id, validate_national_id(national_id))
+               for national_id in national_ids]
+    renderer = FastJSONRenderer()
+    _write_chunk(chunk_path(job, index),
+                 (renderer.render(batch_result(national_id, result)) + b'\n'
+                  for national_id, result in results))
+
+    # Only decided here; hot IDs, stats and dropped counts are recorded once
+    # the chunk is committed, so a discarded or redone chunk counts once
+    in_sample = [sampling.is_logged(national_id, result, job.api_key)
+                 for national_id, result in results]
+    logs = [build_log(national_id, result, job.api_key)
+            for (national_id, result), sampled in zip(results, in_sample) if sampled]
+    valid_count = sum(result.is_valid for _, result in results)
+    invalid_count = len(results) - valid_count
+    now = timezone.now()
+
+    with transaction.atomic(using=router.db_for_write(ValidationJob)):
+        updated = ValidationJob.objects.filter(
+            pk=job.pk, worker=worker, chunks_done=index
+        ).update(
+            chunks_done=F('chunks_done') + 1,
+            input_offset=offset,
+            processed=F('processed') + len(results),
+            valid_count=F('valid_count') + valid_count,
+            invalid_count=F('invalid_count') + invalid_count,
+            heartbeat_at=now
+        )
+        if not updated:
+            return False
+        if logs:
+            with transaction.atomic(using=router.db_for_write(Log)):
+                write_logs(logs)
+
+    usage.record(job.api_key, valid=valid_count, invalid=invalid_count)
+    for (national_id, result), sampled in zip(results, in_sample):
+        hotids.record(national_id)
+        idstats.record(national_id, result, job.api_key, when=now)
+        if not sampled:
+            sampling.count_dropped(result, job.api_key)
+    job.chunks_done = index + 1
+    job.input_offset = offset
+    job.processed += len(results)
+    job.valid_count += valid_count
+    job.invalid_count += invalid_count
+    job.heartbeat_at = now
+    return True
+
+
+def run_job(job_id) -> bool:
+    """Claim a job and process its remaining chunks, returning True when done."""
+    worker = uuid.uuid4().hex
+    if not claim_job(job_id, worker):
+        return False
+    try:
+        job = ValidationJob.objects.select_related('api_key').get(pk=job_id)
+        while job.processed < job.total:
+            if not process_chunk(job, worker):
+                logger.warning(f"Validation job {job_id} was taken over by another worker")
+                return False
+        ValidationJob.objects.filter(pk=job_id, worker=worker).update(
+            status=ValidationJob.Status.COMPLETED, finished_at=timezone.now())
+        logger.info(f"Validation job {job_id} completed: {job.processed} IDs")
+        return True
+    except Exception as e:
+        logger.error(f"Validation job {job_id} failed: {str(e)}", exc_info=True)
+        ValidationJob.objects.filter(pk=job_id, worker=worker).update(
+            status=ValidationJob.Status.FAILED, error=str(e),
+            finished_at=timezone.now())
+        return False
+
+
+def claimable_job_ids() -> list:
+    """IDs of jobs a worker could claim now, oldest first."""
+    return list(ValidationJob.objects.filter(_claimable(timezone.now()))
+                .order_by('created_at').values_list('pk', flat=True))
+
+
+def _run_in_pool(job_id) -> bool:
+    try:
+        return run_job(job_id)
+    finally:
+        # Pool threads own their connections; don't leave them open
+        connections.close_all()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS,
+                                           thread_name_prefix='validation-job')
+        return _executor
+
+
+def enqueue(job_id) -> None:
+    """
+    Run a job on this process's worker pool
+
+    Also picks up jobs left behind by crashed workers, at most once per
+    JOB_STALE_AFTER. With JOB_WORKERS = 0 the job runs inline.
+    """
+    global _last_recovery
+    if settings.JOB_WORKERS <= 0:
+        run_job(job_id)
+        return
+
+    executor = _get_executor()
+    executor.submit(_run_in_pool, job_id)
+    now = time.monotonic()
+    if now - _last_recovery >= settings.JOB_STALE_AFTER:
+        _last_recovery = now
+        for stale_id in claimable_job_ids():
+            if stale_id != job_id:
+                executor.submit(_run_in_pool, stale_id)
+
+
+def iter_results(job: ValidationJob, chunks: Optional[int] = None) -> Iterator[bytes]:
+    """Stream the committed result chunks of a job as JSON lines."""
+    chunks = job.chunks_done if chunks is None else chunks
+    for index in range(chunks):
+        with open(chunk_path(job, index), 'rb') as f:
+            yield from iter(lambda: f.read(RESULT_BLOCK_SIZE), b'')
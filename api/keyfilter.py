@@ -0,0 +1,213 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics, querybudget
+from .models import ApiKey
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'api_key_filter:generation'
+FILTER_KEY = 'api_key_filter:data'
+MIN_BITS = 1024
+# Each hash function reads 8 hex digits (32 bits) of the SHA-256 key hash
+HASH_DIGITS = 8
+MAX_HASHES = 64 // HASH_DIGITS
+
+REJECTED = 'api_key_filter_rejected'
+NEGATIVE_CACHE_HITS = 'api_key_negative_cache_hits'
+DB_LOOKUPS = 'api_key_db_lookups'
+FALSE_POSITIVES = 'api_key_filter_false_positives'
+REBUILDS = 'api_key_filter_rebuilds'
+METRIC_NAMES = [REJECTED, NEGATIVE_CACHE_HITS, DB_LOOKUPS, FALSE_POSITIVES, REBUILDS]
+
+
+class BloomFilter:
+    """Bloom filter over SHA-256 hex digests, using slices of the digest as hashes"""
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytearray] = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        """Size a filter for ``capacity`` items at the given false positive rate."""
+        capacity = max(capacity, 1)
+        size = max(MIN_BITS, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = min(MAX_HASHES, max(1, round(size / capacity * math.log(2))))
+        return cls(size, hashes)
+
+    def _positions(self, key_hash: str):
+        for i in range(self.hashes):
+            yield int(key_hash[i * HASH_DIGITS:(i + 1) * HASH_DIGITS], 16) % self.size
+
+    def add(self, key_hash: str) -> None:
+        for position in self._positions(key_hash):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key_hash: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key_hash))
+
+    def to_dict(self):
+        return {'size': self.size, 'hashes': self.hashes, 'bits': bytes(self.bits)}
+
+    @classmethod
+    def from_dict(cls, data) -> 'BloomFilter':
+        return cls(data['size'], data['hashes'], bytearray(data['bits']))
+
+
+def build_filter(key_hashes: Iterable[str]) -> BloomFilter:
+    key_hashes = list(key_hashes)
+    bloom = BloomFilter.for_capacity(len(key_hashes), settings.API_KEY_FILTER_ERROR_RATE)
+    for key_hash in key_hashes:
+        bloom.add(key_hash)
+    return bloom
+
+
+class KeyFilter:
+    """
+    Per-process view of the active API key hashes
+
+    The filter is shared through the cache together with a generation
+    number that every ApiKey change bumps; each process compares its copy
+    against the shared generation at most every API_KEY_FILTER_CHECK_INTERVAL
+    seconds and reloads it, from the cache when another process already
+    rebuilt it, otherwise from the database. Hashes that passed the filter
+    but matched no active key are remembered in a bounded LRU until the
+    filter is next reloaded. With a per-process cache the filter only
+    rejects keys in that LRU (see is_known_invalid).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._generation = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._negative = OrderedDict()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._bloom = None
+            self._generation = None
+            self._negative.clear()
+
+    def _current(self) -> BloomFilter:
+        now = time.monotonic()
+        bloom = self._bloom
+        if (bloom is not None and
+                now - self._checked_at < settings.API_KEY_FILTER_CHECK_INTERVAL and
+                now - self._built_at < settings.API_KEY_FILTER_MAX_AGE):
+            return bloom
+
+        with self._lock:
+            generation = cache.get(GENERATION_KEY, 0)
+            if (self._bloom is None or generation != self._generation or
+                    now - self._built_at >= settings.API_KEY_FILTER_MAX_AGE):
+                self._load(generation)
+                self._built_at = now
+            self._checked_at = now
+            return self._bloom
+
+    def _load(self, generation: int) -> None:
+        shared = cache.get(FILTER_KEY)
+        if (shared and shared['generation'] == generation and
+                time.time() - shared['built_at'] < settings.API_KEY_FILTER_MAX_AGE):
+            self._bloom = BloomFilter.from_dict(shared)
+        else:
+            with querybudget.exempt():
+                key_hashes = list(
+                    ApiKey.objects.filter(is_active=True).values_list('key_hash', flat=True))
+            self._bloom = build_filter(key_hashes)
+            logger.info(f"Rebuilt API key filter: {len(key_hashes)} keys, "
+                        f"{self._bloom.size} bits, {self._bloom.hashes} hashes")
+            cache.set(FILTER_KEY, {**self._bloom.to_dict(), 'generation': generation,
+                                   'built_at': time.time()}, timeout=None)
+            metrics.increment(REBUILDS)
+        # Also cleared on rebuilds: without a shared cache they are the
+        # only way this process learns of keys created elsewhere
+        self._negative.clear()
+        self._generation = generation
+
+    def warm(self) -> None:
+        """Build the filter now, so requests and other processes find it ready."""
+        self._current()
+
+    def stats(self):
+        bloom = self._current()
+        with self._lock:
+            return {
+                'generation': self._generation,
+                'bits': bloom.size,
+                'hashes': bloom.hashes,
+                'bits_set': sum(bin(byte).count('1') for byte in bloom.bits),
+                'negative_cache_size': len(self._negative),
+            }
+
+    def is_known_invalid(self, key_hash: str) -> bool:
+        """
+        True if no active key can have this hash; never touches the database.
+
+        Without a shared cache, keys created by other processes are missing
+        from this process's filter until its next rebuild, so a filter miss
+        is not trusted and only the negative cache rejects.
+        """
+        if key_hash not in self._current() and cache_is_shared():
+            metrics.increment(REJECTED)
+            return True
+        with self._lock:
+            if key_hash in self._negative:
+                self._negative.move_to_end(key_hash)
+                metrics.increment(NEGATIVE_CACHE_HITS)
+                return True
+        metrics.increment(DB_LOOKUPS)
+        return False
+
+    def remember_invalid(self, key_hash: str) -> None:
+        """Record a hash the database had no active key for."""
+        if key_hash in self._current():
+            metrics.increment(FALSE_POSITIVES)
+        with self._lock:
+            self._negative[key_hash] = True
+            self._negative.move_to_end(key_hash)
+            while len(self._negative) > settings.API_KEY_NEGATIVE_CACHE_SIZE:
+                self._negative.popitem(last=False)
+
+
+key_filter = KeyFilter()
+
+
+# Cache backends private to each process; the filter cannot be shared through them
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared() -> bool:
+    """Whether filter invalidations reach other processes through the default cache"""
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES
+
+
+def invalidate_key_filter() -> None:
+    """
+    Make every process rebuild its filter; call after changing API keys.
+
+    Other processes only see this through a shared cache (cache_is_shared());
+    otherwise they rebuild after API_KEY_FILTER_MAX_AGE, but do not reject
+    keys missing from their filter meanwhile.
+    """
+    try:
+        if not cache.add(GENERATION_KEY, 1, timeout=None):
+            cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+    cache.delete(FILTER_KEY)
+    key_filter.reset()
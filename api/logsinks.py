@@ -0,0 +1,488 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Sequence
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import metrics
+from .breaker import CircuitBreaker
+from .models import Log
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SUFFIX = '.jsonl.part'
+ROTATED_SUFFIX = '.jsonl'
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+BREAKER_OPENED = 'log_breaker_opened'
+SPILLED = 'log_entries_spilled'
+REPLAYED = 'log_entries_replayed'
+METRIC_NAMES = [BREAKER_OPENED, SPILLED, REPLAYED]
+
+# Seconds the spill backlog read from disk is reused for
+SPILL_CHECK_INTERVAL = 1.0
+
+
+class LogSink:
+    """Destination for validation log entries"""
+
+    def write(self, logs: Sequence[Log]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist anything buffered."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def queue_depth(self) -> int:
+        """Entries accepted but not yet persisted where they belong"""
+        return 0
+
+
+class DatabaseLogSink(LogSink):
+    """Insert log entries into the Log table (in the log database if routed)"""
+
+    def write(self, logs):
+        using = router.db_for_write(Log)
+        if transaction.get_connection(using).in_atomic_block:
+            # A savepoint keeps a failed insert from breaking the caller's transaction
+            with transaction.atomic(using=using):
+                self._insert(logs)
+        else:
+            self._insert(logs)
+
+    def _insert(self, logs):
+        if len(logs) == 1:
+            logs[0].save()
+        elif logs:
+            Log.objects.bulk_create(logs)
+
+
+class NullLogSink(LogSink):
+    """Discard log entries, e.g. to benchmark without logging costs"""
+
+    def write(self, logs):
+        pass
+
+
+class FanOutLogSink(LogSink):
+    """Write every entry to several sinks; one failing does not stop the others"""
+
+    def __init__(self, sinks: Sequence[LogSink]):
+        self.sinks = list(sinks)
+
+    def _each(self, method, *args):
+        errors = []
+        for sink in self.sinks:
+            try:
+                getattr(sink, method)(*args)
+            except Exception as e:
+                logger.error(f"Log sink {type(sink).__name__} failed: {str(e)}")
+                errors.append(e)
+        if errors and len(errors) == len(self.sinks):
+            raise errors[0]
+
+    def write(self, logs):
+        self._each('write', logs)
+
+    def flush(self):
+        self._each('flush')
+
+    def close(self):
+        self._each('close')
+
+    def queue_depth(self):
+        return sum(sink.queue_depth() for sink in self.sinks)
+
+
+class JSONLFileLogSink(LogSink):
+    """
+    Append log entries as JSON lines to local files for later import
+
+    Entries are buffered in memory and appended every flush_interval
+    seconds or buffer_rows entries. Each process writes its own
+    ``*.jsonl.part`` file, renamed to ``*.jsonl`` once it reaches max_bytes
+    or max_age seconds; only renamed files are complete and picked up by
+    ``import_logs``. The fsync policy trades durability for speed:
+    ``always`` writes and syncs every entry, ``interval`` syncs on each
+    flush and ``never`` leaves syncing to the OS. Up to flush_interval
+    seconds of entries can be lost if the process dies without closing
+    the sink.
+    """
+
+    def __init__(self, directory, max_bytes: int, max_age: float, fsync: str = 'interval',
+                 flush_interval: float = 1.0, buffer_rows: int = 1000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.buffer_rows = 1 if fsync == 'always' else buffer_rows
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._sequence = 0
+        self._last_flush = time.monotonic()
+        # Bytes already counted and their line count, per file (by inode)
+        self._line_counts = {}
+
+    def write(self, logs):
+        lines = []
+        for log in logs:
+            if log.timestamp is None:
+                log.timestamp = timezone.now()
+            lines.append(json.dumps(log.to_record(), separators=(',', ':')) + '\n')
+        with self._lock:
+            self._buffer.extend(lines)
+            if (len(self._buffer) >= self.buffer_rows or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._rotate()
+
+    def queue_depth(self):
+        return len(self._buffer)
+
+    def backlog(self) -> int:
+        """
+        Entries written to disk but not yet picked up
+
+        Counts the rotated files of every process sharing the directory and
+        this sink's own unrotated file. Files are append-only, so only bytes
+        added since the last call are read.
+        """
+        with self._lock:
+            paths = [self._path] if self._path is not None else []
+        paths.extend(self.directory.glob(f'*{ROTATED_SUFFIX}'))
+        counts = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+                size, inode = stat.st_size, stat.st_ino
+                counted, lines = self._line_counts.get(inode, (0, 0))
+                if size < counted:
+                    counted, lines = 0, 0
+                if size > counted:
+                    with open(path, 'rb') as f:
+                        f.seek(counted)
+                        while chunk := f.read(1024 * 1024):
+                            lines += chunk.count(b'\n')
+                            counted += len(chunk)
+            except FileNotFoundError:
+                continue  # Rotated, claimed or replayed meanwhile
+            counts[inode] = (counted, lines)
+        self._line_counts = counts
+        return sum(lines for _, lines in counts.values())
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is not None and (
+                self._file.tell() >= self.max_bytes or
+                time.monotonic() - self._opened_at >= self.max_age):
+            self._rotate()
+        if self._file is None:
+            self._open()
+        self._file.write(''.join(self._buffer))
+        self._buffer.clear()
+        self._file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        name = (f"logs-{timezone.now():%Y%m%dT%H%M%S%f}-{socket.gethostname()}-"
+                f"{os.getpid()}-{self._sequence}")
+        self._path = self.directory / (name + ACTIVE_SUFFIX)
+        self._file = open(self._path, 'a', encoding='utf-8')
+        self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path, self._path.with_name(
+            self._path.name[:-len(ACTIVE_SUFFIX)] + ROTATED_SUFFIX))
+        self._file = None
+        self._path = None
+
+
+class CircuitBreakerLogSink(LogSink):
+    """
+    Protect a sink with a circuit breaker and spill to local files meanwhile
+
+    Writes that fail or are slow trip the breaker; while it is open entries
+    go straight to JSONL spill files instead of waiting on the sink. Failed
+    writes are spilled too, so nothing is lost. Rotated spill files (from
+    any process) are claimed by renaming them and replayed into the sink,
+    one transaction per file, whenever the breaker lets a call through:
+    after a successful write, and every replay_interval seconds from a
+    background thread so recovery does not wait for traffic that load
+    shedding may be turning away.
+    """
+
+    def __init__(self, sink: LogSink, breaker: CircuitBreaker, spill: JSONLFileLogSink,
+                 replay_interval: float, replay_in_background: bool = True):
+        self.sink = sink
+        self.breaker = breaker
+        self.spill = spill
+        self.replay_interval = replay_interval
+        self.replay_in_background = replay_in_background
+        self._lock = threading.Lock()
+        self._in_progress = 0
+        self._replaying = False
+        self._backlog = 0
+        self._backlog_checked = None
+        self._replayer_pid = None
+        self._closed = threading.Event()
+
+    def write(self, logs):
+        if not self.breaker.allow():
+            self._spill(logs)
+            return
+
+        with self._lock:
+            self._in_progress += 1
+        start = time.monotonic()
+        try:
+            self.sink.write(logs)
+        except Exception as e:
+            logger.error(f"Log sink failed, spilling {len(logs)} entries: {str(e)}")
+            self._record(False, start)
+            self._spill(logs)
+            return
+        finally:
+            with self._lock:
+                self._in_progress -= 1
+
+        if self._record(True, start) == CircuitBreaker.CLOSED and self.spill_backlog():
+            self._maybe_replay()
+
+    def _record(self, succeeded, start):
+        state = self.breaker.record(succeeded, time.monotonic() - start)
+        if state == CircuitBreaker.OPEN:
+            metrics.increment(BREAKER_OPENED)
+            logger.warning(f"Log sink breaker open for {self.breaker.open_seconds}s; "
+                           f"spilling log entries to {self.spill.directory}")
+        return state
+
+    def _spill(self, logs):
+        self.spill.write(logs)
+        self.spill.flush()
+        with self._lock:
+            self._backlog_checked = None
+        metrics.increment(SPILLED, len(logs))
+        self._start_replayer()
+
+    def spill_backlog(self) -> int:
+        """
+        Spilled entries waiting on disk, rechecked every SPILL_CHECK_INTERVAL seconds
+
+        Read from the spill directory rather than counted per process, so
+        files replayed by any process stop counting.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if (self._backlog_checked is not None and
+                    now - self._backlog_checked < SPILL_CHECK_INTERVAL):
+                return self._backlog
+            self._backlog_checked = now
+        backlog = self.spill.backlog()
+        with self._lock:
+            self._backlog = backlog
+        if backlog:
+            self._start_replayer()
+        return backlog
+
+    def _start_replayer(self):
+        """Start the periodic replay thread, once per process (it does not survive a fork)"""
+        if not self.replay_in_background:
+            return
+        with self._lock:
+            if self._replayer_pid == os.getpid() or self._closed.is_set():
+                return
+            self._replayer_pid = os.getpid()
+        threading.Thread(target=self._replay_periodically, name='log-spill-replay',
+                         daemon=True).start()
+
+    def _replay_periodically(self):
+        while not self._closed.wait(self.replay_interval):
+            self.replay_pending()
+
+    def replay_pending(self) -> None:
+        """Replay spill files waiting on disk, unless a replay is already running"""
+        try:
+            if self.spill_backlog():
+                self._maybe_replay(in_background=False)
+        except Exception as e:
+            logger.error(f"Replaying spilled logs failed: {str(e)}")
+
+    def _maybe_replay(self, in_background=None):
+        with self._lock:
+            if self._replaying:
+                return
+            self._replaying = True
+        if self.replay_in_background if in_background is None else in_background:
+            threading.Thread(target=self._replay, daemon=True).start()
+        else:
+            self._replay()
+
+    def _replay(self):
+        try:
+            self.replay()
+        finally:
+            with self._lock:
+                self._replaying = False
+
+    def replay(self) -> int:
+        """
+        Write spilled entries back into the sink; returns how many were replayed.
+
+        Each file goes through the breaker: replay stops at the first failure
+        or when the breaker is not letting calls through.
+        """
+        replayed = 0
+        try:
+            self.spill.close()
+            claim = f'.replaying-{os.getpid()}'
+            for path in sorted(self.spill.directory.glob(f'*{ROTATED_SUFFIX}')):
+                claimed = path.with_name(path.name + claim)
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue  # Claimed by another process
+                if not self.breaker.allow():
+                    os.replace(claimed, path)
+                    break
+                with open(claimed, encoding='utf-8') as f:
+                    logs = [Log.from_record(json.loads(line)) for line in f if line.strip()]
+                try:
+                    with transaction.atomic(using=router.db_for_write(Log)):
+                        self.sink.write(logs)
+                except Exception as e:
+                    os.replace(claimed, path)
+                    logger.error(f"Replaying spilled logs from {path} failed: {str(e)}")
+                    self._record(False, time.monotonic())
+                    break
+                # A whole file is expected to take longer than one request's
+                # write, so only its success counts, not its duration
+                self._record(True, time.monotonic())
+                claimed.unlink()
+                replayed += len(logs)
+        finally:
+            with self._lock:
+                self._backlog_checked = None
+        if replayed:
+            metrics.increment(REPLAYED, replayed)
+            logger.info(f"Replayed {replayed} spilled log entries")
+        return replayed
+
+    def flush(self):
+        self.sink.flush()
+        self.spill.flush()
+
+    def close(self):
+        self._closed.set()
+        self.sink.close()
+        self.spill.close()
+
+    def queue_depth(self):
+        return (self._in_progress + self.sink.queue_depth() + self.spill.queue_depth() +
+                self.spill_backlog())
+
+
+def jsonl_sink() -> JSONLFileLogSink:
+    return JSONLFileLogSink(
+        settings.LOG_SINK_DIR,
+        max_bytes=settings.LOG_SINK_MAX_BYTES,
+        max_age=settings.LOG_SINK_MAX_AGE,
+        fsync=settings.LOG_SINK_FSYNC,
+        flush_interval=settings.LOG_SINK_FLUSH_INTERVAL,
+        buffer_rows=settings.LOG_SINK_BUFFER_ROWS,
+    )
+
+
+SINKS = {
+    'database': DatabaseLogSink,
+    'jsonl': jsonl_sink,
+    'null': NullLogSink,
+}
+
+
+@lru_cache(maxsize=None)
+def get_log_sink() -> LogSink:
+    """
+    The sink named by LOG_SINK, built once per process
+
+    LOG_SINK holds one or more comma-separated names from SINKS or dotted
+    paths to LogSink factories; several sinks are combined in a fan-out,
+    and unless LOG_BREAKER_ENABLED is off the result is wrapped in a
+    CircuitBreakerLogSink.
+    """
+    sinks = []
+    for name in settings.LOG_SINK.split(','):
+        name = name.strip()
+        factory = SINKS.get(name) or import_string(name)
+        sinks.append(factory())
+    sink = sinks[0] if len(sinks) == 1 else FanOutLogSink(sinks)
+    if not settings.LOG_BREAKER_ENABLED:
+        return sink
+    return CircuitBreakerLogSink(
+        sink,
+        CircuitBreaker(
+            window=settings.LOG_BREAKER_WINDOW,
+            min_calls=settings.LOG_BREAKER_MIN_CALLS,
+            failure_rate=settings.LOG_BREAKER_FAILURE_RATE,
+            slow_call_seconds=settings.LOG_BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.LOG_BREAKER_OPEN_SECONDS,
+        ),
+        JSONLFileLogSink(settings.LOG_SPILL_DIR, max_bytes=settings.LOG_SINK_MAX_BYTES,
+                         max_age=settings.LOG_SINK_MAX_AGE, buffer_rows=1),
+        replay_interval=settings.LOG_SPILL_REPLAY_INTERVAL,
+    )
+
+
+def write_logs(logs: Sequence[Log]) -> None:
+    get_log_sink().write(logs)
+
+
+def log_queue_depth() -> int:
+    """Log entries in this process, or spilled by any process, waiting to be persisted"""
+    if not get_log_sink.cache_info().currsize:
+        return 0
+    return get_log_sink().queue_depth()
+
+
+def close_log_sink() -> None:
+    if get_log_sink.cache_info().currsize:
+        get_log_sink().close()
+
+
+@receiver(setting_changed)
+def _reset_log_sink(setting, **kwargs):
+    if setting.startswith(('LOG_SINK', 'LOG_BREAKER', 'LOG_SPILL')):
+        close_log_sink()
+        get_log_sink.cache_clear()
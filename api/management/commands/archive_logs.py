@@ -0,0 +1,116 @@
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from api.archive import (
+    SEGMENT_SUFFIXES, ArchiveError, check_compression, get_archive_dir,
+    partition_bounds, remove_segment, write_segment
+)
+from api.models import Log
+
+
+class Command(BaseCommand):
+    help = 'Move old validation logs into compressed, time-partitioned archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int,
+                            default=settings.LOG_ARCHIVE_AFTER_DAYS,
+                            help='Archive logs older than this many days')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per database round trip')
+        parser.add_argument('--segment-size', type=int, default=100000,
+                            help='Maximum rows per segment file')
+        parser.add_argument('--compression', choices=sorted(SEGMENT_SUFFIXES),
+                            default=settings.LOG_ARCHIVE_COMPRESSION,
+                            help='Segment compression codec')
+        parser.add_argument('--output-dir', type=str, default=None,
+                            help='Archive root (defaults to LOG_ARCHIVE_DIR)')
+        parser.add_argument('--keep', action='store_true',
+                            help='Write segments without deleting the archived rows')
+
+    def handle(self, *args, **options):
+        compression = options['compression']
+        try:
+            check_compression(compression)
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        root = Path(options['output_dir']) if options['output_dir'] else get_archive_dir()
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        pending = Log.objects.filter(timestamp__lt=cutoff)
+
+        cursor = None
+        segments = rows = 0
+        while True:
+            remaining = pending
+            if cursor:
+                remaining = remaining.filter(self._after(cursor))
+
+            first = remaining.order_by('timestamp', 'pk').values_list(
+                'timestamp', flat=True).first()
+            if first is None:
+                break
+
+            # Segments never span a UTC day so readers can prune by date
+            day = first.astimezone(dt_timezone.utc).date()
+            _, day_end = partition_bounds(day)
+            window = remaining.filter(
+                timestamp__lt=min(day_end, cutoff)
+            ).order_by('timestamp', 'pk')[:options['segment_size']]
+
+            last = {}
+
+            def track(logs):
+                for log in logs:
+                    last['cursor'] = (log.timestamp, log.pk)
+                    yield log
+
+            try:
+                index = write_segment(
+                    root, day, track(window.iterator(chunk_size=options['chunk_size'])),
+                    compression)
+            except ArchiveError as e:
+                raise CommandError(str(e))
+            if index is None:
+                break
+
+            if not options['keep']:
+                self._delete_rows(root, remaining, last['cursor'], index)
+
+            cursor = last['cursor']
+            segments += 1
+            rows += index['rows']
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Archived {index['rows']} logs to {index['segment']}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Archived {rows} logs into {segments} segments under {root}'
+            )
+        )
+
+    @staticmethod
+    def _after(cursor):
+        """Rows strictly after a (timestamp, pk) position."""
+        timestamp, pk = cursor
+        return Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+
+    def _delete_rows(self, root, remaining, cursor, index):
+        """Delete exactly the rows written to a verified segment."""
+        timestamp, pk = cursor
+        archived = remaining.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lte=pk))
+        try:
+            with transaction.atomic(using=router.db_for_write(Log)):
+                deleted, _ = archived.delete()
+                if deleted != index['rows']:
+                    raise ArchiveError(
+                        f"Deleted {deleted} rows but archived {index['rows']} "
+                        f"in {index['segment']}")
+        except ArchiveError as e:
+            remove_segment(root, index)
+            raise CommandError(str(e))
@@ -0,0 +1,194 @@
+import json
+import math
+import queue
+import secrets
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from http.client import HTTPConnection
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connections
+from django.urls import reverse
+from django.utils import timezone
+from api import warmup
+from api.constants import API_KEY_HEADER
+from api.models import ApiKey, Log
+from api.throttling import limits_disabled
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    Serves connections from a fixed set of worker threads, like a threaded
+    application server, so each thread keeps its database connection between
+    requests and CONN_MAX_AGE and the connection pool are exercised
+    """
+
+    def start_workers(self, count):
+        self._requests = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(count)]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                # At the request boundary, as Django's handler does on
+                # request_finished: drop connections past CONN_MAX_AGE or broken
+                close_old_connections()
+        connections.close_all()
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Benchmark a validation endpoint through a local WSGI server. '
+            'Creates a temporary API key and its logs; run against a staging database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Number of measured requests')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Number of client threads')
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='Unmeasured requests sent first')
+        parser.add_argument('--url-name', type=str, default='national_id',
+                            help='URL name of the endpoint to benchmark')
+        parser.add_argument('--national-id', type=str, default='30307020102113',
+                            help='National ID sent in every request')
+        parser.add_argument('--no-throttle', action='store_true',
+                            help='Turn off the API key rate limit, client throttling and load '
+                                 'shedding, which one address and key would otherwise hit')
+        parser.add_argument('--json', action='store_true',
+                            help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        if options['warmup'] < 0:
+            raise CommandError("--warmup must not be negative")
+
+        api_key = secrets.token_hex(16)
+        key_obj = ApiKey(user='benchmark')
+        key_obj.set_key(api_key)
+        key_obj.save()
+        started_at = timezone.now()
+
+        # Started like wsgi.py does, so first_request_ms shows what a freshly
+        # deployed worker's first client sees
+        application = get_wsgi_application()
+        if settings.WARMUP_ENABLED:
+            warmup.warm_up(application)
+        server = make_server('127.0.0.1', 0, application,
+                             server_class=PooledWSGIServer,
+                             handler_class=QuietRequestHandler)
+        server.start_workers(options['concurrency'])
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        request = {
+            'port': server.server_port,
+            'path': reverse(options['url_name']),
+            'body': json.dumps({'national_id': options['national_id']}),
+            'headers': {API_KEY_HEADER: api_key, 'Content-Type': 'application/json'},
+        }
+        try:
+            with limits_disabled() if options['no_throttle'] else nullcontext():
+                first_request = self._run(request, 1, 1)[0][0]
+                self._run(request, options['warmup'], 1)
+                started = time.perf_counter()
+                latencies, statuses = self._run(
+                    request, options['requests'], options['concurrency'])
+                elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+            Log.objects.filter(api_key_used=key_obj.key_preview,
+                               national_id=options['national_id'],
+                               timestamp__gte=started_at).delete()
+            key_obj.delete()
+
+        latencies.sort()
+        results = {
+            'url': request['path'],
+            'requests': len(latencies),
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p95_ms': round(self._percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(self._percentile(latencies, 0.99) * 1000, 3),
+            'statuses': dict(statuses),
+            'first_request_ms': round(first_request * 1000, 3),
+            'max_rss_mb': warmup.max_rss_mb(),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for name, value in results.items():
+                self.stdout.write(f'{name}: {value}')
+
+    def _percentile(self, latencies, fraction):
+        """Nearest-rank percentile of sorted latencies"""
+        index = math.ceil(len(latencies) * fraction) - 1
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+    def _run(self, request, total, concurrency):
+        """Send requests from worker threads, returning latencies and statuses."""
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+        remaining = iter(range(total))
+
+        def worker():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                connection = HTTPConnection('127.0.0.1', request['port'])
+                start = time.perf_counter()
+                connection.request('POST', request['path'], body=request['body'],
+                                   headers=request['headers'])
+                response = connection.getresponse()
+                response.read()
+                latency = time.perf_counter() - start
+                connection.close()
+                with lock:
+                    latencies.append(latency)
+                    statuses[response.status] += 1
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, statuses
@@ -1,25 +1,53 @@
-import secrets
-import string
-from django.core.management.base import BaseCommand
+import csv
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.keyfilter import invalidate_key_filter, key_filter
 from api.models import ApiKey
 
+BULK_BATCH_SIZE = 1000
+
 
 class Command(BaseCommand):
-    help = 'Create a new API key'
+    help = ('Create a new API key, or many at once with --count or --from-file, '
+            'writing the keys to a new --output file readable only by its owner')
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'user', type=str, help='User identifier for the API key')
+            'user', type=str, nargs='?', help='User identifier for the API key')
         parser.add_argument('--length', type=int, default=32,
                             help='Length of the API key')
+        parser.add_argument('--count', type=int,
+                            help='Create this many keys for the user')
+        parser.add_argument('--from-file',
+                            help='Create one key per user identifier in this file, one per line')
+        parser.add_argument('--output',
+                            help='New CSV file to write "user,api_key" rows to (bulk mode)')
 
     def handle(self, *args, **options):
         user = options['user']
         length = options['length']
 
+        if options['count'] is None and not options['from_file']:
+            if not user:
+                raise CommandError('Give a user, --count or --from-file')
+            self._create_one(user, length)
+            return
+
+        users = self._bulk_users(user, options['count'], options['from_file'])
+        if not options['output']:
+            raise CommandError('--output is required when creating keys in bulk')
+        created = self._create_many(users, length, options['output'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {created} API keys; they are in {options["output"]} and '
+                f'cannot be retrieved again'
+            )
+        )
+
+    def _create_one(self, user, length):
         # Generate secure random API key
-        api_key = ''.join(secrets.choice(string.ascii_letters + string.digits)
-                          for _ in range(length))
+        api_key = ApiKey.generate_key(length)
 
         # Create API key object
         key_obj = ApiKey(user=user)
@@ -33,3 +61,56 @@ class Command(BaseCommand):
                 f'Store this key securely - it cannot be retrieved again!'
             )
         )
+
+    def _bulk_users(self, user, count, path):
+        if count is not None:
+            if path or not user:
+                raise CommandError('--count needs a user and cannot be combined with --from-file')
+            if count < 1:
+                raise CommandError('--count must be positive')
+            return [user] * count
+
+        if user:
+            raise CommandError('--from-file cannot be combined with a user argument')
+        with open(path, encoding='utf-8') as f:
+            users = [line.strip() for line in f if line.strip()]
+        max_length = ApiKey._meta.get_field('user').max_length
+        too_long = [u for u in users if len(u) > max_length]
+        if too_long:
+            raise CommandError(f'User identifiers longer than {max_length} characters: '
+                               f'{", ".join(too_long[:5])}')
+        if not users:
+            raise CommandError(f'No user identifiers in {path}')
+        return users
+
+    def _create_many(self, users, length, output):
+        """Insert keys with bulk_create and write them to output in the same transaction"""
+        try:
+            fd = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            raise CommandError(f'{output} already exists; keys are only written to a new file')
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f, transaction.atomic():
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(['user', 'api_key'])
+                for start in range(0, len(users), BULK_BATCH_SIZE):
+                    key_objs = []
+                    for user in users[start:start + BULK_BATCH_SIZE]:
+                        api_key = ApiKey.generate_key(length)
+                        key_obj = ApiKey(user=user)
+                        key_obj.set_key(api_key)
+                        key_objs.append(key_obj)
+                        writer.writerow([user, api_key])
+                    ApiKey.objects.bulk_create(key_objs)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(output)
+            raise
+
+        # bulk_create sends no signals; rebuild the key filter for the new keys
+        invalidate_key_filter()
+        key_filter.warm()
+        return len(users)
+
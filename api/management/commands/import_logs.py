@@ -0,0 +1,63 @@
+import json
+from itertools import islice
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from api.logsinks import ROTATED_SUFFIX
+from api.models import Log
+
+IMPORTED_DIR = 'imported'
+
+
+class Command(BaseCommand):
+    help = ('Bulk-load rotated JSONL files written by the jsonl log sink into the Log table. '
+            'Each file is loaded in one transaction and then moved to an "imported" '
+            'subdirectory (or deleted with --delete).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Files or directories to import (defaults to LOG_SINK_DIR)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per bulk insert')
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete files once imported instead of moving them')
+
+    def handle(self, *args, **options):
+        files = []
+        for path in map(Path, options['paths'] or [settings.LOG_SINK_DIR]):
+            if path.is_dir():
+                files.extend(sorted(path.glob(f'*{ROTATED_SUFFIX}')))
+            elif path.is_file():
+                files.append(path)
+            else:
+                raise CommandError(f'{path} does not exist')
+
+        total = 0
+        for path in files:
+            rows = self._import_file(path, options['chunk_size'])
+            self._done(path, options['delete'])
+            total += rows
+            self.stdout.write(f'Imported {rows} logs from {path}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} logs from {len(files)} files'))
+
+    def _import_file(self, path, chunk_size):
+        rows = 0
+        with open(path, encoding='utf-8') as f, \
+                transaction.atomic(using=router.db_for_write(Log)):
+            records = (json.loads(line) for line in f if line.strip())
+            while True:
+                chunk = [Log.from_record(record) for record in islice(records, chunk_size)]
+                if not chunk:
+                    break
+                Log.objects.bulk_create(chunk)
+                rows += len(chunk)
+        return rows
+
+    def _done(self, path, delete):
+        if delete:
+            path.unlink()
+            return
+        imported_dir = path.parent / IMPORTED_DIR
+        imported_dir.mkdir(exist_ok=True)
+        path.replace(imported_dir / path.name)
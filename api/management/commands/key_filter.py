@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from api import metrics
+from django.conf import settings
+from api.keyfilter import METRIC_NAMES, cache_is_shared, invalidate_key_filter, key_filter
+
+
+class Command(BaseCommand):
+    help = 'Show the API key filter and its rejection counters, or force a rebuild'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Rebuild the filter in every process from the database')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            invalidate_key_filter()
+            self.stdout.write(self.style.SUCCESS('API key filter invalidated'))
+            if not cache_is_shared():
+                self.stderr.write(self.style.WARNING(
+                    f"CACHES['default'] is private to each process, so running servers "
+                    f"only rebuild their filter after API_KEY_FILTER_MAX_AGE "
+                    f"({settings.API_KEY_FILTER_MAX_AGE}s) and check keys missing from it "
+                    f"against the database. Configure a shared cache backend for the "
+                    f"filter to reject unknown keys without a query."))
+
+        for name, value in key_filter.stats().items():
+            self.stdout.write(f'{name}: {value}')
+        for name, value in metrics.get_counts(METRIC_NAMES).items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api import partitions
+from api.partitions import PartitionError
+
+
+class Command(BaseCommand):
+    help = ('Convert the validation log table to monthly partitions, create upcoming '
+            'partitions and drop expired ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Partition the existing log table (run once, with '
+                                 'writers stopped)')
+        parser.add_argument('--months-ahead', type=int,
+                            default=settings.LOG_PARTITION_MONTHS_AHEAD,
+                            help='Months after the current one to create partitions for')
+        parser.add_argument('--retention-months', type=int,
+                            default=settings.LOG_PARTITION_RETENTION_MONTHS,
+                            help='Drop partitions older than this many whole months '
+                                 '(0 keeps everything)')
+        parser.add_argument('--database', default=None,
+                            help='Database alias (defaults to where logs are routed)')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            if options['convert']:
+                first = partitions.convert(using, options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'Partitioned the log table; existing rows stay in '
+                    f'{partitions.LEGACY_TABLE}, new ones start at {first:%Y-%m}'))
+            else:
+                for month in partitions.ensure_partitions(using, options['months_ahead']):
+                    self.stdout.write(f'Created partition {partitions.partition_name(month)}')
+
+            if options['retention_months'] > 0:
+                before = partitions.month_of(timezone.now())
+                for _ in range(options['retention_months']):
+                    before = partitions.previous_month(before)
+                for name in partitions.drop_partitions(before, using):
+                    self.stdout.write(f'Dropped partition {name}')
+        except PartitionError as e:
+            raise CommandError(str(e))
+
+        months = partitions.partitions(using)
+        legacy = ' (plus legacy rows)' if partitions.has_legacy_table(using) else ''
+        self.stdout.write(
+            f'{len(months)} partitions from {months[0]:%Y-%m} to {months[-1]:%Y-%m}{legacy}')
@@ -0,0 +1,196 @@
+import gc
+import json
+import os
+import platform
+import secrets
+import sys
+import tracemalloc
+from array import array
+from contextlib import ExitStack
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from django.utils import timezone
+from api.constants import API_KEY_HEADER
+from api.exceptions import NationalIDValidationError
+from api.models import ApiKey, Log
+from api.serializers import NationalIDSerializer
+from api.throttling import limits_disabled
+from api.validators import validate_and_extract
+from api.warmup import wsgi_request
+
+STAGES = ['validator', 'serializer', 'view']
+
+
+class Command(BaseCommand):
+    help = ('Measure memory per validation with tracemalloc through the validator, the '
+            'serializer and the full view, and look for growth across rounds. Prints JSON. '
+            'The view stage creates a temporary API key and its logs; run against a '
+            'staging database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Validations per round')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Measured rounds; memory still growing after the first '
+                                 'points to a leak')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Untraced validations run first, to fill caches')
+        parser.add_argument('--stages', type=str, default=','.join(STAGES),
+                            help='Comma-separated stages to measure')
+        parser.add_argument('--national-id', type=str, default='30307020102113',
+                            help='National ID validated in every request')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Source lines listed per stage')
+        parser.add_argument('--leak-threshold', type=float, default=64,
+                            help='Bytes per request retained by every round after the '
+                                 'first to report a suspected leak')
+        parser.add_argument('--no-throttle', action='store_true',
+                            help='Turn off the API key rate limit, client throttling and load '
+                                 'shedding, which the view stage would otherwise hit')
+        parser.add_argument('--output', type=str,
+                            help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        stages = [stage.strip() for stage in options['stages'].split(',') if stage.strip()]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise CommandError(f"Unknown stages: {', '.join(sorted(unknown))} "
+                               f"(choose from {', '.join(STAGES)})")
+        if options['rounds'] < 2:
+            raise CommandError("--rounds must be at least 2 to detect growth")
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        report = {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'national_id': options['national_id'],
+            'iterations': options['iterations'],
+            'rounds': options['rounds'],
+            'stages': {},
+        }
+        with ExitStack() as stack:
+            if options['no_throttle']:
+                stack.enter_context(limits_disabled())
+            for stage in stages:
+                run = getattr(self, f'_{stage}_runner')(stack, options['national_id'])
+                report['stages'][stage] = self._measure(run, options)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def _validator_runner(self, stack, national_id):
+        def run():
+            try:
+                validate_and_extract(national_id)
+            except NationalIDValidationError:
+                pass  # Invalid IDs are measured too
+        return run
+
+    def _serializer_runner(self, stack, national_id):
+        def run():
+            NationalIDSerializer(data={'national_id': national_id}).is_valid()
+        return run
+
+    def _view_runner(self, stack, national_id):
+        """POSTs through the whole middleware and view stack"""
+        api_key = secrets.token_hex(16)
+        key_obj = ApiKey(user='profile_memory')
+        key_obj.set_key(api_key)
+        key_obj.save()
+        started_at = timezone.now()
+        stack.callback(key_obj.delete)
+        stack.callback(lambda: Log.objects.filter(api_key_used=key_obj.key_preview,
+                                                  timestamp__gte=started_at).delete())
+        # Calls the WSGI handler as a server would; the test client keeps
+        # per-request signal receivers around and would show up as a leak
+        application = get_wsgi_application()
+        path = reverse('national_id')
+        body = json.dumps({'national_id': national_id}).encode()
+        headers = {API_KEY_HEADER: api_key}
+
+        def run():
+            status = wsgi_request(application, 'POST', path, body, headers)
+            if not status.startswith(('2', '4')):
+                raise CommandError(f"{path} returned {status}")
+        return run
+
+    def _measure(self, run, options):
+        """Peak and retained traced memory of a stage over several rounds"""
+        iterations, rounds = options['iterations'], options['rounds']
+        for _ in range(options['warmup']):
+            run()
+        # Preallocated so recording results allocates nothing while tracing
+        peaks = array('q', bytes(8 * iterations * rounds))
+        retained = array('q', bytes(8 * rounds))
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline = self._snapshot()
+            baseline_size = self._size(baseline)
+            first = last = None
+            for round_index in range(rounds):
+                for i in range(iterations):
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    run()
+                    peaks[round_index * iterations + i] = tracemalloc.get_traced_memory()[1] - before
+                gc.collect()
+                last = self._snapshot()
+                retained[round_index] = self._size(last) - baseline_size
+                if first is None:
+                    first = last
+        finally:
+            tracemalloc.stop()
+
+        growth = [retained[i] - retained[i - 1] for i in range(1, rounds)]
+        return {
+            'peak_bytes_per_request': {
+                'mean': round(sum(peaks) / len(peaks)),
+                'max': max(peaks),
+            },
+            'retained_bytes_per_round': list(retained),
+            'growth_bytes_per_request': round(sum(growth) / (len(growth) * iterations), 1),
+            'leak_suspected': all(delta / iterations > options['leak_threshold']
+                                  for delta in growth),
+            # What the first round left allocated (caches, buffers) and
+            # what kept growing after it
+            'top_lines': self._top_lines(first.compare_to(baseline, 'lineno'), options['top']),
+            'growth_lines': self._top_lines(last.compare_to(first, 'lineno'), options['top']),
+        }
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+    def _size(self, snapshot):
+        return sum(stat.size for stat in snapshot.statistics('filename'))
+
+    def _top_lines(self, diffs, limit):
+        lines = []
+        for stat in diffs:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            lines.append({'file': self._module_path(frame.filename), 'line': frame.lineno,
+                          'size_diff': stat.size_diff, 'count_diff': stat.count_diff})
+            if len(lines) == limit:
+                break
+        return lines
+
+    def _module_path(self, filename):
+        """Path relative to its sys.path entry, the same on every machine"""
+        roots = [os.path.join(os.path.abspath(root), '') for root in sys.path if root]
+        roots.append(os.path.join(str(settings.BASE_DIR), ''))
+        matches = [root for root in roots if filename.startswith(root)]
+        return filename[len(max(matches, key=len)):] if matches else filename
@@ -0,0 +1,48 @@
+from cryptography.fernet import InvalidToken
+from django.core.management.base import BaseCommand
+from api import encryption
+from api.models import ApiKey
+
+
+class Command(BaseCommand):
+    help = ('Re-encrypt stored API keys with ENCRYPTION_KEY. Run after moving the old key '
+            'to ENCRYPTION_KEYS_PREVIOUS; keys already using ENCRYPTION_KEY are skipped, '
+            'so an interrupted run can simply be repeated or resumed with --after.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='API keys re-encrypted per transaction')
+        parser.add_argument('--after', type=int, default=0,
+                            help='Only process API keys with a primary key above this one')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = options['after']
+        rotated = skipped = unreadable = 0
+
+        while True:
+            batch = list(ApiKey.objects.filter(pk__gt=last_pk).order_by('pk')
+                         .only('pk', 'encrypted_key')[:batch_size])
+            if not batch:
+                break
+            changed = []
+            for api_key in batch:
+                if encryption.is_current(api_key.encrypted_key):
+                    skipped += 1
+                    continue
+                try:
+                    api_key.encrypted_key = encryption.rotate(api_key.encrypted_key)
+                except InvalidToken:
+                    unreadable += 1
+                    self.stderr.write(f'API key {api_key.pk} cannot be decrypted with any '
+                                      f'configured key; left unchanged')
+                    continue
+                changed.append(api_key)
+            ApiKey.objects.bulk_update(changed, ['encrypted_key'])
+            rotated += len(changed)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Processed up to API key {last_pk}: {rotated} re-encrypted')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-encrypted {rotated} API keys, {skipped} already current, '
+            f'{unreadable} unreadable'))
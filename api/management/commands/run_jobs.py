@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api import idstats, logsinks, usage
+from api.jobs import claimable_job_ids, run_job
+from api.models import ValidationJob
+
+
+class Command(BaseCommand):
+    help = ('Process pending validation jobs and resume those left behind by crashed '
+            'workers. Run several instances for more throughput.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=0,
+                            help='Keep running, checking for jobs every POLL seconds')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Resume failed jobs from their last committed chunk')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = ValidationJob.objects.filter(
+                status=ValidationJob.Status.FAILED
+            ).update(status=ValidationJob.Status.PENDING, error=None, finished_at=None)
+            self.stdout.write(f'Retrying {retried} failed jobs')
+
+        while True:
+            completed = 0
+            for job_id in claimable_job_ids():
+                if run_job(job_id):
+                    completed += 1
+                    self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S} Completed job {job_id}')
+            usage.flush()
+            idstats.flush()
+            logsinks.get_log_sink().flush()
+            if not options['poll']:
+                break
+            if not completed:
+                time.sleep(options['poll'])
+
+        self.stdout.write(self.style.SUCCESS('No claimable jobs left'))
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'metrics:'
+FLUSH_INTERVAL = 5.0
+
+_counts = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    Count an event in this process
+
+    Counts are added to the shared cache at most every FLUSH_INTERVAL
+    seconds, so hot paths such as rejected requests never wait on it.
+    """
+    global _last_flush
+    with _lock:
+        _counts[name] += amount
+        now = time.monotonic()
+        if now - _last_flush < FLUSH_INTERVAL:
+            return
+        _last_flush = now
+        pending = dict(_counts)
+        _counts.clear()
+    _add_to_cache(pending)
+
+
+def flush() -> None:
+    """Add this process's pending counts to the shared cache now."""
+    global _last_flush
+    with _lock:
+        pending = dict(_counts)
+        _counts.clear()
+        _last_flush = time.monotonic()
+    _add_to_cache(pending)
+
+
+def _add_to_cache(counts: Dict[str, int]) -> None:
+    for name, amount in counts.items():
+        key = CACHE_PREFIX + name
+        try:
+            if not cache.add(key, amount, timeout=None):
+                cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, amount, timeout=None)
+        except Exception as e:
+            logger.warning(f"Could not record metric {name}: {str(e)}")
+
+
+def local_counts() -> Dict[str, int]:
+    """Counts of this process not yet added to the shared cache."""
+    with _lock:
+        return dict(_counts)
+
+
+def get_counts(names: Iterable[str]) -> Dict[str, int]:
+    """Shared counts across all processes, plus this process's pending ones."""
+    names = list(names)
+    shared = cache.get_many([CACHE_PREFIX + name for name in names])
+    pending = local_counts()
+    return {name: shared.get(CACHE_PREFIX + name, 0) + pending.get(name, 0)
+            for name in names}
@@ -0,0 +1,175 @@
+import cProfile
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from . import metrics, profiling, querybudget
+from .logsinks import log_queue_depth
+from .renderers import default_json_renderer
+from .throttling import check_client
+
+logger = logging.getLogger(__name__)
+
+LOAD_SHED = 'requests_shed'
+METRIC_NAMES = [LOAD_SHED]
+
+
+class ProfilingMiddleware:
+    """
+    Run selected API requests under cProfile
+
+    A request is profiled when it carries a valid X-Profile-Token issued
+    by staff in the admin, or falls in PROFILE_SAMPLE_RATE. Profiles are
+    written to PROFILE_DIR under the request id, which is returned in the
+    X-Profile-ID header. One request per process is profiled at a time;
+    others arriving meanwhile run normally. With PROFILE_ENABLED off the
+    middleware removes itself from the stack when the server starts.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if not request.path.startswith(settings.PROFILE_PATH_PREFIX):
+            return self.get_response(request)
+        reason = profiling.reason(request)
+        if reason is None or not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, reason)
+        finally:
+            self._lock.release()
+
+    def profile(self, request, reason):
+        profile_id = profiling.new_profile_id(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        try:
+            profiling.save(profile_id, profiler, {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'reason': reason,
+            })
+        except OSError as e:
+            logger.warning(f"Could not save profile {profile_id}: {str(e)}")
+            return response
+        response[profiling.PROFILE_ID_HEADER] = profile_id
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Count each API request's database queries and report them with timings
+
+    Responses get a Server-Timing header with the query count, the time
+    spent in queries and the total time. Requests to endpoints listed in
+    QUERY_BUDGETS that run more queries than their budget fail when
+    QUERY_BUDGET_ENFORCE is set and are logged otherwise.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(settings.QUERY_TIMING_PATH_PREFIX):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with querybudget.count_queries() as counter:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        querybudget.check_budget(match.url_name if match else None, counter)
+        response['Server-Timing'] = querybudget.server_timing(counter, total)
+        return response
+
+
+class LoadSheddingMiddleware:
+    """
+    Reject API requests with 503 while this process is overloaded
+
+    Overloaded means LOAD_SHED_MAX_IN_FLIGHT requests already running or
+    LOAD_SHED_MAX_LOG_QUEUE log entries waiting to be persisted (e.g.
+    spilled while the log database is down). Retry-After grows with how
+    far over the limit the process is, so clients back off harder when it
+    is further behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.renderer = default_json_renderer()
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if not (settings.LOAD_SHED_ENABLED and
+                request.path.startswith(settings.LOAD_SHED_PATH_PREFIX)):
+            return self.get_response(request)
+
+        with self._lock:
+            load = max(self.in_flight / settings.LOAD_SHED_MAX_IN_FLIGHT,
+                       log_queue_depth() / settings.LOAD_SHED_MAX_LOG_QUEUE)
+            if load < 1:
+                self.in_flight += 1
+        if load >= 1:
+            metrics.increment(LOAD_SHED)
+            return self.overloaded(math.ceil(settings.LOAD_SHED_RETRY_AFTER * load))
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def overloaded(self, wait):
+        response = HttpResponse(
+            self.renderer.render({'detail': "Service temporarily overloaded, try again later."}),
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content_type=self.renderer.media_type)
+        response['Retry-After'] = str(wait)
+        return response
+
+
+class ClientThrottleMiddleware:
+    """
+    Throttle API requests by client address and subnet before authentication
+
+    Rejected requests never reach DRF, the key filter or the database, so
+    floods and key guessing cost a couple of cache operations each.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.renderer = default_json_renderer()
+
+    def __call__(self, request):
+        if (settings.CLIENT_THROTTLE_ENABLED and
+                request.path.startswith(settings.CLIENT_THROTTLE_PATH_PREFIX)):
+            wait = check_client(request)
+            if wait is not None:
+                return self.throttled(wait)
+        return self.get_response(request)
+
+    def throttled(self, wait):
+        """429 with the body and Retry-After header DRF's throttles produce"""
+        detail = exceptions.Throttled(wait).detail
+        response = HttpResponse(self.renderer.render({'detail': detail}),
+                                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                content_type=self.renderer.media_type)
+        response['Retry-After'] = str(wait)
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-19 05:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_apikey_key_preview'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='log',
+            name='national_id',
+            field=models.CharField(db_index=True, help_text='The national ID that was validated', max_length=14, validators=[django.core.validators.MinLengthValidator(14), django.core.validators.MaxLengthValidator(14)]),
+        ),
+    ]
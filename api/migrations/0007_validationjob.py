@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-19 05:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_alter_log_national_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Last time a worker committed progress', null=True)),
+                ('worker', models.CharField(blank=True, help_text='Token of the worker currently holding the job', max_length=32)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('processed', models.PositiveBigIntegerField(default=0)),
+                ('valid_count', models.PositiveBigIntegerField(default=0)),
+                ('invalid_count', models.PositiveBigIntegerField(default=0)),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('chunks_done', models.PositiveIntegerField(default=0, help_text='Number of result chunks committed to disk')),
+                ('input_offset', models.PositiveBigIntegerField(default=0, help_text='Byte offset of the first unprocessed line of the input file')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('api_key', models.ForeignKey(help_text='API key that submitted the job', on_delete=django.db.models.deletion.CASCADE, related_name='validation_jobs', to='api.apikey')),
+            ],
+            options={
+                'verbose_name': 'Validation Job',
+                'verbose_name_plural': 'Validation Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'heartbeat_at'], name='api_validat_status_9d7db0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-19 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_validationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiKeyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='UTC day the usage happened on')),
+                ('requests', models.PositiveBigIntegerField(default=0, help_text='Authenticated API requests')),
+                ('valid', models.PositiveBigIntegerField(default=0, help_text='National IDs validated as valid')),
+                ('invalid', models.PositiveBigIntegerField(default=0, help_text='National IDs validated as invalid')),
+                ('throttled', models.PositiveBigIntegerField(default=0, help_text='Requests rejected by the per-key rate limit')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('api_key', models.ForeignKey(help_text='API key the usage is billed to', on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='api.apikey')),
+            ],
+            options={
+                'verbose_name': 'API Key Usage',
+                'verbose_name_plural': 'API Key Usage',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('api_key', 'date'), name='api_key_usage_unique_day')],
+            },
+        ),
+    ]
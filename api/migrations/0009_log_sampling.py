@@ -0,0 +1,36 @@
+# Generated by Django 5.1 on 2026-10-19 06:01
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_apikeyusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='log_sample_rate',
+            field=models.FloatField(blank=True, help_text='Fraction of valid validations logged for this key (blank uses LOG_SAMPLE_RATES)', null=True, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.CreateModel(
+            name='DroppedLogCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='UTC day the validations happened on')),
+                ('outcome', models.CharField(help_text="'valid' or the lowercase error code name, e.g. 'invalid_century'", max_length=32)),
+                ('dropped', models.PositiveBigIntegerField(default=0)),
+                ('api_key', models.ForeignKey(help_text='API key that made the validations', on_delete=django.db.models.deletion.CASCADE, related_name='dropped_logs', to='api.apikey')),
+            ],
+            options={
+                'verbose_name': 'Dropped Log Count',
+                'verbose_name_plural': 'Dropped Log Counts',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('api_key', 'date', 'outcome'), name='dropped_log_count_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-19 06:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_log_sampling'),
+    ]
+
+    # The column is unchanged; only Django fills the default now. Skip the
+    # database step so SQLite does not rebuild the whole log table.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='log',
+                    name='timestamp',
+                    field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, help_text='When the validation was performed'),
+                ),
+            ],
+        ),
+    ]
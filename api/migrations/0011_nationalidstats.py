@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-19 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NationalIDStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('national_id', models.CharField(help_text='The national ID that was validated', max_length=14)),
+                ('first_seen', models.DateTimeField(help_text='First validation')),
+                ('last_seen', models.DateTimeField(help_text='Latest validation')),
+                ('count', models.PositiveBigIntegerField(default=0, help_text='Validations in total')),
+                ('last_outcome', models.CharField(help_text="'valid' or the lowercase error code name of the latest validation", max_length=32)),
+                ('api_key', models.ForeignKey(help_text='API key that made the validations', on_delete=django.db.models.deletion.CASCADE, related_name='national_id_stats', to='api.apikey')),
+            ],
+            options={
+                'verbose_name': 'National ID Stats',
+                'verbose_name_plural': 'National ID Stats',
+                'ordering': ['-last_seen'],
+                'indexes': [models.Index(fields=['last_seen'], name='national_id_stats_last_seen')],
+                'constraints': [models.UniqueConstraint(fields=('national_id', 'api_key'), name='national_id_stats_unique')],
+            },
+        ),
+    ]
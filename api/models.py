@@ -1,10 +1,16 @@
-import os
 import hashlib
-from cryptography.fernet import Fernet
-from django.db import models
-from django.core.validators import MinLengthValidator, MaxLengthValidator
+import secrets
+import uuid
+from typing import Dict, Any
+from django.db import models, router
+from django.core.validators import (
+    MaxLengthValidator, MaxValueValidator, MinLengthValidator, MinValueValidator
+)
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .constants import NATIONAL_ID_LENGTH
+from .encryption import get_keyring
 
 
 class ApiKey(models.Model):
@@ -39,20 +45,26 @@ class ApiKey(models.Model):
         default=True,
         help_text="Whether this API key is active"
     )
+    log_sample_rate = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Fraction of valid validations logged for this key "
+                  "(blank uses LOG_SAMPLE_RATES)"
+    )
 
     def __str__(self):
         return f"{self.user} - Key ending in {self.key_preview}"
 
     @staticmethod
     def _get_cipher():
-        """Get encryption cipher"""
-        encryption_key = os.environ.get('ENCRYPTION_KEY')
-        if not encryption_key:
-            # Generate a default key for development (should be in env for production)
-            encryption_key = Fernet.generate_key()
-            if isinstance(encryption_key, bytes):
-                encryption_key = encryption_key.decode()
-        return Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+        """Get the process-wide encryption keyring"""
+        return get_keyring()
+
+    @staticmethod
+    def generate_key(length: int = 32) -> str:
+        """Generate a random URL-safe API key"""
+        return secrets.token_urlsafe(length)[:length]
 
     @staticmethod
     def hash_key(api_key: str) -> str:
@@ -88,7 +100,11 @@ class ApiKey(models.Model):
         if not api_key:
             return None
 
-        key_hash = cls.hash_key(api_key)
+        return cls.authenticate_hash(cls.hash_key(api_key))
+
+    @classmethod
+    def authenticate_hash(cls, key_hash: str):
+        """Active API key with the given SHA-256 hash, or None"""
         try:
             return cls.objects.get(key_hash=key_hash, is_active=True)
         except cls.DoesNotExist:
@@ -101,11 +117,22 @@ class ApiKey(models.Model):
         ordering = ['-created_at']
 
 
+class LogQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Imported here: partitions imports this module
+        from .partitions import assign_ids
+        objs = list(objs)
+        assign_ids(objs, self._db or router.db_for_write(self.model))
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Log(models.Model):
     """Model for logging validation attempts"""
 
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        # Not auto_now_add, so imported and replayed entries keep their time
+        default=timezone.now,
+        editable=False,
         db_index=True,
         help_text="When the validation was performed"
     )
@@ -115,6 +142,7 @@ class Log(models.Model):
             MinLengthValidator(NATIONAL_ID_LENGTH),
             MaxLengthValidator(NATIONAL_ID_LENGTH)
         ],
+        db_index=True,
         help_text="The national ID that was validated"
     )
     valid = models.BooleanField(
@@ -138,15 +166,49 @@ class Log(models.Model):
         help_text="API key preview used for this validation"
     )
 
+    objects = LogQuerySet.as_manager()
+
     def __str__(self):
         status = "Valid" if self.valid else "Invalid"
         return f"{status} - {self.national_id} at {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            from .partitions import assign_ids
+            if assign_ids([self], kwargs.get('using') or router.db_for_write(Log, instance=self)):
+                kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
     @property
     def is_successful(self):
         """Check if the validation was successful"""
         return self.valid and self.extracted_data is not None
 
+    def to_record(self) -> Dict[str, Any]:
+        """Serialize log entry to a JSON-compatible dict"""
+        return {
+            'id': self.pk,
+            'timestamp': self.timestamp.isoformat(),
+            'national_id': self.national_id,
+            'valid': self.valid,
+            'extracted_data': self.extracted_data,
+            'error': self.error,
+            'api_key_used': self.api_key_used,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'Log':
+        """Build an unsaved log entry from a serialized record"""
+        return cls(
+            id=record.get('id'),
+            timestamp=parse_datetime(record['timestamp']),
+            national_id=record['national_id'],
+            valid=record['valid'],
+            extracted_data=record.get('extracted_data'),
+            error=record.get('error'),
+            api_key_used=record.get('api_key_used'),
+        )
+
     class Meta:
         app_label = 'api'
         verbose_name = 'Validation Log'
@@ -156,3 +218,185 @@ class Log(models.Model):
             models.Index(fields=['timestamp', 'valid']),
             models.Index(fields=['api_key_used', 'timestamp']),
         ]
+
+
+class ValidationJob(models.Model):
+    """Background validation of a large list of national IDs"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    api_key = models.ForeignKey(
+        ApiKey,
+        on_delete=models.CASCADE,
+        related_name='validation_jobs',
+        help_text="API key that submitted the job"
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last time a worker committed progress"
+    )
+    worker = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Token of the worker currently holding the job"
+    )
+    total = models.PositiveBigIntegerField(default=0)
+    processed = models.PositiveBigIntegerField(default=0)
+    valid_count = models.PositiveBigIntegerField(default=0)
+    invalid_count = models.PositiveBigIntegerField(default=0)
+    chunk_size = models.PositiveIntegerField()
+    chunks_done = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of result chunks committed to disk"
+    )
+    input_offset = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Byte offset of the first unprocessed line of the input file"
+    )
+    error = models.TextField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.status}, {self.processed}/{self.total})"
+
+    @property
+    def is_finished(self):
+        """Check if the job has stopped for good"""
+        return self.status in (self.Status.COMPLETED, self.Status.FAILED)
+
+    class Meta:
+        app_label = 'api'
+        verbose_name = 'Validation Job'
+        verbose_name_plural = 'Validation Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+
+
+class ApiKeyUsage(models.Model):
+    """Daily usage counters of an API key, for billing and quotas"""
+
+    api_key = models.ForeignKey(
+        ApiKey,
+        on_delete=models.CASCADE,
+        related_name='usage',
+        help_text="API key the usage is billed to"
+    )
+    date = models.DateField(help_text="UTC day the usage happened on")
+    requests = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Authenticated API requests"
+    )
+    valid = models.PositiveBigIntegerField(
+        default=0,
+        help_text="National IDs validated as valid"
+    )
+    invalid = models.PositiveBigIntegerField(
+        default=0,
+        help_text="National IDs validated as invalid"
+    )
+    throttled = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Requests rejected by the per-key rate limit"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.api_key_id} on {self.date}: {self.requests} requests"
+
+    class Meta:
+        app_label = 'api'
+        verbose_name = 'API Key Usage'
+        verbose_name_plural = 'API Key Usage'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['api_key', 'date'], name='api_key_usage_unique_day'),
+        ]
+
+
+class DroppedLogCount(models.Model):
+    """Validations left out of Log by sampling, so totals can be rebuilt exactly"""
+
+    api_key = models.ForeignKey(
+        ApiKey,
+        on_delete=models.CASCADE,
+        related_name='dropped_logs',
+        help_text="API key that made the validations"
+    )
+    date = models.DateField(help_text="UTC day the validations happened on")
+    outcome = models.CharField(
+        max_length=32,
+        help_text="'valid' or the lowercase error code name, e.g. 'invalid_century'"
+    )
+    dropped = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.api_key_id} on {self.date}: {self.dropped} {self.outcome} not logged"
+
+    class Meta:
+        app_label = 'api'
+        verbose_name = 'Dropped Log Count'
+        verbose_name_plural = 'Dropped Log Counts'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['api_key', 'date', 'outcome'],
+                                    name='dropped_log_count_unique'),
+        ]
+
+
+class NationalIDStats(models.Model):
+    """How often and when each national ID was validated per API key, one row per pair"""
+
+    national_id = models.CharField(
+        max_length=NATIONAL_ID_LENGTH,
+        help_text="The national ID that was validated"
+    )
+    api_key = models.ForeignKey(
+        ApiKey,
+        on_delete=models.CASCADE,
+        related_name='national_id_stats',
+        help_text="API key that made the validations"
+    )
+    first_seen = models.DateTimeField(help_text="First validation")
+    last_seen = models.DateTimeField(help_text="Latest validation")
+    count = models.PositiveBigIntegerField(default=0, help_text="Validations in total")
+    last_outcome = models.CharField(
+        max_length=32,
+        help_text="'valid' or the lowercase error code name of the latest validation"
+    )
+
+    def __str__(self):
+        return f"{self.national_id} by {self.api_key_id}: {self.count} validations"
+
+    class Meta:
+        app_label = 'api'
+        verbose_name = 'National ID Stats'
+        verbose_name_plural = 'National ID Stats'
+        ordering = ['-last_seen']
+        constraints = [
+            # Also serves lookups by national_id alone
+            models.UniqueConstraint(fields=['national_id', 'api_key'],
+                                    name='national_id_stats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['last_seen'], name='national_id_stats_last_seen'),
+        ]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional, Tuple
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def estimate_row_count(model, using: str) -> Optional[int]:
+    """
+    Get the planner's row estimate for a model's table
+
+    Returns None when the backend keeps no usable statistics, e.g. a
+    PostgreSQL table that was never analyzed or SQLite without ANALYZE.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+    elif connection.vendor == 'sqlite':
+        sql = "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*)
+
+    Unfiltered lists use the planner's table estimate; filtered lists are
+    counted up to ``count_limit`` rows, beyond which pages are reached
+    with keyset cursors instead of page numbers.
+    """
+
+    count_limit = 10000
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        self.count_is_estimate = False
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                self.count_is_estimate = True
+                return estimate
+
+        count = queryset.order_by()[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            self.count_is_estimate = True
+            return self.count_limit
+        return count
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    """Encode a (timestamp, pk) keyset position for use in a URL."""
+    delta = timestamp - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f"{micros}.{pk}"
+
+
+def decode_cursor(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Decode a keyset position, returning None for missing or bad values."""
+    if not value:
+        return None
+    try:
+        micros, pk = value.split('.', 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
@@ -0,0 +1,49 @@
+import codecs
+import io
+import re
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from .renderers import FastJSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, JSONParser is always available
+    orjson = None
+
+# orjson silently turns integers beyond 64 bits into floats
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    Drop-in JSONParser that decodes UTF-8 bodies with orjson when installed
+
+    Bodies orjson rejects or might read differently (other encodings, huge
+    integers, NaN with STRICT_JSON off) are handed to JSONParser, so results
+    and error messages match it exactly.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def default_json_parser():
+    """First configured parser accepting JSON, as DRF would select it."""
+    for parser_class in api_settings.DEFAULT_PARSER_CLASSES:
+        if parser_class.media_type == 'application/json':
+            return parser_class()
+    return JSONParser()
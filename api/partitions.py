@@ -0,0 +1,344 @@
+import re
+from datetime import date, datetime, time, timezone as dt_timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Log
+
+TABLE = Log._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+# SQLite only: the last id handed out across all partitions
+SEQUENCE_TABLE = f'{TABLE}_seq'
+PARTITION_PREFIX = f'{TABLE}_p'
+PARTITION_RE = re.compile(rf'^{PARTITION_PREFIX}(\d{{4}})_(\d{{2}})$')
+
+_partitioned: Dict[str, bool] = {}
+
+
+class PartitionError(Exception):
+    """Raised when log partitions cannot be created or changed."""
+
+
+def month_of(value: datetime) -> date:
+    """First day of the UTC month a timestamp falls in."""
+    value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def previous_month(month: date) -> date:
+    return date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+
+
+def month_start(month: date) -> datetime:
+    return datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f'{PARTITION_PREFIX}{month:%Y_%m}'
+
+
+def _database(using: Optional[str]) -> str:
+    return using or router.db_for_write(Log)
+
+
+def is_partitioned(using: Optional[str] = None) -> bool:
+    """Whether the log table was converted by ``partition_logs --convert``"""
+    connection = connections[_database(using)]
+    if connection.vendor == 'sqlite':
+        sql = "SELECT type = 'view' FROM sqlite_master WHERE name = %s"
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)"
+    else:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [TABLE])
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def partitions(using: Optional[str] = None) -> List[date]:
+    """Months that have a partition, oldest first"""
+    connection = connections[_database(using)]
+    if connection.vendor == 'sqlite':
+        sql = "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s"
+        params = [PARTITION_PREFIX + '%']
+    else:
+        sql = ("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+               "WHERE i.inhparent = to_regclass(%s)")
+        params = [TABLE]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        names = [name for name, in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def has_legacy_table(using: Optional[str] = None) -> bool:
+    """Whether rows from before the conversion are still kept"""
+    connection = connections[_database(using)]
+    return LEGACY_TABLE in connection.introspection.table_names()
+
+
+def assign_ids(logs: Sequence[Log], using: Optional[str] = None) -> bool:
+    """
+    Give unsaved log entries ids from the partitions' shared sequence
+
+    Only needed on a partitioned SQLite database, where entries are
+    inserted through a view that cannot report the ids it assigned.
+    Returns whether ids were assigned.
+    """
+    if not settings.LOG_PARTITIONING:
+        return False
+    using = _database(using)
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if using not in _partitioned:
+        _partitioned[using] = is_partitioned(using)
+    unsaved = [log for log in logs if log.pk is None]
+    if not _partitioned[using] or not unsaved:
+        return False
+
+    sequence = connection.ops.quote_name(SEQUENCE_TABLE)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {sequence} SET id = id + %s', [len(unsaved)])
+        cursor.execute(f'SELECT id FROM {sequence}')
+        last, = cursor.fetchone()
+    for offset, log in enumerate(unsaved):
+        log.pk = last - len(unsaved) + offset + 1
+    return True
+
+
+def convert(using: Optional[str] = None, months_ahead: int = 2) -> date:
+    """
+    Turn the log table into monthly partitions; returns the first month
+
+    Existing rows stay in a legacy table that covers everything before the
+    first month, so nothing is copied. PostgreSQL then uses native range
+    partitioning; SQLite gets one table per month behind a view with
+    triggers that route writes.
+    """
+    using = _database(using)
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        raise PartitionError(f"Log partitioning is not supported on {connection.vendor}")
+    if is_partitioned(using):
+        raise PartitionError("The log table is already partitioned")
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        qn = connection.ops.quote_name
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MAX({qn("timestamp")}), MAX({qn("id")}) FROM {qn(TABLE)}')
+        latest, last_id = cursor.fetchone()
+        if isinstance(latest, str):
+            latest = timezone.make_aware(datetime.fromisoformat(latest), dt_timezone.utc)
+        first = next_month(month_of(max(filter(None, [latest, timezone.now()]))))
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_TABLE)}')
+
+        if connection.vendor == 'postgresql':
+            _convert_postgresql(cursor, connection, first, last_id or 0)
+        else:
+            cursor.execute(f'CREATE TABLE {qn(SEQUENCE_TABLE)} (id integer NOT NULL)')
+            cursor.execute(f'INSERT INTO {qn(SEQUENCE_TABLE)} (id) VALUES (%s)',
+                           [last_id or 0])
+        _create_partitions(cursor, connection, first, months_ahead, [])
+    _partitioned.clear()
+    return first
+
+
+def ensure_partitions(using: Optional[str] = None, months_ahead: int = 2) -> List[date]:
+    """Create partitions through ``months_ahead`` months from now; returns new months"""
+    using = _database(using)
+    connection = connections[using]
+    if not is_partitioned(using):
+        raise PartitionError("The log table is not partitioned; run partition_logs --convert")
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        existing = partitions(using)
+        start = next_month(existing[-1]) if existing else month_of(timezone.now())
+        return _create_partitions(cursor, connection, start, months_ahead, existing)
+
+
+def drop_partitions(before: date, using: Optional[str] = None) -> List[str]:
+    """
+    Drop every partition that ends on or before ``before``
+
+    This is the retention mechanism: a whole month goes at the cost of a
+    DROP TABLE rather than a DELETE per row. The legacy table goes once the
+    first partition starts on or before ``before``. The newest partition is
+    always kept.
+    """
+    using = _database(using)
+    connection = connections[using]
+    if not is_partitioned(using):
+        raise PartitionError("The log table is not partitioned; run partition_logs --convert")
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        existing = partitions(using)
+        dropped = [partition_name(month) for month in existing[:-1]
+                   if next_month(month) <= before]
+        if existing and existing[0] <= before and has_legacy_table(using):
+            dropped.insert(0, LEGACY_TABLE)
+        for name in dropped:
+            cursor.execute(f'DROP TABLE {qn(name)}')
+        if dropped and connection.vendor == 'sqlite':
+            _rebuild_sqlite_view(cursor, connection)
+    return dropped
+
+
+def _literal(month: date) -> str:
+    """Month start as a PostgreSQL timestamptz literal, for DDL that takes no parameters"""
+    return f"'{month_start(month).isoformat()}'"
+
+
+def _columns(connection) -> List[Tuple[str, str]]:
+    """(quoted column, column definition) for every Log column"""
+    qn = connection.ops.quote_name
+    columns = []
+    for field in Log._meta.concrete_fields:
+        definition = f'{qn(field.column)} {field.db_type(connection)}'
+        if field.primary_key and connection.vendor == 'sqlite':
+            definition += ' NOT NULL PRIMARY KEY'
+        else:
+            definition += ' NULL' if field.null else ' NOT NULL'
+        columns.append((qn(field.column), definition))
+    return columns
+
+
+def _indexes() -> List[List[str]]:
+    """Column lists of the indexes Log declares"""
+    indexes = [[field.column] for field in Log._meta.concrete_fields
+               if field.db_index and not field.primary_key]
+    for index in Log._meta.indexes:
+        indexes.append([Log._meta.get_field(name.lstrip('-')).column for name in index.fields])
+    return indexes
+
+
+def _create_indexes(cursor, connection, table: str) -> None:
+    qn = connection.ops.quote_name
+    for columns in _indexes():
+        cursor.execute(f'CREATE INDEX {qn(table + "_" + "_".join(columns))} ON {qn(table)} '
+                       f'({", ".join(qn(column) for column in columns)})')
+
+
+def _convert_postgresql(cursor, connection, first: date, last_id: int) -> None:
+    qn = connection.ops.quote_name
+    sequence = f'{TABLE}_id_seq'
+    # The legacy table's identity sequence cannot be shared, so a plain
+    # sequence owned by the partitioned table takes over from its last id
+    cursor.execute(f'ALTER TABLE {qn(LEGACY_TABLE)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(f'ALTER TABLE {qn(LEGACY_TABLE)} ALTER COLUMN id DROP DEFAULT')
+    cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {qn(sequence)} AS bigint')
+    cursor.execute('SELECT setval(%s, %s, false)', [sequence, last_id + 1])
+
+    definitions = ', '.join(definition for _, definition in _columns(connection))
+    # Unique constraints on a partitioned table must include the partition key
+    cursor.execute(f'CREATE TABLE {qn(TABLE)} ({definitions}, '
+                   f'PRIMARY KEY ({qn("id")}, {qn("timestamp")})) '
+                   f'PARTITION BY RANGE ({qn("timestamp")})')
+    cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    cursor.execute(f'ALTER SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.{qn("id")}')
+    _create_indexes(cursor, connection, TABLE)
+    cursor.execute(f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(LEGACY_TABLE)} '
+                   f'FOR VALUES FROM (MINVALUE) TO ({_literal(first)})')
+
+
+def _create_partitions(cursor, connection, start: date, months_ahead: int,
+                       existing: List[date]) -> List[date]:
+    qn = connection.ops.quote_name
+    last = month_of(timezone.now())
+    for _ in range(months_ahead):
+        last = next_month(last)
+    created = []
+    month = start
+    while month <= last or not (existing or created):
+        name = partition_name(month)
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} '
+                           f'FOR VALUES FROM ({_literal(month)}) TO ({_literal(next_month(month))})')
+        else:
+            definitions = ', '.join(definition for _, definition in _columns(connection))
+            cursor.execute(f'CREATE TABLE {qn(name)} ({definitions})')
+            _create_indexes(cursor, connection, name)
+        created.append(month)
+        month = next_month(month)
+    if created and connection.vendor == 'sqlite':
+        _rebuild_sqlite_view(cursor, connection)
+    return created
+
+
+def _rebuild_sqlite_view(cursor, connection) -> None:
+    """
+    Recreate the view over all SQLite partitions and its write triggers
+
+    The view is a UNION ALL, so SQLite pushes timestamp conditions down to
+    every partition's index and merges ordered scans for ORDER BY ... LIMIT.
+    Inserts go to the partition of their month, or the oldest or newest
+    table when outside the covered range; updates and deletes find rows by
+    id in whichever table holds them.
+    """
+    qn = connection.ops.quote_name
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s",
+                   [PARTITION_PREFIX + '%'])
+    months = sorted(date(int(match[1]), int(match[2]), 1)
+                    for match in (PARTITION_RE.match(name) for name, in cursor.fetchall())
+                    if match)
+    tables = [(partition_name(month), month) for month in months]
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                   [LEGACY_TABLE])
+    if cursor.fetchone():
+        tables.insert(0, (LEGACY_TABLE, None))
+
+    columns = [column for column, _ in _columns(connection)]
+    column_list = ', '.join(columns)
+    timestamp = qn('timestamp')
+    sequence = qn(SEQUENCE_TABLE)
+
+    def bound(month):
+        return "'" + connection.ops.adapt_datetimefield_value(month_start(month)) + "'"
+
+    routes = []
+    for index, (name, _) in enumerate(tables):
+        conditions = []
+        if index > 0:
+            conditions.append(f'NEW.{timestamp} >= {bound(tables[index][1])}')
+        if index < len(tables) - 1:
+            conditions.append(f'NEW.{timestamp} < {bound(tables[index + 1][1])}')
+        values = ', '.join(f'COALESCE(NEW.{qn("id")}, (SELECT id FROM {sequence}))'
+                           if column == qn('id') else f'NEW.{column}' for column in columns)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        routes.append(f'INSERT INTO {qn(name)} ({column_list}) SELECT {values}{where};')
+    assignments = ', '.join(f'{column} = NEW.{column}' for column in columns)
+
+    cursor.execute(f'DROP VIEW IF EXISTS {qn(TABLE)}')
+    cursor.execute(f'CREATE VIEW {qn(TABLE)} AS ' + ' UNION ALL '.join(
+        f'SELECT {column_list} FROM {qn(name)}' for name, _ in tables))
+    cursor.execute(
+        f'CREATE TRIGGER {qn(TABLE + "_insert")} INSTEAD OF INSERT ON {qn(TABLE)} BEGIN '
+        f'UPDATE {sequence} SET id = CASE WHEN NEW.{qn("id")} IS NULL THEN id + 1 '
+        f'ELSE MAX(id, NEW.{qn("id")}) END; ' + ' '.join(routes) + ' END')
+    cursor.execute(
+        f'CREATE TRIGGER {qn(TABLE + "_update")} INSTEAD OF UPDATE ON {qn(TABLE)} BEGIN ' +
+        ' '.join(f'UPDATE {qn(name)} SET {assignments} WHERE {qn("id")} = OLD.{qn("id")};'
+                 for name, _ in tables) + ' END')
+    cursor.execute(
+        f'CREATE TRIGGER {qn(TABLE + "_delete")} INSTEAD OF DELETE ON {qn(TABLE)} BEGIN ' +
+        ' '.join(f'DELETE FROM {qn(name)} WHERE {qn("id")} = OLD.{qn("id")};'
+                 for name, _ in tables) + ' END')
+
+
+@receiver(setting_changed)
+def _reset_partitioned(setting, **kwargs):
+    if setting in ('LOG_PARTITIONING', 'DATABASES'):
+        _partitioned.clear()
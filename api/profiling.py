@@ -0,0 +1,150 @@
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import uuid
+from typing import List, Optional
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_ID_HEADER = 'X-Profile-ID'
+REQUEST_ID_HEADER = 'X-Request-ID'
+PROFILES_RECORDED = 'profiles_recorded'
+METRIC_NAMES = [PROFILES_RECORDED]
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+_SALT = 'api.profiling'
+_PROFILE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]')
+# Leaves room for the separator and a 32 character uuid
+REQUEST_ID_PREFIX_LENGTH = 31
+
+
+def make_token(username: str) -> str:
+    """Signed X-Profile-Token value, valid for PROFILE_TOKEN_MAX_AGE seconds"""
+    return signing.TimestampSigner(salt=_SALT).sign(username)
+
+
+def check_token(token: str) -> Optional[str]:
+    """Username a profiling token was issued to, or None if invalid or expired"""
+    try:
+        return signing.TimestampSigner(salt=_SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def reason(request) -> Optional[str]:
+    """Why a request should be profiled, or None to run it normally"""
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        username = check_token(token)
+        if username is not None:
+            return f'token:{username}'
+        logger.warning(f"Ignoring invalid profiling token for {request.path}")
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def is_profile_id(profile_id: str) -> bool:
+    return bool(_PROFILE_ID.match(profile_id))
+
+
+def new_profile_id(request) -> str:
+    """
+    A new, unique profile id, prefixed with the client's X-Request-ID
+
+    The id is always generated here so a client cannot overwrite another
+    profile; the request id is stripped to file name characters and only
+    helps to find the profile.
+    """
+    prefix = _UNSAFE.sub('', request.headers.get(REQUEST_ID_HEADER, ''))
+    prefix = prefix[:REQUEST_ID_PREFIX_LENGTH]
+    return f'{prefix}-{uuid.uuid4().hex}' if prefix else uuid.uuid4().hex
+
+
+def _path(profile_id: str, suffix: str) -> str:
+    if not is_profile_id(profile_id):
+        raise ValueError(f"Invalid profile id: {profile_id!r}")
+    return os.path.join(settings.PROFILE_DIR, profile_id + suffix)
+
+
+def profile_path(profile_id: str) -> str:
+    return _path(profile_id, '.prof')
+
+
+def save(profile_id: str, profiler, info: dict) -> None:
+    """
+    Write a profile and its request details to PROFILE_DIR
+
+    The oldest profiles are removed so at most PROFILE_MAX_FILES are kept.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = profile_path(profile_id)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    profiler.dump_stats(tmp_path)
+    with open(_path(profile_id, '.json'), 'w') as f:
+        json.dump({'id': profile_id, 'created': timezone.now().isoformat(), **info}, f)
+    os.replace(tmp_path, path)
+    metrics.increment(PROFILES_RECORDED)
+    _prune()
+
+
+def _prune() -> None:
+    profiles = list_profiles()
+    for info in profiles[settings.PROFILE_MAX_FILES:]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(_path(info['id'], suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[dict]:
+    """Details of the stored profiles, newest first"""
+    try:
+        names = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        profile_id, suffix = os.path.splitext(name)
+        if suffix != '.prof' or not is_profile_id(profile_id):
+            continue
+        info = get_profile(profile_id)
+        if info is not None:
+            profiles.append(info)
+    profiles.sort(key=lambda info: (info['created'], info['id']), reverse=True)
+    return profiles
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    """Request details of a stored profile, or None if there is none"""
+    if not is_profile_id(profile_id):
+        return None
+    path = profile_path(profile_id)
+    try:
+        with open(_path(profile_id, '.json')) as f:
+            info = json.load(f)
+        info['size'] = os.path.getsize(path)
+    except (OSError, ValueError):
+        return None
+    return info
+
+
+def format_stats(profile_id: str, sort: str = 'cumulative', limit: int = 50) -> str:
+    """pstats report of a stored profile's most expensive functions"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profile_path(profile_id), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Optional
+from django.conf import settings
+from django.db import connections
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+BUDGET_EXCEEDED = 'query_budget_exceeded'
+METRIC_NAMES = [BUDGET_EXCEEDED]
+
+SAVEPOINT_PREFIXES = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more queries than its endpoint's budget."""
+
+
+class QueryCounter:
+    """Execute wrapper counting queries and the time spent running them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Savepoints depend on whether the caller already is in a
+        # transaction (as tests are), not on what the endpoint does
+        if getattr(_local, 'exempt', 0) or sql.startswith(SAVEPOINT_PREFIXES):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def count_queries(using: Optional[str] = None):
+    """
+    Count the queries run by this thread inside the block
+
+    Covers every configured database unless ``using`` names one; queries of
+    other threads, such as background log writers, are not counted.
+    """
+    counter = QueryCounter()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+
+
+@contextmanager
+def exempt():
+    """
+    Leave the block's queries out of the current request's count
+
+    For periodic work that runs on whichever request happens to be due,
+    such as flushing counter buffers or rebuilding the API key filter.
+    """
+    _local.exempt = getattr(_local, 'exempt', 0) + 1
+    try:
+        yield
+    finally:
+        _local.exempt -= 1
+
+
+def get_budget(url_name: Optional[str]) -> Optional[int]:
+    """Query budget of an endpoint by URL name, or None if it has none"""
+    return settings.QUERY_BUDGETS.get(url_name) if url_name else None
+
+
+def check_budget(url_name: Optional[str], counter: QueryCounter) -> None:
+    """
+    Compare a request's queries with its endpoint's budget
+
+    Going over raises QueryBudgetExceeded when QUERY_BUDGET_ENFORCE is set
+    (the default with DEBUG); otherwise it is logged and counted.
+    """
+    budget = get_budget(url_name)
+    if budget is None or counter.count <= budget:
+        return
+    message = f"{url_name} ran {counter.count} queries, budget is {budget}"
+    if settings.QUERY_BUDGET_ENFORCE:
+        raise QueryBudgetExceeded(message)
+    metrics.increment(BUDGET_EXCEEDED)
+    logger.warning(message)
+
+
+def server_timing(counter: QueryCounter, total: float) -> str:
+    """Server-Timing header value with query and total durations"""
+    return (f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries", '
+            f'total;dur={total * 1000:.1f}')
@@ -0,0 +1,145 @@
+import functools
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.mediatypes import parse_header_parameters
+from .formats import DATE_STYLES, compact_payload, encode_binary
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the stdlib encoder is always available
+    orjson = None
+
+SHORT_SEPARATORS = (',', ':')
+
+
+class ConstantPayload(dict):
+    """
+    Response dict made only of hashable constants
+
+    Error bodies such as ``{"valid": false, "error": ...}`` come from a small
+    fixed set of messages, so FastJSONRenderer encodes each one once.
+    """
+
+    __slots__ = ()
+
+
+def _is_plain(data):
+    """Whether data only holds types orjson encodes exactly like the stdlib."""
+    data_type = type(data)
+    if data_type is str or data_type is int or data_type is bool or data is None:
+        return True
+    if data_type is dict:
+        for key, value in data.items():
+            if type(key) is not str or not _is_plain(value):
+                return False
+        return True
+    if data_type is list:
+        for value in data:
+            if not _is_plain(value):
+                return False
+        return True
+    # Floats are formatted differently by orjson (1e16 vs 1e+16), anything
+    # else goes through the encoder's default()
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def _stdlib_encoder(encoder_class, allow_nan):
+    return encoder_class(ensure_ascii=False, allow_nan=allow_nan,
+                         separators=SHORT_SEPARATORS)
+
+
+@functools.lru_cache(maxsize=256)
+def _encoded_constant(items, encoder_class, allow_nan):
+    return _dumps(dict(items), encoder_class, allow_nan)
+
+
+def _dumps(data, encoder_class, allow_nan):
+    """Compact JSON bytes, identical to JSONRenderer with UNICODE_JSON."""
+    if orjson is not None and _is_plain(data):
+        try:
+            ret = orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            pass  # Integers beyond 64 bits or lone surrogates
+        else:
+            if b'\xe2\x80' in ret:
+                ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+            return ret
+
+    ret = _stdlib_encoder(encoder_class, allow_nan).encode(data)
+    ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return ret.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer producing the same bytes faster
+
+    Uses orjson when installed for payloads it encodes exactly like the
+    stdlib, otherwise a pre-built stdlib encoder, and caches the encoded
+    body of ConstantPayload responses. Indented or non-compact/ASCII output
+    is left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        allow_nan = not self.strict
+        if type(data) is ConstantPayload:
+            try:
+                return _encoded_constant(tuple(data.items()), self.encoder_class, allow_nan)
+            except TypeError:
+                pass  # An unhashable value was added after all
+        return _dumps(data, self.encoder_class, allow_nan)
+
+
+def date_style(accepted_media_type):
+    """Date style requested with e.g. ``Accept: ...; dates=ordinal``."""
+    if accepted_media_type:
+        _, params = parse_header_parameters(accepted_media_type)
+        if params.get('dates') in DATE_STYLES:
+            return params['dates']
+    return DATE_STYLES[0]
+
+
+class CompactJSONRenderer(FastJSONRenderer):
+    """
+    Compact JSON: codes instead of names, ISO or ordinal dates, and one
+    array per field for multi-ID responses.
+    """
+
+    media_type = 'application/vnd.id-validator.compact+json'
+    format = 'compact'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return super().render(compact_payload(data, date_style(accepted_media_type)),
+                              accepted_media_type, renderer_context)
+
+
+class BinaryRenderer(BaseRenderer):
+    """Length-prefixed binary records, see api.formats.encode_binary."""
+
+    media_type = 'application/vnd.id-validator.binary'
+    format = 'binary'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return encode_binary(data)
+
+
+def default_json_renderer():
+    """First configured renderer producing JSON, as DRF would negotiate it."""
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if renderer_class.media_type == 'application/json':
+            return renderer_class()
+    return JSONRenderer()
@@ -0,0 +1,45 @@
+from django.conf import settings
+
+
+class LogRouter:
+    """
+    Route log models to a dedicated database when one is configured
+
+    Log writes then take the log database's write lock instead of the one
+    shared with API keys, admin users and sessions. Without a
+    ``settings.LOG_DATABASE_ALIAS`` entry in DATABASES the router stays out
+    of the way and everything lives in ``default``.
+    """
+
+    route_model_names = {'log'}
+
+    def _log_database(self):
+        alias = settings.LOG_DATABASE_ALIAS
+        return alias if alias in settings.DATABASES else None
+
+    def _is_log_model(self, model):
+        return (model._meta.app_label == 'api' and
+                model._meta.model_name in self.route_model_names)
+
+    def db_for_read(self, model, **hints):
+        if self._is_log_model(model):
+            return self._log_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_log_model(model):
+            return self._log_database()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        log_database = self._log_database()
+        if log_database is None:
+            return None
+        if app_label == 'api' and model_name in self.route_model_names:
+            return db == log_database
+        if db == log_database:
+            return False
+        return None
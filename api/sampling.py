@@ -0,0 +1,85 @@
+import hashlib
+from typing import Optional
+from django.conf import settings
+from django.utils import timezone
+from .constants import ErrorCodes
+from .formats import RESULT_ERROR_CODES
+from .models import ApiKey, DroppedLogCount
+from .usage import ApiKeyCounterBuffer
+
+VALID = 'valid'
+# Rate key applying to every error code without its own rate
+INVALID = 'invalid'
+OUTCOME_NAMES = {
+    code: name.lower() for name, code in vars(ErrorCodes).items() if name.isupper()
+}
+UNKNOWN_OUTCOME = OUTCOME_NAMES[ErrorCodes.VALIDATION_ERROR]
+_HASH_RANGE = 2 ** 64
+
+
+def outcome(result) -> str:
+    """'valid', or the lowercase ErrorCodes name of a failed result"""
+    if result.is_valid:
+        return VALID
+    return OUTCOME_NAMES.get(RESULT_ERROR_CODES.get(result.error), UNKNOWN_OUTCOME)
+
+
+def sample_rate(outcome_name: str, api_key: Optional[ApiKey]) -> float:
+    """
+    Fraction of results with this outcome that are logged
+
+    A key's log_sample_rate replaces the configured rate of valid results;
+    failures use LOG_SAMPLE_RATES for the error code, then for 'invalid'.
+    """
+    if outcome_name == VALID:
+        key_rate = getattr(api_key, 'log_sample_rate', None)
+        if key_rate is not None:
+            return key_rate
+        return settings.LOG_SAMPLE_RATES.get(VALID, 1.0)
+    rates = settings.LOG_SAMPLE_RATES
+    return rates.get(outcome_name, rates.get(INVALID, 1.0))
+
+
+def is_sampled(national_id: str, rate: float) -> bool:
+    """
+    Deterministic sampling decision for an ID
+
+    The same ID is always in or out of the sample for a given rate (and
+    LOG_SAMPLE_SALT), and every ID sampled at a rate is also sampled at any
+    higher rate.
+    """
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    digest = hashlib.blake2b(f'{settings.LOG_SAMPLE_SALT}:{national_id}'.encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'big') < rate * _HASH_RANGE
+
+
+_dropped = ApiKeyCounterBuffer(DroppedLogCount, ['api_key_id', 'date', 'outcome'],
+                               ['dropped'], interval=lambda: settings.USAGE_FLUSH_INTERVAL)
+
+
+def is_logged(national_id: str, result, api_key: Optional[ApiKey]) -> bool:
+    """Whether a result is in the log sample, without counting anything"""
+    return is_sampled(national_id, sample_rate(outcome(result), api_key))
+
+
+def count_dropped(result, api_key: Optional[ApiKey]) -> None:
+    """Count a result left out of the log in DroppedLogCount"""
+    if isinstance(api_key, ApiKey):
+        _dropped.add((api_key.pk, timezone.now().date(), outcome(result)), dropped=1)
+
+
+def should_log(national_id: str, result, api_key: Optional[ApiKey]) -> bool:
+    """Whether to log a result; counts it in DroppedLogCount when not."""
+    if is_logged(national_id, result, api_key):
+        return True
+    count_dropped(result, api_key)
+    return False
+
+
+def flush() -> None:
+    """Write this process's buffered dropped counts to the database now."""
+    _dropped.flush()
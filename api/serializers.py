@@ -1,6 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
+from .models import ApiKeyUsage, ValidationJob
 from .constants import NATIONAL_ID_LENGTH, ErrorMessages
 
+# Longest list item still validated and reported as an invalid ID; longer
+# ones reject the request rather than reach the Log table
+ID_ITEM_MAX_LENGTH = NATIONAL_ID_LENGTH + 10
+
 
 class NationalIDSerializer(serializers.Serializer):
     """Serializer for National ID validation requests"""
@@ -36,3 +42,74 @@ class NationalIDSerializer(serializers.Serializer):
             raise serializers.ValidationError(ErrorMessages.INVALID_LENGTH)
 
         return value
+
+
+class NationalIDBatchSerializer(serializers.Serializer):
+    """Serializer for multi-ID validation requests"""
+
+    national_ids = serializers.ListField(
+        child=serializers.CharField(allow_blank=True, max_length=ID_ITEM_MAX_LENGTH),
+        allow_empty=False,
+        help_text="Egyptian National IDs, each validated and reported separately"
+    )
+
+    def validate_national_ids(self, value):
+        """Limit the batch size to BATCH_MAX_IDS"""
+        if len(value) > settings.BATCH_MAX_IDS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.BATCH_MAX_IDS} elements.")
+        return value
+
+
+class ValidationJobSubmitSerializer(serializers.Serializer):
+    """Serializer for job submissions: a JSON list or an uploaded file"""
+
+    national_ids = serializers.ListField(
+        child=serializers.CharField(allow_blank=True, max_length=ID_ITEM_MAX_LENGTH),
+        required=False,
+        allow_empty=False,
+        help_text="National IDs to validate"
+    )
+    file = serializers.FileField(
+        required=False,
+        help_text="Text/CSV file with one national ID per line (first column)"
+    )
+
+    def validate(self, attrs):
+        """Require exactly one of national_ids and file"""
+        if ('national_ids' in attrs) == ('file' in attrs):
+            raise serializers.ValidationError(
+                "Provide either 'national_ids' or 'file'.")
+        return attrs
+
+
+class ValidationJobSerializer(serializers.ModelSerializer):
+    """Serializer for job status polling"""
+
+    class Meta:
+        model = ValidationJob
+        fields = ['id', 'status', 'total', 'processed', 'valid_count',
+                  'invalid_count', 'chunks_done', 'created_at', 'started_at',
+                  'finished_at', 'error']
+        read_only_fields = fields
+
+
+class ApiKeyUsageQuerySerializer(serializers.Serializer):
+    """Date range of a usage report, inclusive"""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("'start' must not be after 'end'.")
+        return attrs
+
+
+class ApiKeyUsageSerializer(serializers.ModelSerializer):
+    """Serializer for one day of API key usage"""
+
+    class Meta:
+        model = ApiKeyUsage
+        fields = ['date', 'requests', 'valid', 'invalid', 'throttled']
+        read_only_fields = fields
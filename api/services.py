@@ -1,10 +1,15 @@
 import logging
-from typing import Dict, Any, Optional, Tuple, NamedTuple
+from typing import Dict, Any, List, Optional, Sequence, Tuple, NamedTuple
 from django.db import IntegrityError, DatabaseError
 from .models import Log, ApiKey
+from .logsinks import write_logs
+from .sampling import should_log
 from .validators import validate_and_extract
 from .exceptions import NationalIDValidationError
-from .constants import ErrorMessages
+from rest_framework import status
+from .constants import NATIONAL_ID_LENGTH, ErrorMessages, ResponseMessages
+from .renderers import ConstantPayload
+from . import hotids, idstats, usage
 
 logger = logging.getLogger(__name__)
 
@@ -16,22 +21,54 @@ class ValidationResult(NamedTuple):
     error: Optional[str] = None
 
 
-def create_log(national_id: str, result: ValidationResult, api_key_obj: ApiKey) -> Optional[Log]:
-    """Create log entry for validation attempt."""
+def validation_result_payload(result: ValidationResult) -> Tuple[Dict[str, Any], int]:
+    """Response body and status for a processed validation result."""
+    if result.is_valid:
+        response_data = {"valid": True,
+                         "message": ResponseMessages.SUCCESS}
+        if result.data:
+            response_data.update(result.data)
+        return response_data, status.HTTP_200_OK
+    return ConstantPayload(
+        valid=False,
+        error=result.error or ResponseMessages.VALIDATION_FAILED
+    ), status.HTTP_400_BAD_REQUEST
+
+
+def batch_result(national_id: str, result: ValidationResult) -> Dict[str, Any]:
+    """Per-ID entry of a multi-ID response."""
+    response_data, _ = validation_result_payload(result)
+    return {"national_id": national_id, **response_data}
+
+
+def build_log(national_id: str, result: ValidationResult, api_key_obj: ApiKey) -> Log:
+    """Unsaved log entry for a validation attempt."""
+    # Use the key preview from the API key object
+    api_key_preview = api_key_obj.get_key_preview() if api_key_obj else "unknown"
+    return Log(
+        # Invalid input can be longer than the column
+        national_id=national_id[:NATIONAL_ID_LENGTH],
+        valid=result.is_valid,
+        extracted_data=result.data,
+        error=result.error,
+        api_key_used=api_key_preview
+    )
+
+
+def save_logs(logs: Sequence[Log]) -> bool:
+    """Write log entries, logging rather than raising on failure; returns whether they were written."""
     try:
-        # Use the key preview from the API key object
-        api_key_preview = api_key_obj.get_key_preview() if api_key_obj else "unknown"
+        write_logs(logs)
+        return True
+    except (IntegrityError, DatabaseError, OSError) as e:
+        logger.error(f"Failed to create {len(logs)} logs: {str(e)}")
+        return False
 
-        return Log.objects.create(
-            national_id=national_id,
-            valid=result.is_valid,
-            extracted_data=result.data,
-            error=result.error,
-            api_key_used=api_key_preview
-        )
-    except (IntegrityError, DatabaseError) as e:
-        logger.error(f"Failed to create log: {str(e)}")
-        return None
+
+def create_log(national_id: str, result: ValidationResult, api_key_obj: ApiKey) -> Optional[Log]:
+    """Create log entry for validation attempt."""
+    log_entry = build_log(national_id, result, api_key_obj)
+    return log_entry if save_logs([log_entry]) else None
 
 
 def validate_national_id(national_id: str) -> ValidationResult:
@@ -46,8 +83,43 @@ def validate_national_id(national_id: str) -> ValidationResult:
         return ValidationResult(False, error=ErrorMessages.VALIDATION_ERROR)
 
 
+def validate_and_sample(national_id: str, api_key_obj: ApiKey) -> Tuple[ValidationResult, Optional[Log]]:
+    """
+    Validate one ID and count it, with its unsaved log entry if sampled
+
+    The per-ID step of every endpoint: the ID is counted in the hot IDs and
+    per-ID statistics, and sampling decides whether it is logged. Callers
+    write the returned logs and record usage.
+    """
+    result = validate_national_id(national_id)
+    hotids.record(national_id)
+    idstats.record(national_id, result, api_key_obj)
+    log_entry = None
+    if should_log(national_id, result, api_key_obj):
+        log_entry = build_log(national_id, result, api_key_obj)
+    return result, log_entry
+
+
 def process_validation_request(national_id: str, api_key_obj: ApiKey) -> Tuple[ValidationResult, Optional[Log]]:
     """Process validation request including logging."""
-    result = validate_national_id(national_id)
-    log_entry = create_log(national_id, result, api_key_obj)
+    result, log_entry = validate_and_sample(national_id, api_key_obj)
+    if log_entry is not None and not save_logs([log_entry]):
+        log_entry = None
+    usage.record(api_key_obj, valid=int(result.is_valid), invalid=int(not result.is_valid))
     return result, log_entry
+
+
+def process_validation_batch(national_ids: Sequence[str], api_key_obj: ApiKey) -> List[ValidationResult]:
+    """Process several validation requests, writing their logs together."""
+    results = []
+    logs = []
+    for national_id in national_ids:
+        result, log_entry = validate_and_sample(national_id, api_key_obj)
+        results.append(result)
+        if log_entry is not None:
+            logs.append(log_entry)
+    if logs:
+        save_logs(logs)
+    valid_count = sum(result.is_valid for result in results)
+    usage.record(api_key_obj, valid=valid_count, invalid=len(results) - valid_count)
+    return results
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .keyfilter import invalidate_key_filter
+from .models import ApiKey
+
+
+@receiver(post_save, sender=ApiKey)
+@receiver(post_delete, sender=ApiKey)
+def api_key_changed(sender, **kwargs):
+    """Rebuild the API key filter when a key is added, changed or removed"""
+    invalidate_key_filter()
+    if transaction.get_connection().in_atomic_block:
+        # Other processes may rebuild from the old rows before this commits
+        transaction.on_commit(invalidate_key_filter)
@@ -0,0 +1,92 @@
+import calendar
+import datetime
+from django import template
+from django.db.models import Max, Min
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def bounded_date_hierarchy(cl):
+    """
+    Date drill-down built from Min/Max bounds
+
+    Django's date_hierarchy lists choices with SELECT DISTINCT over the
+    truncated dates, which scans the whole table. Here every level costs a
+    single indexed Min/Max lookup; periods inside the bounds are listed even
+    if they happen to have no rows.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f"{field_name}__year"
+    month_field = f"{field_name}__month"
+    day_field = f"{field_name}__day"
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f"{field_name}__"])
+
+    bounds = cl.queryset.order_by().aggregate(first=Min(field_name), last=Max(field_name))
+    if not (bounds['first'] and bounds['last']):
+        return {'show': False}
+    first = timezone.localtime(bounds['first']).date()
+    last = timezone.localtime(bounds['last']).date()
+
+    if not (year_lookup or month_lookup or day_lookup):
+        if first.year == last.year:
+            year_lookup = first.year
+            if first.month == last.month:
+                month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT'))}],
+        }
+    elif year_lookup and month_lookup:
+        year, month = int(year_lookup), int(month_lookup)
+        _, days_in_month = calendar.monthrange(year, month)
+        days = [datetime.date(year, month, d) for d in range(1, days_in_month + 1)]
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup,
+                                  day_field: day.day}),
+                    'title': capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                }
+                for day in days if first <= day <= last
+            ],
+        }
+    elif year_lookup:
+        year = int(year_lookup)
+        months = [datetime.date(year, m, 1) for m in range(1, 13)]
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': 'All dates'},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month.month}),
+                    'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months
+                if (first.year, first.month) <= (year, month.month) <= (last.year, last.month)
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(year)}), 'title': str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
@@ -3,8 +3,12 @@ from django.test import TestCase, RequestFactory
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.messages.middleware import MessageMiddleware
 from django.contrib.messages.storage.fallback import FallbackStorage
-from api.admin import ApiKeyAdmin
-from api.models import ApiKey
+from django.urls import reverse
+from django.utils import timezone
+from unittest.mock import patch
+from api.admin import ApiKeyAdmin, LogAdmin
+from api.models import ApiKey, Log
+from api.pagination import EstimatedCountPaginator
 
 
 class ApiKeyAdminTest(TestCase):
@@ -116,3 +120,67 @@ class ApiKeyAdminTest(TestCase):
         preview = self.admin.key_preview_display(api_key)
         self.assertTrue(preview.startswith('****'))
         self.assertEqual(len(preview), 8)  # 4 stars + 4 characters
+
+
+class LogAdminTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.site = AdminSite()
+        self.admin = LogAdmin(Log, self.site)
+        self.factory = RequestFactory()
+        self.user = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(self.user)
+        for i in range(5):
+            Log.objects.create(national_id=f"3030702010211{i}", valid=True,
+                               api_key_used="abcd")
+        Log.objects.create(national_id="29901010101010", valid=False,
+                           api_key_used="wxyz")
+
+    def _search(self, term):
+        request = self.factory.get('/')
+        qs, _ = self.admin.get_search_results(request, Log.objects.all(), term)
+        return qs
+
+    def test_search_exact_national_id(self):
+        self.assertEqual(self._search("30307020102113").count(), 1)
+
+    def test_search_national_id_prefix(self):
+        self.assertEqual(self._search("3030702").count(), 5)
+        self.assertEqual(self._search("299").count(), 1)
+
+    def test_search_api_key_preview(self):
+        self.assertEqual(self._search("wxyz").count(), 1)
+        self.assertEqual(self._search("wxy").count(), 0)
+
+    def test_changelist_defers_extracted_data(self):
+        response = self.client.get(reverse('admin:api_log_changelist'))
+        self.assertEqual(response.status_code, 200)
+        log = response.context['cl'].result_list[0]
+        self.assertIn('extracted_data', log.get_deferred_fields())
+
+    def test_keyset_pagination(self):
+        url = reverse('admin:api_log_changelist')
+        with patch.object(LogAdmin, 'list_per_page', 4):
+            first_page = self.client.get(url)
+            cl = first_page.context['cl']
+            self.assertIsNotNone(cl.next_cursor_url)
+            second_page = self.client.get(url + cl.next_cursor_url)
+
+        second = second_page.context['cl'].result_list
+        seen = {log.pk for log in cl.result_list}
+        self.assertEqual(len(second), 2)
+        self.assertFalse(seen & {log.pk for log in second})
+
+    def test_date_hierarchy_drilldown(self):
+        url = reverse('admin:api_log_changelist')
+        now = timezone.localtime()
+        response = self.client.get(url, {'timestamp__year': now.year,
+                                         'timestamp__month': now.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'timestamp__day={now.day}')
+
+    def test_paginator_count_is_bounded(self):
+        paginator = EstimatedCountPaginator(Log.objects.filter(valid=True), 2)
+        with patch.object(EstimatedCountPaginator, 'count_limit', 3):
+            self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_estimate)
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from api.archive import iter_segments, search_archive
+from api.models import Log
+
+
+class ArchiveLogsTest(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def _log(self, national_id, when, api_key="abcd", valid=True):
+        log = Log.objects.create(
+            national_id=national_id, valid=valid, api_key_used=api_key,
+            extracted_data={"gender": "Male"} if valid else None,
+            error=None if valid else "Invalid governorate code")
+        # timestamp is auto_now_add, so backdate it explicitly
+        Log.objects.filter(pk=log.pk).update(timestamp=when)
+        return log
+
+    def _archive(self, **options):
+        out = StringIO()
+        call_command('archive_logs', output_dir=str(self.root),
+                     older_than_days=30, stdout=out, **options)
+        return out.getvalue()
+
+    def test_archives_and_deletes_old_logs(self):
+        old = datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        self._log("30307020102113", old)
+        self._log("30307020102114", old + timedelta(days=1), valid=False)
+        recent = self._log("30307020102115", datetime.now(dt_timezone.utc))
+
+        output = self._archive()
+
+        self.assertIn('Archived 2 logs into 2 segments', output)
+        self.assertEqual(list(Log.objects.values_list('pk', flat=True)), [recent.pk])
+        indexes = [index for _, index in iter_segments(self.root)]
+        self.assertEqual([i['date'] for i in indexes], ['2024-01-10', '2024-01-11'])
+        self.assertEqual(indexes[0]['rows'], 1)
+        self.assertEqual(indexes[0]['api_keys'], ['abcd'])
+
+    def test_segment_size_splits_day(self):
+        old = datetime(2024, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        for offset in range(5):
+            self._log("30307020102113", old + timedelta(minutes=offset))
+
+        self._archive(segment_size=2)
+
+        rows = [index['rows'] for _, index in iter_segments(self.root)]
+        self.assertEqual(rows, [2, 2, 1])
+        self.assertFalse(Log.objects.exists())
+
+    def test_keep_leaves_rows(self):
+        self._log("30307020102113", datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        self._archive(keep=True)
+        self.assertEqual(Log.objects.count(), 1)
+        self.assertEqual(len(list(iter_segments(self.root))), 1)
+
+    def test_search_only_reads_relevant_segments(self):
+        self._log("30307020102113", datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        self._log("30307020102113", datetime(2024, 3, 5, tzinfo=dt_timezone.utc),
+                  api_key="wxyz")
+        self._archive()
+
+        found = list(search_archive(national_id="30307020102113", root=self.root,
+                                    start=date(2024, 3, 1), end=date(2024, 3, 31)))
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].api_key_used, "wxyz")
+        self.assertEqual(found[0].timestamp.month, 3)
+
+        with patch('api.archive._open') as mock_open:
+            list(search_archive(api_key="none", root=self.root))
+        mock_open.assert_not_called()
+
+    def test_zstd_requires_dependency(self):
+        with patch('api.archive.zstandard', None):
+            with self.assertRaises(CommandError):
+                self._archive(compression='zstd')
+
+    def test_admin_archive_search(self):
+        self._log("30307020102113", datetime(2024, 1, 10, tzinfo=dt_timezone.utc))
+        self._archive()
+        admin_user = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(admin_user)
+
+        with self.settings(LOG_ARCHIVE_DIR=str(self.root)):
+            response = self.client.get(reverse('admin:api_log_archive'),
+                                       {'national_id': '30307020102113'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['results']), 1)
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import patch
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from api import logsinks
+from api.breaker import CircuitBreaker
+from api.middleware import LoadSheddingMiddleware
+from api.models import Log
+
+
+def make_log(national_id="30307020102113", **kwargs):
+    return Log(national_id=national_id, valid=True, api_key_used="1234", **kwargs)
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        patcher = patch('api.breaker.time.monotonic', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(window=10, min_calls=4, failure_rate=0.5,
+                                      slow_call_seconds=1.0, open_seconds=30)
+
+    def test_opens_on_failure_rate(self):
+        for succeeded in (True, True, False):
+            self.assertEqual(self.breaker.record(succeeded, 0.1), CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.record(False, 0.1), CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(3):
+            self.breaker.record(True, 0.1)
+        for _ in range(3):
+            self.breaker.record(True, 2.0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial(self):
+        for _ in range(4):
+            self.breaker.record(False, 0.1)
+        self.clock.return_value += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # Only one trial at a time
+        self.assertEqual(self.breaker.record(False, 0.1), CircuitBreaker.OPEN)
+
+        self.clock.return_value += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.record(True, 0.1), CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+
+class CircuitBreakerLogSinkTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.inner = logsinks.DatabaseLogSink()
+        self.sink = logsinks.CircuitBreakerLogSink(
+            self.inner,
+            CircuitBreaker(window=10, min_calls=2, failure_rate=0.5,
+                           slow_call_seconds=1.0, open_seconds=0),
+            logsinks.JSONLFileLogSink(self.directory, max_bytes=1024 * 1024, max_age=3600,
+                                      buffer_rows=1),
+            replay_interval=3600, replay_in_background=False,
+        )
+
+    def test_spills_while_failing_and_replays_on_recovery(self):
+        logged_at = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        with patch.object(self.inner, 'write', side_effect=DatabaseError("down")):
+            self.sink.write([make_log(timestamp=logged_at)])
+            self.sink.write([make_log("29001011234567"), make_log("29001011234568")])
+        self.assertEqual(self.sink.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.sink.queue_depth(), 3)
+        self.assertFalse(Log.objects.exists())
+
+        # The trial write succeeds, closing the breaker and replaying the spill
+        self.sink.write([make_log("29001011234569")])
+        self.assertEqual(self.sink.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(Log.objects.count(), 4)
+        self.assertEqual(Log.objects.get(timestamp=logged_at).national_id, "30307020102113")
+        self.assertEqual(self.sink.queue_depth(), 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_failed_replay_keeps_the_file(self):
+        with patch.object(self.inner, 'write', side_effect=DatabaseError("down")):
+            self.sink.write([make_log()])
+            self.sink.spill.close()
+            self.assertEqual(self.sink.replay(), 0)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(self.sink.replay(), 1)
+        self.assertEqual(Log.objects.count(), 1)
+
+    @override_settings(LOAD_SHED_MAX_LOG_QUEUE=2)
+    def test_shed_traffic_recovers_through_periodic_replay(self):
+        with patch.object(self.inner, 'write', side_effect=DatabaseError("down")):
+            self.sink.write([make_log()])
+            self.sink.write([make_log("29001011234567"), make_log("29001011234568")])
+        self.assertEqual(self.sink.breaker.state, CircuitBreaker.OPEN)
+        middleware = LoadSheddingMiddleware(lambda request: HttpResponse("ok"))
+        request = RequestFactory().post('/api/national-id/')
+        with patch('api.middleware.log_queue_depth', self.sink.queue_depth):
+            self.assertEqual(middleware(request).status_code, 503)
+
+            # No request reaches the sink; the replay thread's tick lets the
+            # trial call through the breaker on its own
+            self.sink.replay_pending()
+            self.assertEqual(self.sink.breaker.state, CircuitBreaker.CLOSED)
+            self.assertEqual(Log.objects.count(), 3)
+            self.assertEqual(middleware(request).status_code, 200)
+
+    @patch.object(logsinks, 'SPILL_CHECK_INTERVAL', 0)
+    def test_backlog_counts_files_on_disk(self):
+        with patch.object(self.inner, 'write', side_effect=DatabaseError("down")):
+            self.sink.write([make_log(), make_log("29001011234567")])
+        self.sink.spill.close()
+        other = logsinks.JSONLFileLogSink(self.directory, max_bytes=1024 * 1024,
+                                          max_age=3600, buffer_rows=1)
+        other.write([make_log("29001011234568")])
+        other.close()
+        self.assertEqual(self.sink.queue_depth(), 3)
+
+        # Files replayed or removed by another process stop counting
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        self.assertEqual(self.sink.queue_depth(), 0)
+
+    def test_failed_write_inside_transaction_is_contained(self):
+        with transaction.atomic():
+            with patch.object(Log, 'save', side_effect=DatabaseError("down")):
+                self.sink.write([make_log()])
+            Log.objects.create(national_id="29001011234567", valid=True, api_key_used="1234")
+        self.assertEqual(Log.objects.count(), 1)
+
+
+@override_settings(LOAD_SHED_MAX_IN_FLIGHT=2, LOAD_SHED_MAX_LOG_QUEUE=10,
+                   LOAD_SHED_RETRY_AFTER=5)
+class LoadSheddingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = LoadSheddingMiddleware(lambda request: HttpResponse("ok"))
+
+    def _call(self, path='/api/national-id/'):
+        return self.middleware(self.factory.post(path))
+
+    def test_sheds_when_too_many_in_flight(self):
+        self.assertEqual(self._call().status_code, 200)
+        self.assertEqual(self.middleware.in_flight, 0)
+
+        self.middleware.in_flight = 3
+        response = self._call()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '8')
+        self.assertIn('overloaded', json.loads(response.content)['detail'])
+        self.assertEqual(self._call('/').status_code, 200)
+
+    def test_sheds_when_log_queue_is_deep(self):
+        with patch('api.middleware.log_queue_depth', return_value=20):
+            response = self._call()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '10')
+
+    @override_settings(LOAD_SHED_ENABLED=False)
+    def test_disabled(self):
+        self.middleware.in_flight = 3
+        self.assertEqual(self._call().status_code, 200)
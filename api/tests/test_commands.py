@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from http.client import HTTPConnection
+from io import StringIO
+from wsgiref.simple_server import make_server
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from api.keyfilter import key_filter
+from api.management.commands.benchmark_api import (Command as BenchmarkCommand,
+                                                   PooledWSGIServer, QuietRequestHandler)
+from api.models import ApiKey, Log
+
+
+class CreateApiKeyCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.output = os.path.join(self.tmpdir, 'keys.csv')
+        cache.clear()
+
+    def _call(self, *args):
+        call_command('create_api_key', *args, stdout=StringIO())
+
+    def _rows(self):
+        with open(self.output, newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_single_key(self):
+        out = StringIO()
+        call_command('create_api_key', 'partner', stdout=out)
+        api_key = out.getvalue().split('API Key: ')[1].split()[0]
+        self.assertEqual(len(api_key), 32)
+        self.assertEqual(ApiKey.authenticate(api_key).user, 'partner')
+
+    def test_count(self):
+        self._call('partner', '--count', '25', '--output', self.output)
+        rows = self._rows()
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(ApiKey.objects.filter(user='partner').count(), 25)
+        self.assertEqual(stat.S_IMODE(os.stat(self.output).st_mode), 0o600)
+        # The filter was rebuilt with the new keys
+        self.assertFalse(key_filter.is_known_invalid(ApiKey.hash_key(rows[0]['api_key'])))
+        self.assertEqual(ApiKey.authenticate(rows[0]['api_key']).user, 'partner')
+
+    def test_from_file(self):
+        users_file = os.path.join(self.tmpdir, 'users.txt')
+        with open(users_file, 'w') as f:
+            f.write('alpha\n\nbeta, inc\n')
+        self._call('--from-file', users_file, '--output', self.output)
+        rows = self._rows()
+        self.assertEqual([row['user'] for row in rows], ['alpha', 'beta, inc'])
+        self.assertEqual(ApiKey.authenticate(rows[1]['api_key']).user, 'beta, inc')
+
+    def test_refuses_existing_output(self):
+        open(self.output, 'w').close()
+        with self.assertRaises(CommandError):
+            self._call('partner', '--count', '2', '--output', self.output)
+        with self.assertRaises(CommandError):
+            self._call('partner', '--count', '2')
+        self.assertFalse(ApiKey.objects.exists())
+
+
+class ProfileMemoryCommandTest(TestCase):
+    def test_report(self):
+        out = StringIO()
+        call_command('profile_memory', iterations=3, rounds=2, warmup=1, top=2, no_throttle=True,
+                     stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(list(report['stages']), ['validator', 'serializer', 'view'])
+        view = report['stages']['view']
+        self.assertEqual(len(view['retained_bytes_per_round']), 2)
+        self.assertGreater(view['peak_bytes_per_request']['max'], 0)
+        self.assertLessEqual(len(view['top_lines']), 2)
+        # The temporary key and its logs are removed
+        self.assertFalse(ApiKey.objects.filter(user='profile_memory').exists())
+        self.assertFalse(Log.objects.exists())
+        self.assertTrue(settings.API_KEY_THROTTLE_ENABLED)
+
+    def test_unknown_stage(self):
+        with self.assertRaisesMessage(CommandError, "Unknown stages: parser"):
+            call_command('profile_memory', stages='validator,parser', stdout=StringIO())
+
+
+class BenchmarkApiCommandTest(TestCase):
+    def test_rejects_no_requests(self):
+        with self.assertRaisesMessage(CommandError, "--requests must be at least 1"):
+            call_command('benchmark_api', requests=0, stdout=StringIO())
+        self.assertFalse(ApiKey.objects.exists())
+
+    def test_percentiles_of_small_samples(self):
+        command = BenchmarkCommand()
+        self.assertEqual(command._percentile([0.5], 0.99), 0.5)
+        self.assertEqual(command._percentile([0.1, 0.2, 0.3], 0.95), 0.3)
+        self.assertEqual(command._percentile([i / 1000 for i in range(1, 1001)], 0.95), 0.95)
+
+    def test_server_reuses_worker_threads(self):
+        threads = set()
+
+        def application(environ, start_response):
+            threads.add(threading.get_ident())
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        server = make_server('127.0.0.1', 0, application, server_class=PooledWSGIServer,
+                             handler_class=QuietRequestHandler)
+        server.start_workers(2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            for _ in range(6):
+                connection = HTTPConnection('127.0.0.1', server.server_port)
+                connection.request('GET', '/')
+                self.assertEqual(connection.getresponse().read(), b'ok')
+                connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertLessEqual(len(threads), 2)
+        self.assertFalse(any(worker.is_alive() for worker in server._workers))
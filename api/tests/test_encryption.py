@@ -0,0 +1,64 @@
+from io import StringIO
+from cryptography.fernet import Fernet
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from api import encryption
+from api.models import ApiKey
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+
+
+class KeyringTest(TestCase):
+    def test_keyring_is_cached(self):
+        self.assertIs(encryption.get_keyring(), encryption.get_keyring())
+
+    @override_settings(ENCRYPTION_KEY=None)
+    def test_missing_key_falls_back_to_derived_key(self):
+        token = encryption.encrypt("secret")
+        encryption.get_keyring.cache_clear()
+        encryption.primary_cipher.cache_clear()
+        self.assertEqual(encryption.decrypt(token), "secret")
+        self.assertEqual(Fernet(encryption.derived_key()).decrypt(token.encode()), b"secret")
+
+    def test_previous_keys_decrypt(self):
+        with self.settings(ENCRYPTION_KEY=OLD_KEY):
+            token = encryption.encrypt("secret")
+        with self.settings(ENCRYPTION_KEY=NEW_KEY, ENCRYPTION_KEYS_PREVIOUS=[OLD_KEY]):
+            self.assertEqual(encryption.decrypt(token), "secret")
+            self.assertFalse(encryption.is_current(token))
+
+
+class RotateEncryptionKeyTest(TestCase):
+    def _create(self, count):
+        api_keys = []
+        for i in range(count):
+            api_key = ApiKey(user=f"user{i}")
+            api_key.set_key(f"test_key_{i}_12345678901234567890")
+            api_key.save()
+            api_keys.append(api_key)
+        return api_keys
+
+    def _rotate(self, *args):
+        out = StringIO()
+        call_command('rotate_encryption_key', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_rotates_in_batches_and_resumes(self):
+        with self.settings(ENCRYPTION_KEY=OLD_KEY):
+            api_keys = self._create(5)
+            ApiKey.objects.filter(pk=api_keys[-1].pk).update(encrypted_key="garbage")
+
+        with self.settings(ENCRYPTION_KEY=NEW_KEY, ENCRYPTION_KEYS_PREVIOUS=[OLD_KEY]):
+            # An interrupted run that only reached the second key
+            output = self._rotate('--batch-size', '2', '--after', str(api_keys[2].pk))
+            self.assertIn('Re-encrypted 1 API keys, 0 already current, 1 unreadable', output)
+
+            output = self._rotate('--batch-size', '2')
+            self.assertIn('Re-encrypted 3 API keys, 1 already current, 1 unreadable', output)
+
+        with self.settings(ENCRYPTION_KEY=NEW_KEY):
+            for i, api_key in enumerate(api_keys[:4]):
+                api_key.refresh_from_db()
+                self.assertEqual(encryption.decrypt(api_key.encrypted_key),
+                                 f"test_key_{i}_12345678901234567890")
@@ -0,0 +1,124 @@
+import json
+from datetime import date
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.constants import ErrorCodes
+from api.formats import columnar, compact_result, decode_binary, encode_binary
+from api.models import ApiKey, Log
+
+VALID = {"valid": True, "message": "Validation successful", "birth_year": 2003,
+         "birth_date": "02/07/2003", "gender": "Male", "governorate": "Cairo"}
+INVALID = {"valid": False, "error": "Invalid governorate code"}
+
+COMPACT_JSON = 'application/vnd.id-validator.compact+json'
+BINARY = 'application/vnd.id-validator.binary'
+
+
+class CompactFormatTest(TestCase):
+    def test_compact_result(self):
+        self.assertEqual(compact_result(VALID), {
+            "valid": True, "birth_date": "2003-07-02", "gender": "M", "governorate": 1})
+        self.assertEqual(compact_result(VALID, 'ordinal')['birth_date'],
+                         date(2003, 7, 2).toordinal())
+        self.assertEqual(compact_result(INVALID),
+                         {"valid": False, "error": ErrorCodes.INVALID_GOVERNORATE})
+        self.assertEqual(compact_result({"valid": False, "error": "Something new"})['error'],
+                         "Something new")
+
+    def test_columnar(self):
+        results = [{"national_id": "30307020102113", **VALID},
+                   {"national_id": "30307029902113", **INVALID}]
+        self.assertEqual(columnar(results), {
+            "national_id": ["30307020102113", "30307029902113"],
+            "valid": [True, False],
+            "error": [None, ErrorCodes.INVALID_GOVERNORATE],
+            "birth_date": ["2003-07-02", None],
+            "gender": ["M", None],
+            "governorate": [1, None],
+        })
+
+    def test_binary_round_trip(self):
+        batch = {"results": [{"national_id": "30307020102113", **VALID},
+                             {"national_id": "x", "valid": False, "error": "Something new"}]}
+        self.assertEqual(decode_binary(encode_binary(batch)), [
+            {"national_id": "30307020102113", **compact_result(VALID, 'ordinal')},
+            {"national_id": "x", "valid": False, "error": "Something new"},
+        ])
+        self.assertEqual(decode_binary(encode_binary(INVALID)),
+                         [compact_result(INVALID)])
+        self.assertEqual(decode_binary(encode_binary({"detail": "Invalid API Key"})),
+                         [{"detail": "Invalid API Key"}])
+        self.assertLess(len(encode_binary(VALID)), len(json.dumps(VALID)) // 4)
+
+
+class NegotiationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.test_key = "test_key_12345678901234567890"
+        api_key = ApiKey.objects.create(user="testuser", is_active=True)
+        api_key.set_key(self.test_key)
+        api_key.save()
+        self.client.credentials(HTTP_X_API_KEY=self.test_key)
+        cache.clear()
+
+    def post(self, url_name, data, **extra):
+        return self.client.post(reverse(url_name), data, format='json', **extra)
+
+    def test_default_format_unchanged(self):
+        response = self.post('national_id', {"national_id": "30307020102113"})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), VALID)
+
+    def test_compact_json(self):
+        response = self.post('national_id', {"national_id": "30307020102113"},
+                             HTTP_ACCEPT=f'{COMPACT_JSON}; dates=ordinal')
+        self.assertEqual(response['Content-Type'], COMPACT_JSON)
+        self.assertEqual(json.loads(response.content), compact_result(VALID, 'ordinal'))
+
+        response = self.client.post(reverse('national_id') + '?format=compact',
+                                    {"national_id": "40307020102113"}, format='json')
+        self.assertEqual(json.loads(response.content),
+                         {"valid": False, "error": ErrorCodes.INVALID_CENTURY})
+
+    def test_batch(self):
+        ids = ["30307020102113", "30307029902113", "123"]
+        response = self.post('national_id_batch', {"national_ids": ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['national_id'] for r in response.data['results']], ids)
+        self.assertEqual(Log.objects.count(), 3)
+
+        response = self.post('national_id_batch', {"national_ids": ids},
+                             HTTP_ACCEPT=COMPACT_JSON)
+        columns = json.loads(response.content)
+        self.assertEqual(columns['valid'], [True, False, False])
+        self.assertEqual(columns['error'], [None, ErrorCodes.INVALID_GOVERNORATE,
+                                            ErrorCodes.INVALID_LENGTH])
+
+        response = self.post('national_id_batch', {"national_ids": ids}, HTTP_ACCEPT=BINARY)
+        self.assertEqual(response['Content-Type'], BINARY)
+        self.assertEqual([r['valid'] for r in decode_binary(response.content)],
+                         [True, False, False])
+
+    @override_settings(BATCH_MAX_IDS=2)
+    def test_batch_size_limit(self):
+        response = self.post('national_id_batch', {"national_ids": ["1", "2", "3"]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('national_ids', response.data['details'])
+
+    def test_batch_item_length(self):
+        response = self.post('national_id_batch', {"national_ids": ["1" * 20]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Log.objects.get().national_id, "1" * 14)
+
+        response = self.post('national_id_batch', {"national_ids": ["1" * 100]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('national_ids', response.data['details'])
+
+    def test_errors_in_binary(self):
+        self.client.credentials(HTTP_X_API_KEY="invalid_key")
+        response = self.post('national_id', {"national_id": "30307020102113"},
+                             HTTP_ACCEPT=BINARY)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(decode_binary(response.content), [{"detail": "Invalid API Key"}])
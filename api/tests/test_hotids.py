@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+from api import hotids
+from api.hotids import CountMinSketch, HotIDTracker
+from api.models import ApiKey
+from api.services import process_validation_request
+
+VALID_ID = "30307020102113"
+
+
+class CountMinSketchTest(TestCase):
+    def test_estimates_never_undercount(self):
+        sketch = CountMinSketch(width=64, depth=4)
+        for i in range(500):
+            sketch.add(f"id-{i % 50}")
+        self.assertTrue(all(sketch.estimate(f"id-{i}") >= 10 for i in range(50)))
+        self.assertEqual(sketch.add("id-0", 5), sketch.estimate("id-0"))
+
+    def test_merge_and_round_trip(self):
+        first, second = CountMinSketch(256, 4), CountMinSketch(256, 4)
+        first.add("a", 3)
+        second.add("a", 4)
+        merged = CountMinSketch.from_dict(first.to_dict())
+        merged.merge(second)
+        self.assertEqual(merged.estimate("a"), 7)
+        with self.assertRaises(ValueError):
+            merged.merge(CountMinSketch(128, 4))
+
+
+@override_settings(HOT_ID_SKETCH_WIDTH=1024, HOT_ID_TOP_K=3, HOT_ID_THRESHOLD=5,
+                   HOT_ID_PUBLISH_INTERVAL=3600)
+class HotIDTrackerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch('api.hotids.time.time', return_value=1_000_020.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.worker = HotIDTracker('worker-1')
+        self.other = HotIDTracker('worker-2')
+
+    def _record(self, tracker, national_id, times):
+        for _ in range(times):
+            tracker.record(national_id)
+
+    def test_top_k_keeps_the_most_frequent(self):
+        self._record(self.worker, "1", 1)
+        self._record(self.worker, "2", 2)
+        self._record(self.worker, "3", 3)
+        self._record(self.worker, "4", 4)
+        self.assertEqual(self.worker.top(), [("4", 4), ("3", 3), ("2", 2)])
+
+    @override_settings(HOT_ID_TOP_K=2)
+    def test_light_id_does_not_evict_heavy_ones(self):
+        self._record(self.worker, "A", 100)
+        self._record(self.worker, "B", 90)
+        self._record(self.worker, "C", 1)
+        self.assertEqual(self.worker.top(), [("A", 100), ("B", 90)])
+
+    def test_merged_across_workers(self):
+        self._record(self.worker, "1", 3)
+        self._record(self.other, "1", 3)
+        self._record(self.other, "2", 4)
+        self.assertFalse(self.worker.is_hot("1"))
+
+        self.other.publish()
+        self.worker.publish()
+        self.assertTrue(self.worker.is_hot("1"))
+        self.assertEqual(self.worker.top(), [("1", 6), ("2", 4)])
+
+    def test_lost_registration_is_restored_on_publish(self):
+        self._record(self.other, "1", 3)
+        self.other.publish()
+        self.worker.publish()
+        # A concurrent read-modify-write of the worker set dropped worker-2
+        cache.set(hotids.WORKERS_KEY, {'worker-1'}, timeout=None)
+        self.assertEqual(self.worker.top(), [])
+
+        self.other.publish()
+        self.assertEqual(cache.get(hotids.WORKERS_KEY), {'worker-1', 'worker-2'})
+        self.assertEqual(self.worker.top(), [("1", 3)])
+
+    def test_new_window_starts_empty(self):
+        self._record(self.worker, "1", 5)
+        self.assertTrue(self.worker.is_hot("1"))
+        self.clock.return_value += 300
+        self.assertFalse(self.worker.is_hot("1"))
+        self.worker.record("2")
+        self.assertEqual(self.worker.top(), [("2", 1)])
+
+
+@override_settings(HOT_ID_PUBLISH_INTERVAL=3600)
+class HotIDViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        hotids.hot_ids.reset()
+        self.api_key = ApiKey(user="testuser")
+        self.api_key.set_key("test_key_12345678901234567890")
+        self.api_key.save()
+        for _ in range(3):
+            process_validation_request(VALID_ID, self.api_key)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        data = self.client.get(url).json()
+        self.assertEqual(data['hot_ids'], [{"national_id": VALID_ID, "count": 3}])
+        self.assertIn('api_key_filter_rejected', data['counters'])
+
+    @override_settings(ROOT_URLCONF='id_validator.urls_api')
+    def test_metrics_endpoint_not_on_api_nodes(self):
+        with self.assertRaises(NoReverseMatch):
+            reverse('metrics')
+
+    def test_uploads_and_jobs_are_counted(self):
+        headers = {'X-API-Key': "test_key_12345678901234567890"}
+        response = self.client.post(reverse('national_id_csv'), f"{VALID_ID}\n{VALID_ID}",
+                                    content_type='text/csv', headers=headers)
+        b''.join(response.streaming_content)
+        job_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, job_dir)
+        with override_settings(JOB_DIR=job_dir, JOB_WORKERS=0):
+            response = self.client.post(reverse('validation_jobs'), {"national_ids": [VALID_ID]},
+                                        content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(hotids.hot_ids.top(), [(VALID_ID, 6)])
+
+    def test_admin_page(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        response = self.client.get(reverse('admin:api_log_hot_ids'))
+        self.assertContains(response, VALID_ID)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from api import idstats
+from api.models import ApiKey, NationalIDStats
+from api.services import ValidationResult, process_validation_request
+
+VALID_ID = "30307020102113"
+INVALID_ID = "30307029902113"
+
+
+@override_settings(NATIONAL_ID_STATS_ENABLED=True, NATIONAL_ID_STATS_FLUSH_INTERVAL=3600)
+class NationalIDStatsTest(TestCase):
+    def setUp(self):
+        idstats.flush()
+        self.api_key = ApiKey(user="testuser")
+        self.api_key.set_key("test_key_12345678901234567890")
+        self.api_key.save()
+
+    def test_repeated_validations_share_a_row(self):
+        for _ in range(3):
+            process_validation_request(VALID_ID, self.api_key)
+        process_validation_request(INVALID_ID, self.api_key)
+        self.assertFalse(NationalIDStats.objects.exists())
+
+        idstats.flush()
+        stats = NationalIDStats.objects.get(national_id=VALID_ID)
+        self.assertEqual((stats.count, stats.last_outcome), (3, 'valid'))
+        self.assertLessEqual(stats.first_seen, stats.last_seen)
+        self.assertEqual(NationalIDStats.objects.get(national_id=INVALID_ID).last_outcome,
+                         'invalid_governorate')
+
+    def test_flushes_keep_first_seen_and_update_the_rest(self):
+        start = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        idstats.record(VALID_ID, ValidationResult(True), self.api_key, when=start)
+        idstats.flush()
+        later = start + timedelta(hours=1)
+        idstats.record(VALID_ID, ValidationResult(True), self.api_key, when=later)
+        idstats.record(VALID_ID, ValidationResult(False, error="x"), self.api_key, when=later)
+        idstats.flush()
+
+        stats = NationalIDStats.objects.get()
+        self.assertEqual((stats.first_seen, stats.last_seen), (start, later))
+        self.assertEqual((stats.count, stats.last_outcome), (3, 'validation_error'))
+
+    def test_older_flush_does_not_overwrite_newer_values(self):
+        # Another worker's buffer holding older validations flushes last
+        start = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        later = start + timedelta(hours=1)
+        idstats.record(VALID_ID, ValidationResult(True), self.api_key, when=later)
+        idstats.flush()
+        idstats.record(VALID_ID, ValidationResult(False, error="x"), self.api_key,
+                       when=start + timedelta(minutes=1))
+        idstats.record(VALID_ID, ValidationResult(False, error="x"), self.api_key, when=start)
+        idstats.flush()
+
+        stats = NationalIDStats.objects.get()
+        self.assertEqual((stats.first_seen, stats.last_seen), (start, later))
+        self.assertEqual((stats.count, stats.last_outcome), (3, 'valid'))
+
+    def test_failed_flush_is_retried(self):
+        start = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        idstats.record(VALID_ID, ValidationResult(True), self.api_key, when=start)
+        with patch('api.bulk.bulk_increment', side_effect=DatabaseError("down")):
+            idstats.flush()
+        idstats.record(VALID_ID, ValidationResult(True), self.api_key,
+                       when=start + timedelta(minutes=1))
+        idstats.flush()
+        stats = NationalIDStats.objects.get()
+        self.assertEqual((stats.count, stats.first_seen), (2, start))
+
+    @override_settings(NATIONAL_ID_STATS_ENABLED=False)
+    def test_disabled(self):
+        process_validation_request(VALID_ID, self.api_key)
+        idstats.flush()
+        self.assertFalse(NationalIDStats.objects.exists())
@@ -0,0 +1,135 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import hotids, jobs, sampling
+from api.models import ApiKey, DroppedLogCount, Log, ValidationJob
+
+IDS = ["30307020102113", "30307029902113", "123", "29001011234567", "30307020102114"]
+
+
+class ValidationJobTest(TestCase):
+    def setUp(self):
+        self.job_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.job_dir)
+        settings_override = override_settings(JOB_DIR=self.job_dir, JOB_WORKERS=0,
+                                              JOB_CHUNK_SIZE=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.test_key = "test_key_12345678901234567890"
+        self.api_key = self._key(self.test_key)
+        self.client.credentials(HTTP_X_API_KEY=self.test_key)
+        cache.clear()
+
+    def _key(self, raw):
+        api_key = ApiKey(user="testuser")
+        api_key.set_key(raw)
+        api_key.save()
+        return api_key
+
+    def _results(self, job_id):
+        response = self.client.get(reverse('validation_job_results', args=[job_id]))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_submit_poll_and_download(self):
+        response = self.client.post(reverse('validation_jobs'), {"national_ids": IDS},
+                                    format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertEqual(response['Location'], reverse('validation_job', args=[job_id]))
+
+        response = self.client.get(reverse('validation_job', args=[job_id]))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['processed'], 5)
+        self.assertEqual(response.data['chunks_done'], 3)
+        self.assertEqual(response.data['valid_count'] + response.data['invalid_count'], 5)
+
+        results = self._results(job_id)
+        self.assertEqual([r['national_id'] for r in results], IDS)
+        self.assertTrue(results[0]['valid'])
+        self.assertEqual(results[0]['governorate'], 'Cairo')
+        self.assertEqual(Log.objects.count(), 5)
+
+    def test_submit_file(self):
+        upload = SimpleUploadedFile("ids.csv", b"30307020102113,first\r\n\r\n\"123\"\n")
+        response = self.client.post(reverse('validation_jobs'), {"file": upload},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual([r['national_id'] for r in self._results(response.data['id'])],
+                         ["30307020102113", "123"])
+
+    def test_rejects_empty_or_ambiguous_input(self):
+        url = reverse('validation_jobs')
+        upload = SimpleUploadedFile("ids.csv", b"\n \n")
+        self.assertEqual(self.client.post(url, {"file": upload}, format='multipart').status_code,
+                         400)
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 400)
+        self.assertFalse(ValidationJob.objects.exists())
+
+    def test_jobs_are_private_to_their_key(self):
+        response = self.client.post(reverse('validation_jobs'), {"national_ids": IDS},
+                                    format='json')
+        self._key("other_key_12345678901234567890")
+        self.client.credentials(HTTP_X_API_KEY="other_key_12345678901234567890")
+        response = self.client.get(reverse('validation_job', args=[response.data['id']]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_resume_after_crash(self):
+        job = ValidationJob(api_key=self.api_key, chunk_size=2)
+        job.total = jobs.write_input(job, IDS)
+        job.save()
+
+        # A worker commits one chunk, then dies
+        self.assertTrue(jobs.claim_job(job.pk, 'crashed'))
+        crashed = ValidationJob.objects.select_related('api_key').get(pk=job.pk)
+        self.assertTrue(jobs.process_chunk(crashed, 'crashed'))
+        self.assertFalse(jobs.run_job(job.pk))  # Still leased to the dead worker
+
+        ValidationJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.claimable_job_ids(), [job.pk])
+        self.assertTrue(jobs.run_job(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.chunks_done), ('completed', 5, 3))
+        self.assertEqual(Log.objects.count(), 5)
+        self.assertEqual([r['national_id'] for r in self._results(job.pk)], IDS)
+        # The dead worker can no longer commit
+        self.assertFalse(jobs.process_chunk(crashed, 'crashed'))
+        self.assertEqual(Log.objects.count(), 5)
+
+    @override_settings(LOG_SAMPLE_RATES={'valid': 0.0})
+    def test_only_committed_chunks_are_counted(self):
+        hotids.hot_ids.reset()
+        sampling.flush()
+        job = ValidationJob(api_key=self.api_key, chunk_size=2)
+        job.total = jobs.write_input(job, IDS)
+        job.save()
+        self.assertTrue(jobs.claim_job(job.pk, 'slow'))
+        slow = ValidationJob.objects.select_related('api_key').get(pk=job.pk)
+        ValidationJob.objects.filter(pk=job.pk).update(worker='other')
+
+        # The chunk is validated but its worker lost the lease
+        self.assertFalse(jobs.process_chunk(slow, 'slow'))
+        sampling.flush()
+        self.assertEqual(hotids.hot_ids.top(), [])
+        self.assertFalse(DroppedLogCount.objects.exists())
+        self.assertFalse(Log.objects.exists())
+
+        ValidationJob.objects.filter(pk=job.pk).update(worker='slow')
+        self.assertTrue(jobs.process_chunk(slow, 'slow'))
+        sampling.flush()
+        # The chunk's first ID is valid and left out of the sample
+        self.assertEqual(DroppedLogCount.objects.get().dropped, 1)
+        self.assertEqual(list(Log.objects.values_list('national_id', flat=True)), [IDS[1]])
+        self.assertEqual(len(hotids.hot_ids.top()), 2)
@@ -0,0 +1,127 @@
+import secrets
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from rest_framework.exceptions import AuthenticationFailed
+from api import metrics
+from api.authentication import ApiKeyAuthentication
+from api.keyfilter import METRIC_NAMES, BloomFilter, build_filter, cache_is_shared, key_filter
+from api.models import ApiKey
+
+
+class BloomFilterTest(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        members = [ApiKey.hash_key(f"key-{i}") for i in range(1000)]
+        bloom = build_filter(members)
+        self.assertTrue(all(key_hash in bloom for key_hash in members))
+
+        others = [ApiKey.hash_key(f"other-{i}") for i in range(10000)]
+        false_positives = sum(key_hash in bloom for key_hash in others)
+        self.assertLess(false_positives, 50)
+
+    def test_round_trip(self):
+        bloom = build_filter([ApiKey.hash_key("a")])
+        copy = BloomFilter.from_dict(bloom.to_dict())
+        self.assertIn(ApiKey.hash_key("a"), copy)
+        self.assertEqual((copy.size, copy.hashes), (bloom.size, bloom.hashes))
+
+
+class KeyFilterAuthenticationTest(TestCase):
+    def setUp(self):
+        # As with a Redis or Memcached cache shared by every process
+        patcher = patch('api.keyfilter.cache_is_shared', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        key_filter.reset()
+        metrics.flush()
+        cache.clear()
+        self.factory = RequestFactory()
+        self.auth = ApiKeyAuthentication()
+        self.test_key = "test_key_12345678901234567890"
+        self.api_key = ApiKey(user="testuser")
+        self.api_key.set_key(self.test_key)
+        self.api_key.save()
+
+    def _authenticate(self, raw_key):
+        return self.auth.authenticate(self.factory.get('/', HTTP_X_API_KEY=raw_key))
+
+    def _counts(self):
+        return metrics.get_counts(METRIC_NAMES)
+
+    def test_unknown_keys_rejected_without_queries(self):
+        self._authenticate(self.test_key)  # Build the filter
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                with self.assertRaises(AuthenticationFailed):
+                    self._authenticate(secrets.token_urlsafe(24))
+        self.assertEqual(self._counts()['api_key_filter_rejected'], 20)
+
+    def test_key_changes_rebuild_the_filter(self):
+        self._authenticate(self.test_key)
+        self.api_key.is_active = False
+        self.api_key.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(self.test_key)
+
+        new_key = ApiKey(user="newuser")
+        new_key.set_key("new_key_12345678901234567890")
+        new_key.save()
+        self.assertEqual(self._authenticate("new_key_12345678901234567890")[0], new_key)
+
+    def test_negative_cache_skips_repeat_lookups(self):
+        self._authenticate(self.test_key)
+        with patch.object(BloomFilter, '__contains__', return_value=True):
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    with self.assertRaises(AuthenticationFailed):
+                        self._authenticate("false_positive_key_1234567890")
+        counts = self._counts()
+        self.assertEqual(counts['api_key_filter_false_positives'], 1)
+        self.assertEqual(counts['api_key_negative_cache_hits'], 2)
+
+    def test_disabled(self):
+        with self.settings(API_KEY_FILTER_ENABLED=False):
+            with self.assertNumQueries(1):
+                with self.assertRaises(AuthenticationFailed):
+                    self._authenticate("unknown_key_12345678901234567890")
+
+
+class PerProcessCacheKeyFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        key_filter.reset()
+        self.auth = ApiKeyAuthentication()
+        self.factory = RequestFactory()
+
+    def _authenticate(self, raw_key):
+        return self.auth.authenticate(self.factory.get('/', HTTP_X_API_KEY=raw_key))
+
+    def test_keys_created_by_other_processes_are_accepted(self):
+        self.assertFalse(cache_is_shared())
+        key_filter.warm()
+        # Created elsewhere: this process's cache never hears of it
+        other = ApiKey(user="admin-node")
+        other.set_key("created_elsewhere_1234567890")
+        ApiKey.objects.bulk_create([other])
+        self.assertEqual(self._authenticate("created_elsewhere_1234567890")[0].user,
+                         "admin-node")
+
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                with self.assertRaises(AuthenticationFailed):
+                    self._authenticate("unknown_key_12345678901234567890")
+
+    def test_rebuild_warns_without_a_shared_cache(self):
+        self.assertFalse(cache_is_shared())
+        err = StringIO()
+        call_command('key_filter', rebuild=True, stdout=StringIO(), stderr=err)
+        self.assertIn('API_KEY_FILTER_MAX_AGE', err.getvalue())
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                              'LOCATION': 'redis://127.0.0.1:6379'}}
+        with self.settings(CACHES=shared):
+            self.assertTrue(cache_is_shared())
+
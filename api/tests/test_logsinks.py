@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import Mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import logsinks
+from api.models import ApiKey, Log
+
+
+def make_log(national_id="30307020102113", **kwargs):
+    return Log(national_id=national_id, valid=True, api_key_used="1234", **kwargs)
+
+
+class JSONLFileLogSinkTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _sink(self, **kwargs):
+        options = dict(max_bytes=1024 * 1024, max_age=3600, flush_interval=3600,
+                       buffer_rows=3)
+        options.update(kwargs)
+        return logsinks.JSONLFileLogSink(self.directory, **options)
+
+    def _files(self, suffix):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(suffix))
+
+    def test_buffers_then_appends(self):
+        sink = self._sink()
+        sink.write([make_log(), make_log()])
+        self.assertEqual(self._files(logsinks.ACTIVE_SUFFIX), [])
+        sink.write([make_log()])
+        [active] = self._files(logsinks.ACTIVE_SUFFIX)
+        with open(os.path.join(self.directory, active)) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['national_id'], "30307020102113")
+        self.assertIsNotNone(records[0]['timestamp'])
+
+    def test_rotates_by_size_and_on_close(self):
+        sink = self._sink(max_bytes=1, buffer_rows=1, fsync='never')
+        for _ in range(3):
+            sink.write([make_log()])
+        self.assertEqual(len(self._files(logsinks.ROTATED_SUFFIX)), 2)
+        sink.close()
+        self.assertEqual(len(self._files(logsinks.ROTATED_SUFFIX)), 3)
+        self.assertEqual(self._files(logsinks.ACTIVE_SUFFIX), [])
+
+    def test_import_logs_keeps_timestamps(self):
+        sink = self._sink()
+        logged_at = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        sink.write([make_log(timestamp=logged_at), make_log("29001011234567")])
+        sink.close()
+
+        call_command('import_logs', self.directory, '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(Log.objects.count(), 2)
+        self.assertEqual(Log.objects.get(national_id="30307020102113").timestamp, logged_at)
+        self.assertEqual(self._files(logsinks.ROTATED_SUFFIX), [])
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'imported'))), 1)
+        # New rows still get auto_now_add timestamps
+        self.assertNotEqual(Log.objects.create(national_id="30307020102113", valid=True)
+                            .timestamp, logged_at)
+
+
+class LogSinkSelectionTest(TestCase):
+    def test_fan_out_survives_one_failure(self):
+        broken, working = Mock(), Mock()
+        broken.write.side_effect = OSError("disk full")
+        logsinks.FanOutLogSink([broken, working]).write([make_log()])
+        working.write.assert_called_once()
+
+        working.write.side_effect = OSError("disk full")
+        with self.assertRaises(OSError):
+            logsinks.FanOutLogSink([broken, working]).write([make_log()])
+
+    @override_settings(LOG_SINK='null')
+    def test_null_sink_from_settings(self):
+        cache.clear()
+        api_key = ApiKey(user="testuser")
+        api_key.set_key("test_key_12345678901234567890")
+        api_key.save()
+        client = APIClient()
+        client.credentials(HTTP_X_API_KEY="test_key_12345678901234567890")
+        response = client.post(reverse('national_id'), {"national_id": "30307020102113"},
+                               format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Log.objects.exists())
+
+    @override_settings(LOG_SINK='database, null', LOG_BREAKER_ENABLED=False)
+    def test_several_sinks_fan_out(self):
+        sink = logsinks.get_log_sink()
+        self.assertIsInstance(sink, logsinks.FanOutLogSink)
+        self.assertEqual([type(s) for s in sink.sinks],
+                         [logsinks.DatabaseLogSink, logsinks.NullLogSink])
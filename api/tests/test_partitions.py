@@ -0,0 +1,98 @@
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from api import partitions
+from api.models import Log
+
+NOW = datetime(2026, 3, 15, 12, tzinfo=dt_timezone.utc)
+
+
+def make_log(timestamp, national_id="30307020102113"):
+    return Log(national_id=national_id, valid=True, api_key_used="1234", timestamp=timestamp)
+
+
+def rows_in(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+class MonthTest(TestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.next_month(date(2026, 12, 1)), date(2027, 1, 1))
+        self.assertEqual(partitions.previous_month(date(2026, 1, 1)), date(2025, 12, 1))
+        self.assertEqual(partitions.month_of(datetime(2026, 2, 28, 23, tzinfo=dt_timezone.utc)),
+                         date(2026, 2, 1))
+        self.assertEqual(partitions.partition_name(date(2026, 2, 1)), 'api_log_p2026_02')
+
+
+@override_settings(LOG_PARTITIONING=True)
+class SQLitePartitionTest(TestCase):
+    def setUp(self):
+        patcher = patch('api.partitions.timezone.now', return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The conversion is rolled back with each test
+        self.addCleanup(partitions._partitioned.clear)
+        self.old = make_log(datetime(2026, 1, 10, tzinfo=dt_timezone.utc))
+        self.old.save()
+        make_log(NOW).save()
+        self.first = partitions.convert(months_ahead=2)
+
+    def test_convert_keeps_rows_and_creates_months(self):
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(self.first, date(2026, 4, 1))
+        self.assertEqual(partitions.partitions(),
+                         [date(2026, 4, 1), date(2026, 5, 1)])
+        self.assertEqual(rows_in(partitions.LEGACY_TABLE), 2)
+        self.assertEqual(Log.objects.count(), 2)
+
+    def test_writes_are_routed_by_month(self):
+        april = make_log(datetime(2026, 4, 2, tzinfo=dt_timezone.utc))
+        april.save()
+        self.assertGreater(april.pk, self.old.pk)
+        Log.objects.bulk_create([make_log(datetime(2026, 5, 3, tzinfo=dt_timezone.utc)),
+                                 make_log(datetime(2027, 1, 1, tzinfo=dt_timezone.utc))])
+        self.assertEqual(rows_in('api_log_p2026_04'), 1)
+        self.assertEqual(rows_in('api_log_p2026_05'), 2)  # Newest partition takes the rest
+        self.assertEqual(Log.objects.get(pk=april.pk).timestamp, april.timestamp)
+        self.assertEqual(len(set(Log.objects.values_list('pk', flat=True))), 5)
+
+    def test_queries_updates_and_deletes(self):
+        make_log(datetime(2026, 4, 2, tzinfo=dt_timezone.utc), "29001011234567").save()
+        recent = Log.objects.filter(timestamp__gte=datetime(2026, 3, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([log.national_id for log in recent],
+                         ["29001011234567", "30307020102113"])
+
+        Log.objects.filter(national_id="29001011234567").update(valid=False)
+        self.assertFalse(Log.objects.get(national_id="29001011234567").valid)
+        self.old.delete()
+        self.assertEqual(Log.objects.count(), 2)
+
+    def test_drop_partitions_for_retention(self):
+        make_log(datetime(2026, 4, 2, tzinfo=dt_timezone.utc)).save()
+        self.assertEqual(partitions.drop_partitions(date(2026, 4, 1)),
+                         [partitions.LEGACY_TABLE])
+        self.assertEqual(partitions.drop_partitions(date(2026, 6, 1)), ['api_log_p2026_04'])
+        self.assertEqual(Log.objects.count(), 0)
+        # Writes still land in what is left
+        make_log(NOW).save()
+        self.assertEqual(rows_in('api_log_p2026_05'), 1)
+
+    def test_command_creates_upcoming_partitions(self):
+        out = StringIO()
+        call_command('partition_logs', months_ahead=3, stdout=out)
+        self.assertIn('Created partition api_log_p2026_06', out.getvalue())
+        self.assertIn('3 partitions from 2026-04 to 2026-06 (plus legacy rows)', out.getvalue())
+
+    def test_admin_changelist(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        response = self.client.get(reverse('admin:api_log_changelist'),
+                                   {'timestamp__year': '2026', 'timestamp__month': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "30307020102113")
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import profiling
+from api.models import ApiKey
+
+VALID_ID = "30307020102113"
+
+
+@override_settings(PROFILE_ENABLED=True, PROFILE_SAMPLE_RATE=0, PROFILE_MAX_FILES=2)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overrider = override_settings(PROFILE_DIR=self.directory)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY="test_key_12345678901234567890")
+        api_key = ApiKey(user="testuser")
+        api_key.set_key("test_key_12345678901234567890")
+        api_key.save()
+        self.url = reverse('national_id')
+
+    def validate(self, **headers):
+        return self.client.post(self.url, {"national_id": VALID_ID}, format='json', headers=headers)
+
+    def test_requests_with_a_token_are_profiled(self):
+        token = profiling.make_token('admin')
+        response = self.validate(**{'X-Profile-Token': token, 'X-Request-ID': 'req-1'})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-ID']
+        self.assertRegex(profile_id, r'^req-1-[0-9a-f]{32}$')
+        info = profiling.get_profile(profile_id)
+        self.assertEqual((info['path'], info['status'], info['reason']),
+                         (self.url, 200, 'token:admin'))
+        self.assertIn('process_validation_request', profiling.format_stats(profile_id))
+
+        self.assertNotIn('X-Profile-ID', self.validate())
+        with self.assertLogs('api.profiling', 'WARNING'):
+            response = self.validate(**{'X-Profile-Token': token + 'x'})
+        self.assertNotIn('X-Profile-ID', response)
+        self.assertEqual(len(profiling.list_profiles()), 1)
+
+    def test_expired_token(self):
+        token = profiling.make_token('admin')
+        with override_settings(PROFILE_TOKEN_MAX_AGE=-1):
+            self.assertIsNone(profiling.check_token(token))
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_requests_and_bounded_directory(self):
+        ids = [self.validate(**{'X-Request-ID': f'req-{i}'})['X-Profile-ID'] for i in range(3)]
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(f'{profile_id}{suffix}' for profile_id in ids[1:]
+                                for suffix in ('.json', '.prof')))
+        # Reusing a request id cannot overwrite an earlier profile
+        repeated = self.validate(**{'X-Request-ID': 'req-2'})['X-Profile-ID']
+        self.assertNotEqual(repeated, ids[2])
+        self.assertIsNotNone(profiling.get_profile(ids[2]))
+        # Request ids are stripped to file name characters
+        self.assertRegex(self.validate(**{'X-Request-ID': '../etc'})['X-Profile-ID'],
+                         r'^etc-[0-9a-f]{32}$')
+        self.assertRegex(self.validate(**{'X-Request-ID': '/'})['X-Profile-ID'],
+                         r'^[0-9a-f]{32}$')
+
+    @override_settings(PROFILE_ENABLED=False)
+    def test_disabled(self):
+        with patch('api.middleware.cProfile.Profile') as profile:
+            response = self.validate(**{'X-Profile-Token': profiling.make_token('admin')})
+        self.assertNotIn('X-Profile-ID', response)
+        profile.assert_not_called()
+
+    def test_admin_pages(self):
+        response = self.validate(**{'X-Profile-Token': profiling.make_token('admin')})
+        profile_id = response['X-Profile-ID']
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+
+        response = self.client.get(reverse('admin:api_log_profiles'))
+        self.assertContains(response, reverse('admin:api_log_profile', args=[profile_id]))
+        response = self.client.post(reverse('admin:api_log_profiles'), follow=True)
+        self.assertContains(response, 'X-Profile-Token')
+
+        response = self.client.get(reverse('admin:api_log_profile', args=[profile_id]),
+                                   {'sort': 'tottime'})
+        self.assertContains(response, 'Ordered by: internal time')
+        response = self.client.get(reverse('admin:api_log_profile_download', args=[profile_id]))
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="{profile_id}.prof"')
+        self.assertEqual(self.client.get(reverse('admin:api_log_profile',
+                                                 args=['missing'])).status_code, 404)
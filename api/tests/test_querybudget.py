@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import querybudget
+from api.models import ApiKey, Log
+from api.querybudget import QueryBudgetExceeded, count_queries
+
+VALID_ID = "30307020102113"
+INVALID_ID = "30307029902113"
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTest(TestCase):
+    """Query counts of the hot endpoints; raising a budget should be a deliberate change"""
+
+    def setUp(self):
+        cache.clear()
+        api_key = ApiKey(user="testuser")
+        api_key.set_key("test_key_12345678901234567890")
+        api_key.save()
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY="test_key_12345678901234567890")
+
+    def request(self, name, data=None, status=200):
+        if data is None:
+            response = self.client.get(reverse(name))
+        else:
+            response = self.client.post(reverse(name), data, format='json')
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def assertQueries(self, response, count):
+        self.assertRegex(response['Server-Timing'],
+                         rf'^db;dur=[\d.]+;desc="{count} queries", total;dur=[\d.]+$')
+
+    def test_single_id_endpoints(self):
+        for name in ['national_id', 'national_id_fast']:
+            with self.subTest(name):
+                # The first request also builds the API key filter, which is exempt
+                self.assertQueries(self.request(name, {"national_id": VALID_ID}), 2)
+                self.assertQueries(self.request(name, {"national_id": INVALID_ID}, 400), 2)
+
+    def test_batch_logs_in_one_insert(self):
+        national_ids = [VALID_ID, INVALID_ID] * 50
+        response = self.request('national_id_batch', {"national_ids": national_ids})
+        self.assertQueries(response, 2)
+        self.assertEqual(Log.objects.count(), 100)
+
+    def test_usage(self):
+        self.request('national_id', {"national_id": VALID_ID})
+        self.assertQueries(self.request('api_key_usage'), 3)
+
+    @override_settings(QUERY_BUDGETS={'national_id': 1})
+    def test_over_budget_fails_when_enforced(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "national_id ran 2 queries, budget is 1"):
+            self.client.post(reverse('national_id'), {"national_id": VALID_ID}, format='json')
+
+    @override_settings(QUERY_BUDGETS={'national_id': 1}, QUERY_BUDGET_ENFORCE=False)
+    def test_over_budget_is_logged_otherwise(self):
+        with self.assertLogs('api.querybudget', 'WARNING'):
+            self.request('national_id', {"national_id": VALID_ID})
+
+
+class CountQueriesTest(TestCase):
+    def test_counts_all_but_exempt_queries(self):
+        with count_queries() as counter:
+            Log.objects.count()
+            with querybudget.exempt():
+                ApiKey.objects.count()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        self.assertEqual(counter.count, 2)
+        self.assertGreater(counter.duration, 0)
@@ -0,0 +1,77 @@
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api import parsers, renderers
+from api.parsers import FastJSONParser
+from api.renderers import ConstantPayload, FastJSONRenderer
+
+PAYLOADS = [
+    {"valid": True, "message": "Validation successful", "birth_year": 2003,
+     "birth_date": "02/07/2003", "gender": "Male", "governorate": "Cairo"},
+    [{"id": i, "name": "قاهرة ", "tags": ["a", None, True]} for i in range(3)],
+    {"float": 1e16, "small": 1e-05, "date": date(2024, 1, 10), "amount": Decimal("1.50")},
+    {"big": 2 ** 70, "emoji": "😀", "control": "\x01\n\"", "separator": "a\u2028b"},
+    "plain string",
+]
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    def assertSameRendering(self, data, *args):
+        self.assertEqual(FastJSONRenderer().render(data, *args),
+                         JSONRenderer().render(data, *args))
+
+    def test_matches_json_renderer(self):
+        for backend in (renderers.orjson, None):
+            with patch('api.renderers.orjson', backend):
+                for data in PAYLOADS:
+                    with self.subTest(backend=backend, data=data):
+                        self.assertSameRendering(data)
+
+    def test_constant_payload_is_cached(self):
+        error = ConstantPayload(valid=False, error="Invalid governorate code")
+        renderers._encoded_constant.cache_clear()
+        self.assertSameRendering(error)
+        self.assertSameRendering(error)
+        self.assertEqual(renderers._encoded_constant.cache_info().hits, 1)
+
+        error["details"] = {"national_id": ["This field is required."]}
+        self.assertSameRendering(error)
+
+    def test_indent_uses_json_renderer(self):
+        self.assertSameRendering(PAYLOADS[0], 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTest(SimpleTestCase):
+    BODIES = [b'{"national_id": "30307020102113"}', b'[1.5, -0, 1e-400, null]',
+              b'{"a": 1, "a": 2}', b'12345678901234567890123', b'1E400']
+
+    def parse(self, parser, body, encoding='utf-8'):
+        try:
+            return parser.parse(io.BytesIO(body), 'application/json', {'encoding': encoding})
+        except ParseError as exc:
+            return str(exc)
+
+    def test_matches_json_parser(self):
+        bodies = self.BODIES + [b'{"a": NaN}', b'{"a": }', b'\xef\xbb\xbf{}']
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(self.parse(FastJSONParser(), body),
+                                 self.parse(JSONParser(), body))
+
+    def test_other_encodings_use_json_parser(self):
+        body = '{"name": "é"}'.encode('latin-1')
+        self.assertEqual(self.parse(FastJSONParser(), body, 'latin-1'), {"name": "é"})
+
+    @skipIf(parsers.orjson is None, "orjson is not installed")
+    def test_huge_integers_skip_orjson(self):
+        with patch.object(parsers.orjson, 'loads', wraps=parsers.orjson.loads) as loads:
+            self.assertEqual(self.parse(FastJSONParser(), self.BODIES[3]),
+                             12345678901234567890123)
+        loads.assert_not_called()
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from api.models import ApiKey, Log
+from api.routers import LogRouter
+
+LOG_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'logs': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+class LogRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = LogRouter()
+
+    def test_no_log_database_configured(self):
+        self.assertNotIn(settings.LOG_DATABASE_ALIAS, settings.DATABASES)
+        self.assertIsNone(self.router.db_for_write(Log))
+        self.assertIsNone(self.router.db_for_read(Log))
+        self.assertIsNone(self.router.allow_migrate('default', 'api', 'log'))
+
+    @override_settings(DATABASES=LOG_DATABASES)
+    def test_log_model_routed(self):
+        self.assertEqual(self.router.db_for_write(Log), 'logs')
+        self.assertEqual(self.router.db_for_read(Log), 'logs')
+        self.assertIsNone(self.router.db_for_write(ApiKey))
+
+    @override_settings(DATABASES=LOG_DATABASES)
+    def test_migrations_split(self):
+        self.assertTrue(self.router.allow_migrate('logs', 'api', 'log'))
+        self.assertFalse(self.router.allow_migrate('default', 'api', 'log'))
+        self.assertFalse(self.router.allow_migrate('logs', 'api', 'apikey'))
+        self.assertFalse(self.router.allow_migrate('logs', 'auth', 'user'))
+        self.assertIsNone(self.router.allow_migrate('default', 'api', 'apikey'))
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import sampling, usage
+from api.constants import ErrorMessages
+from api.exceptions import NationalIDValidationError
+from api.models import ApiKey, ApiKeyUsage, DroppedLogCount, Log
+from api.services import ValidationResult
+
+VALID_ID = "30307020102113"
+BAD_CENTURY_ID = "40307020102113"
+
+
+class SamplingTest(TestCase):
+    def test_outcomes(self):
+        self.assertEqual(sampling.outcome(ValidationResult(True, data={})), 'valid')
+        error = str(NationalIDValidationError(ErrorMessages.INVALID_CENTURY))
+        self.assertEqual(sampling.outcome(ValidationResult(False, error=error)),
+                         'invalid_century')
+        self.assertEqual(sampling.outcome(ValidationResult(False, error="odd")),
+                         'validation_error')
+
+    def test_deterministic_and_nested(self):
+        ids = [f"{i:014d}" for i in range(2000)]
+        tenth = {national_id for national_id in ids if sampling.is_sampled(national_id, 0.1)}
+        half = {national_id for national_id in ids if sampling.is_sampled(national_id, 0.5)}
+        self.assertTrue(tenth <= half)
+        self.assertAlmostEqual(len(tenth) / len(ids), 0.1, delta=0.03)
+        self.assertEqual(tenth, {national_id for national_id in ids
+                                 if sampling.is_sampled(national_id, 0.1)})
+
+    @override_settings(LOG_SAMPLE_RATES={'valid': 0.0, 'invalid': 0.5,
+                                         'invalid_century': 1.0})
+    def test_rates_per_outcome_and_key(self):
+        api_key = ApiKey(user="testuser")
+        self.assertEqual(sampling.sample_rate('valid', api_key), 0.0)
+        self.assertEqual(sampling.sample_rate('invalid_length', api_key), 0.5)
+        self.assertEqual(sampling.sample_rate('invalid_century', api_key), 1.0)
+        api_key.log_sample_rate = 0.25
+        self.assertEqual(sampling.sample_rate('valid', api_key), 0.25)
+
+
+@override_settings(LOG_SAMPLE_RATES={'valid': 0.0}, USAGE_FLUSH_INTERVAL=3600)
+class SampledLoggingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        sampling.flush()
+        usage.flush()
+        self.client = APIClient()
+        self.api_key = ApiKey(user="testuser")
+        self.api_key.set_key("test_key_12345678901234567890")
+        self.api_key.save()
+        self.client.credentials(HTTP_X_API_KEY="test_key_12345678901234567890")
+
+    def test_dropped_results_are_counted(self):
+        response = self.client.post(reverse('national_id_batch'),
+                                    {"national_ids": [VALID_ID, VALID_ID, BAD_CENTURY_ID]},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(Log.objects.values_list('national_id', flat=True)),
+                         [BAD_CENTURY_ID])
+
+        sampling.flush()
+        usage.flush()
+        dropped = DroppedLogCount.objects.get()
+        self.assertEqual((dropped.api_key, dropped.outcome, dropped.dropped),
+                         (self.api_key, 'valid', 2))
+        # Logged rows plus dropped counts add up to the exact usage totals
+        self.assertEqual(Log.objects.filter(valid=True).count() + dropped.dropped,
+                         ApiKeyUsage.objects.get().valid)
+
+    def test_uploads_are_sampled(self):
+        response = self.client.post(reverse('national_id_csv'),
+                                    f"{VALID_ID}\n{BAD_CENTURY_ID}".encode(),
+                                    content_type='text/csv')
+        b''.join(response.streaming_content)
+        self.assertEqual(list(Log.objects.values_list('national_id', flat=True)),
+                         [BAD_CENTURY_ID])
+        sampling.flush()
+        self.assertEqual(DroppedLogCount.objects.get().dropped, 1)
+
+    def test_key_rate_overrides(self):
+        self.api_key.log_sample_rate = 1.0
+        self.api_key.save()
+        self.client.post(reverse('national_id'), {"national_id": VALID_ID}, format='json')
+        self.assertEqual(Log.objects.count(), 1)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch, Mock
 from api.services import validate_national_id, create_log, process_validation_request
 from api.models import ApiKey, Log
@@ -36,7 +36,8 @@ class ServicesTest(TestCase):
         self.assertEqual(log.national_id, "30307020102113")
         self.assertTrue(log.valid)
 
-    @patch('api.models.Log.objects.create')
+    @override_settings(LOG_BREAKER_ENABLED=False)
+    @patch('api.models.Log.save')
     def test_create_log_database_error(self, mock_create):
         """Test log creation with database error"""
         from django.db import DatabaseError
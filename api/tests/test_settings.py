@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+# Requests every route of the settings module's URLconf, with a test
+# database, as GET and as a validation POST; returns their statuses
+API_NODE_REQUESTS = """
+import re
+import uuid
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import URLResolver, get_resolver
+
+django.setup()
+setup_test_environment()
+connection.creation.create_test_db(verbosity=0)
+from api.models import ApiKey
+key = ApiKey(user='testuser')
+key.set_key('test_key_12345678901234567890')
+key.save()
+
+
+def routes(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from routes(pattern.url_patterns, route)
+        else:
+            yield pattern.name, '/' + re.sub(r'<uuid:\\w+>', str(uuid.uuid4()), route)
+
+
+def request_every_route():
+    client = Client(raise_request_exception=False,
+                    headers={'X-API-Key': 'test_key_12345678901234567890'})
+    statuses = {}
+    for name, path in routes(get_resolver().url_patterns):
+        statuses[f'GET {name}'] = client.get(path).status_code
+        statuses[f'POST {name}'] = client.post(path, {'national_id': '30307020102113'},
+                                               content_type='application/json').status_code
+    statuses['GET /admin/'] = client.get('/admin/').status_code
+    return statuses
+"""
+
+
+def load_settings(env, expression, setup=''):
+    """Evaluate an expression against settings imported with the given env."""
+    code = (
+        'import json\n'
+        'from django.conf import settings\n'
+        f'{setup}\n'
+        f'print(json.dumps({expression}, default=str))\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'id_validator.settings', **env},
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+class DatabaseProfileTest(SimpleTestCase):
+    def test_default_profile(self):
+        db = load_settings({'DB_PROFILE': 'default'}, "settings.DATABASES['default']")
+        self.assertEqual(db.get('CONN_MAX_AGE', 0), 0)
+        self.assertIn('PRAGMA journal_mode=WAL', db['OPTIONS']['init_command'])
+        self.assertNotIn('mmap_size', db['OPTIONS']['init_command'])
+
+    def test_production_sqlite_profile(self):
+        db = load_settings({'DB_PROFILE': 'production'}, "settings.DATABASES['default']")
+        self.assertEqual(db['CONN_MAX_AGE'], 600)
+        self.assertTrue(db['CONN_HEALTH_CHECKS'])
+        for pragma in ('mmap_size', 'cache_size', 'temp_store=MEMORY'):
+            self.assertIn(pragma, db['OPTIONS']['init_command'])
+
+    def test_production_postgres_profile(self):
+        db = load_settings({'DB_PROFILE': 'production', 'DATABASE_ENGINE': 'postgresql'},
+                           "settings.DATABASES['default']")
+        self.assertEqual(db['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(db.get('CONN_MAX_AGE', 0), 0)
+        self.assertIn('pool', db['OPTIONS'])
+
+    def test_log_database_inherits_profile(self):
+        databases = load_settings({'DB_PROFILE': 'production', 'LOG_DATABASE_NAME': 'logs.sqlite3'},
+                                  'settings.DATABASES')
+        self.assertEqual(databases['logs']['NAME'], 'logs.sqlite3')
+        self.assertEqual(databases['logs']['CONN_MAX_AGE'], 600)
+
+
+class APINodeSettingsTest(SimpleTestCase):
+    def test_api_node_drops_admin_stack(self):
+        api_node = load_settings(
+            {'DJANGO_SETTINGS_MODULE': 'id_validator.settings_api'},
+            "{'apps': settings.INSTALLED_APPS, 'middleware': settings.MIDDLEWARE,"
+            " 'templates': settings.TEMPLATES, 'urls': settings.ROOT_URLCONF}")
+        for app in ('django.contrib.admin', 'django.contrib.sessions',
+                    'django.contrib.messages'):
+            self.assertNotIn(app, api_node['apps'])
+        self.assertIn('api', api_node['apps'])
+        self.assertFalse(any('Session' in m or 'Csrf' in m for m in api_node['middleware']))
+        # Only the admin's middleware is dropped from the base stack
+        base = load_settings({}, 'settings.MIDDLEWARE')
+        self.assertEqual([m for m in base if m not in api_node['middleware']],
+                         ['django.contrib.sessions.middleware.SessionMiddleware',
+                          'django.middleware.csrf.CsrfViewMiddleware',
+                          'django.contrib.auth.middleware.AuthenticationMiddleware',
+                          'django.contrib.messages.middleware.MessageMiddleware',
+                          'django.middleware.clickjacking.XFrameOptionsMiddleware'])
+        self.assertEqual(api_node['templates'], [])
+        self.assertEqual(api_node['urls'], 'id_validator.urls_api')
+
+    def test_api_node_serves_every_route(self):
+        statuses = load_settings({'DJANGO_SETTINGS_MODULE': 'id_validator.settings_api'},
+                                 'request_every_route()', setup=API_NODE_REQUESTS)
+        self.assertEqual(statuses.pop('POST national_id'), 200)
+        self.assertEqual(statuses.pop('GET /admin/'), 404)
+        self.assertNotIn('GET metrics', statuses)
+        self.assertIn('GET validation_jobs', statuses)
+        for request, status in statuses.items():
+            with self.subTest(request=request):
+                self.assertLess(status, 500)
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api import throttling
+from api.models import ApiKey
+
+VALID_ID = "30307020102113"
+
+
+@override_settings(CLIENT_RATE_LIMIT='5/minute', CLIENT_SUBNET_RATE_LIMIT='8/minute',
+                   CLIENT_AUTH_FAILURE_LIMIT='3/minute',
+                   CLIENT_SUBNET_AUTH_FAILURE_LIMIT='100/minute',
+                   CLIENT_BLOCK_SECONDS=60)
+class ClientThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Fixed windows: keep every request inside the same one
+        patcher = patch('api.throttling.time.time', return_value=1_000_020.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('national_id')
+        self.test_key = "test_key_12345678901234567890"
+        api_key = ApiKey(user="testuser")
+        api_key.set_key(self.test_key)
+        api_key.save()
+
+    def _post(self, key=None, address='10.0.0.1'):
+        return self.client.post(self.url, {"national_id": VALID_ID}, format='json',
+                                HTTP_X_API_KEY=key or self.test_key, REMOTE_ADDR=address)
+
+    def test_rate_limit_per_address_and_subnet(self):
+        for _ in range(5):
+            self.assertEqual(self._post().status_code, 200)
+        response = self._post()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertIn('throttled', response.json()['detail'])
+
+        # Neighbours share the subnet's allowance; other subnets are unaffected
+        for _ in range(3):
+            self.assertEqual(self._post(address='10.0.0.2').status_code, 200)
+        self.assertEqual(self._post(address='10.0.0.2').status_code, 429)
+        self.assertEqual(self._post(address='10.0.1.1').status_code, 200)
+
+    def test_limits_disabled(self):
+        with patch.object(throttling.ApiKeyRateThrottle, 'THROTTLE_RATES',
+                          {throttling.ApiKeyRateThrottle.scope: '2/minute'}):
+            with throttling.limits_disabled():
+                for _ in range(7):
+                    self.assertEqual(self._post().status_code, 200)
+            self.assertTrue(settings.CLIENT_THROTTLE_ENABLED)
+            self.assertTrue(settings.API_KEY_THROTTLE_ENABLED)
+            # Nothing was counted while disabled; the key limit applies again
+            for _ in range(2):
+                self.assertEqual(self._post().status_code, 200)
+            self.assertEqual(self._post().status_code, 429)
+
+    def test_auth_failures_block_with_escalation(self):
+        for _ in range(4):
+            self.assertEqual(self._post(key="wrong_key_12345678901234567890").status_code,
+                             403)
+        with self.assertNumQueries(0):
+            response = self._post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 60)
+
+        self.clock.return_value += 61
+        for _ in range(4):
+            self._post(key="wrong_key_12345678901234567890")
+        response = self._post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 120)
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1',
+                                       HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(throttling.client_address(request), '10.0.0.1')
+        self.assertEqual(throttling.client_scopes('2001:db8::1'),
+                         ['ip:2001:db8::1', 'net:2001:db8::/64'])
+
+    def test_other_paths_not_throttled(self):
+        for _ in range(7):
+            self.assertEqual(self.client.get('/', REMOTE_ADDR='10.0.0.1').status_code, 200)
@@ -0,0 +1,67 @@
+import csv
+import io
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.models import ApiKey, Log
+from api.uploads import iter_lines, iter_multipart_file
+
+
+class CSVUploadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('national_id_csv')
+        api_key = ApiKey(user="testuser")
+        api_key.set_key("test_key_12345678901234567890")
+        api_key.save()
+        self.client.credentials(HTTP_X_API_KEY="test_key_12345678901234567890")
+        cache.clear()
+
+    def _rows(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    @override_settings(CSV_UPLOAD_CHUNK_ROWS=2)
+    def test_multipart_upload_with_header(self):
+        upload = SimpleUploadedFile(
+            "ids.csv", "name,National_ID\r\n\"Doe, J\",30307020102113\r\n\r\n"
+                       "X,123\r\nY,30307029902113\r\n".encode())
+        response = self.client.post(self.url, {"note": "x", "file": upload}, format='multipart')
+        rows = self._rows(response)
+        self.assertEqual(rows[0], ["name", "National_ID", "valid", "error", "birth_year",
+                                   "birth_date", "gender", "governorate"])
+        self.assertEqual(rows[1], ["Doe, J", "30307020102113", "true", "", "2003",
+                                   "02/07/2003", "Male", "Cairo"])
+        self.assertEqual(rows[2][2:4], ["false", "National ID must be exactly 14 digits"])
+        self.assertEqual(rows[3][2:4], ["false", "Invalid governorate code"])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(Log.objects.count(), 3)
+
+    def test_raw_csv_body_without_header(self):
+        response = self.client.post(self.url, b"30307020102113\n40307020102113",
+                                    content_type='text/csv')
+        rows = self._rows(response)
+        self.assertEqual([row[:3] for row in rows],
+                         [["30307020102113", "true", ""], ["40307020102113", "false",
+                                                           "Invalid century digit (must be 2 or 3)"]])
+
+    def test_rejects_other_content_types(self):
+        response = self.client.post(self.url, {"national_id": "30307020102113"}, format='json')
+        self.assertEqual(response.status_code, 415)
+
+    def test_requires_api_key(self):
+        self.client.credentials()
+        response = self.client.post(self.url, b"30307020102113", content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+
+    def test_streaming_helpers(self):
+        self.assertEqual(list(iter_lines([b"\xef\xbb\xbfa,b\r", b"\nc\xc3", b"\xa9\nd"])),
+                         ["a,b\r\n", "cé\n", "d"])
+        body = (b"--XX\r\nContent-Disposition: form-data; name=\"other\"\r\n\r\nv\r\n"
+                b"--XX\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.csv\"\r\n"
+                b"Content-Type: text/csv\r\n\r\n1\r\n2\r\n--XX--\r\n")
+        self.assertEqual(b''.join(iter_multipart_file(io.BytesIO(body), b"XX")), b"1\r\n2")
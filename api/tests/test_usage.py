@@ -0,0 +1,78 @@
+from datetime import date
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import usage
+from api.admin import ApiKeyAdmin
+from api.bulk import bulk_increment
+from api.models import ApiKey, ApiKeyUsage
+from api.throttling import ApiKeyRateThrottle
+
+VALID_ID = "30307020102113"
+INVALID_ID = "30307029902113"
+
+
+class BulkIncrementTest(TestCase):
+    def test_adds_to_existing_rows(self):
+        api_key = ApiKey.objects.create(user="testuser", key_hash="a" * 64)
+        row = {'api_key_id': api_key.pk, 'date': date(2026, 1, 1), 'requests': 2,
+               'valid': 1, 'invalid': 1, 'throttled': 0, 'updated_at': timezone.now()}
+        for _ in range(2):
+            bulk_increment(ApiKeyUsage, [row], unique_fields=['api_key_id', 'date'],
+                           counter_fields=usage.COUNTER_FIELDS)
+        stored = ApiKeyUsage.objects.get()
+        self.assertEqual((stored.requests, stored.valid, stored.invalid), (4, 2, 2))
+
+
+@override_settings(USAGE_FLUSH_INTERVAL=3600)
+class ApiKeyUsageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        usage.flush()
+        ApiKeyUsage.objects.all().delete()
+        self.client = APIClient()
+        self.test_key = "test_key_12345678901234567890"
+        self.api_key = ApiKey(user="testuser")
+        self.api_key.set_key(self.test_key)
+        self.api_key.save()
+        self.client.credentials(HTTP_X_API_KEY=self.test_key)
+
+    def test_requests_are_buffered_then_reported(self):
+        self.client.post(reverse('national_id'), {"national_id": VALID_ID}, format='json')
+        self.client.post(reverse('national_id_batch'),
+                         {"national_ids": [VALID_ID, INVALID_ID, "123"]}, format='json')
+        self.assertFalse(ApiKeyUsage.objects.exists())
+
+        with self.assertNumQueries(4):  # Existing keys, then one upsert in a savepoint
+            usage.flush()
+        response = self.client.get(reverse('api_key_usage'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'],
+                         {'requests': 2, 'valid': 2, 'invalid': 2, 'throttled': 0})
+        self.assertEqual(len(response.data['days']), 1)
+
+    def test_throttled_requests(self):
+        with patch.object(ApiKeyRateThrottle, 'THROTTLE_RATES', {'api_key': '1/minute'}):
+            for _ in range(3):
+                self.client.post(reverse('national_id'), {"national_id": VALID_ID},
+                                 format='json')
+        usage.flush()
+        stored = ApiKeyUsage.objects.get()
+        self.assertEqual((stored.requests, stored.throttled, stored.valid), (3, 2, 1))
+
+    def test_date_range_and_admin_columns(self):
+        ApiKeyUsage.objects.create(api_key=self.api_key, date=date(2026, 1, 1),
+                                   requests=5, valid=3, invalid=1)
+        ApiKeyUsage.objects.create(api_key=self.api_key, date=date(2026, 1, 2),
+                                   requests=7, valid=2)
+        response = self.client.get(reverse('api_key_usage'), {'start': '2026-01-02'})
+        self.assertEqual(response.data['totals']['requests'], 7)
+        self.assertEqual(self.client.get(reverse('api_key_usage'), {'start': 'x'}).status_code,
+                         400)
+
+        admin = ApiKeyAdmin(ApiKey, None)
+        obj = admin.get_queryset(RequestFactory().get('/')).get(pk=self.api_key.pk)
+        self.assertEqual((admin.total_requests(obj), admin.total_validations(obj)), (12, 6))
@@ -1,4 +1,5 @@
-from django.test import TestCase, RequestFactory, override_settings
+from django.test import TestCase, RequestFactory
+from django.core.cache import cache
 from django.core.management import call_command
 from django.contrib.admin.sites import AdminSite
 from django.contrib.messages.middleware import MessageMiddleware
@@ -7,9 +8,11 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from io import StringIO
+from unittest.mock import patch
 
 from api.models import ApiKey, Log
 from api.admin import ApiKeyAdmin
+from api.throttling import ApiKeyRateThrottle
 
 
 class NationalIDViewTest(TestCase):
@@ -21,6 +24,7 @@ class NationalIDViewTest(TestCase):
         self.api_key = ApiKey.objects.create(user="testuser", is_active=True)
         self.api_key.set_key(self.test_key)
         self.api_key.save()
+        cache.clear()
 
     def auth(self, key=None):
         """Helper to set API key credentials"""
@@ -77,27 +81,84 @@ class NationalIDViewTest(TestCase):
         self.assertEqual(log.national_id, "30307020102113")
         self.assertTrue(log.valid)
 
+    def test_rate_limiting(self):
+        with patch.object(ApiKeyRateThrottle, 'THROTTLE_RATES', {'api_key': '2/minute'}):
+            self.auth()
+            self.assertEqual(self.post_id(
+                "30307020102113").status_code, status.HTTP_200_OK)
+            self.assertEqual(self.post_id(
+                "30307020102113").status_code, status.HTTP_200_OK)
+            self.assertEqual(self.post_id("30307020102113").status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
 
-@override_settings(
-    REST_FRAMEWORK={
-        'DEFAULT_AUTHENTICATION_CLASSES': [],
-        'DEFAULT_PERMISSION_CLASSES': [],
-        'DEFAULT_THROTTLE_CLASSES': ['api.throttling.ApiKeyRateThrottle'],
-        'DEFAULT_THROTTLE_RATES': {'api_key': '2/minute'}
-    },
-    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
-)
-def test_rate_limiting(self):
-    from rest_framework.settings import reload_api_settings
-    reload_api_settings()  # <- forces DRF to pick up override_settings
-
-    self.auth()
-    self.assertEqual(self.post_id(
-        "30307020102113").status_code, status.HTTP_200_OK)
-    self.assertEqual(self.post_id(
-        "30307020102113").status_code, status.HTTP_200_OK)
-    self.assertEqual(self.post_id("30307020102113").status_code,
-                     status.HTTP_429_TOO_MANY_REQUESTS)
+
+class NationalIDFastViewTest(TestCase):
+    def setUp(self):
+        self.url = reverse('national_id')
+        self.fast_url = reverse('national_id_fast')
+        self.test_key = "test_key_12345678901234567890"
+
+        self.api_key = ApiKey.objects.create(user="testuser", is_active=True)
+        self.api_key.set_key(self.test_key)
+        self.api_key.save()
+        cache.clear()
+
+    def assertSameResponse(self, body, content_type='application/json', **extra):
+        """Post the same request to both endpoints and compare the responses"""
+        extra.setdefault('HTTP_X_API_KEY', self.test_key)
+        drf = self.client.post(self.url, body, content_type=content_type, **extra)
+        fast = self.client.post(self.fast_url, body, content_type=content_type, **extra)
+        self.assertEqual(fast.status_code, drf.status_code)
+        self.assertEqual(fast.content, drf.content)
+        self.assertEqual(fast['Content-Type'], drf['Content-Type'])
+        return fast
+
+    def test_valid_national_id(self):
+        response = self.assertSameResponse('{"national_id": "30307020102113"}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Log.objects.filter(national_id="30307020102113").count(), 2)
+
+    def test_invalid_national_id(self):
+        response = self.assertSameResponse('{"national_id": "40307020102113"}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_whitespace_is_stripped(self):
+        self.assertSameResponse('{"national_id": " 30307020102113 "}')
+
+    def test_invalid_request_data(self):
+        for body in ('{"national_id": "123"}', '{}', '', '[]',
+                     '{"national_id": 30307020102113}', '{"national_id": null}',
+                     '{"national_id": "3030702010211a"}'):
+            with self.subTest(body=body):
+                self.assertSameResponse(body)
+
+    def test_malformed_json(self):
+        self.assertSameResponse('{"national_id": ')
+
+    def test_authentication_errors(self):
+        self.assertSameResponse('{"national_id": "30307020102113"}',
+                                HTTP_X_API_KEY="invalid_key")
+        response = self.client.post(self.fast_url, '{"national_id": "30307020102113"}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(),
+                         {"detail": "Authentication credentials were not provided."})
+
+    def test_throttled(self):
+        body = '{"national_id": "30307020102113"}'
+        with patch.object(ApiKeyRateThrottle, 'THROTTLE_RATES', {'api_key': '1/minute'}):
+            self.client.post(self.fast_url, body, content_type='application/json',
+                             HTTP_X_API_KEY=self.test_key)
+            response = self.client.post(self.fast_url, body, content_type='application/json',
+                                        HTTP_X_API_KEY=self.test_key)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_other_requests_fall_back_to_drf(self):
+        self.assertSameResponse({"national_id": "30307020102113"},
+                                content_type='multipart/form-data; boundary=BoUnDaRy')
+        response = self.client.get(self.fast_url, HTTP_X_API_KEY=self.test_key)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
 class ApiKeyAdminTest(TestCase):
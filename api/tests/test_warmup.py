@@ -0,0 +1,41 @@
+from unittest.mock import patch
+from django.core.wsgi import get_wsgi_application
+from django.test import TestCase, override_settings
+from api import hotids, warmup
+from api.models import Log
+
+
+class WarmupTest(TestCase):
+    def test_prepare(self):
+        timings = warmup.prepare()
+        self.assertEqual(list(timings), ['imports', 'validation', 'rendering', 'encryption'])
+
+    @patch('api.warmup.connections')
+    def test_warm_up_sends_a_request_without_an_api_key(self, connections):
+        with self.assertNoLogs('api.warmup', 'WARNING'), self.assertNoLogs('django.request'):
+            timings = warmup.warm_up(get_wsgi_application())
+        self.assertEqual(list(timings), ['urls', 'key_filter', 'request', 'total'])
+        self.assertFalse(Log.objects.exists())
+        # Forked workers must not share the master's connections
+        connections.close_all.assert_called_once_with()
+
+    @override_settings(WARMUP_REQUEST_ENABLED=False)
+    @patch('api.warmup.connections')
+    def test_failures_do_not_stop_startup(self, connections):
+        with patch('api.keyfilter.key_filter.warm', side_effect=RuntimeError("no database")):
+            with self.assertLogs('api.warmup', 'WARNING'):
+                timings = warmup.warm_up(get_wsgi_application())
+        self.assertIn('total', timings)
+        connections.close_all.assert_called_once_with()
+
+    def test_wsgi_request(self):
+        status = warmup.wsgi_request(get_wsgi_application(), 'GET', '/api/v1/missing/')
+        self.assertEqual(status, '404 Not Found')
+
+    def test_hot_ids_get_a_new_worker_id_after_fork(self):
+        tracker = hotids.HotIDTracker()
+        tracker.record("30307020102113")
+        with patch('api.hotids.os.getpid', return_value=123456):
+            tracker.after_fork()
+        self.assertTrue(tracker.worker_id.endswith('-123456'))
+        self.assertEqual(tracker.top(), [])
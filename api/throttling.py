@@ -1,33 +1,156 @@
+import ipaddress
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
 from rest_framework.throttling import SimpleRateThrottle
+from . import metrics, usage
 from .models import ApiKey
-import hashlib
+
+logger = logging.getLogger(__name__)
+
+CLIENT_CACHE_PREFIX = 'client_throttle:'
+BLOCKED = 'client_throttle_blocked'
+RATE_LIMITED = 'client_throttle_rate_limited'
+AUTH_FAILURES = 'client_auth_failures'
+METRIC_NAMES = [BLOCKED, RATE_LIMITED, AUTH_FAILURES]
+# Settings switching off every per-client limit, see limits_disabled()
+LIMIT_SETTINGS = ('API_KEY_THROTTLE_ENABLED', 'CLIENT_THROTTLE_ENABLED', 'LOAD_SHED_ENABLED')
 
 
 class ApiKeyRateThrottle(SimpleRateThrottle):
     scope = 'api_key'
 
     def get_cache_key(self, request, view):
-        # Get API key from header
-        api_key = request.META.get('HTTP_X_API_KEY')
-        if not api_key:
+        # Throttles run after authentication, so an authenticated request
+        # already carries its ApiKey; missing or invalid keys are left to
+        # authentication and never throttled here.
+        key_obj = getattr(request, 'user', None)
+        if not isinstance(key_obj, ApiKey):
             return None
-
-        # Create a consistent hash for the API key to use as cache key
-        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
-        return f"throttle_api_key_{key_hash}"
+        return f"throttle_api_key_{key_obj.key_hash}"
 
     def allow_request(self, request, view):
-        # Only apply throttling if there's a valid API key
-        api_key = request.META.get('HTTP_X_API_KEY')
-        if not api_key:
-            return True  # Let authentication handle missing keys
-
-        # Check if the API key exists and is active
-        try:
-            key_obj = ApiKey.objects.get_by_key(api_key)
-            if not key_obj or not key_obj.is_active:
-                return True  # Let authentication handle invalid keys
-        except:
-            return True  # Let authentication handle invalid keys
-
-        return super().allow_request(request, view)
+        """Count the request and, if rejected, the throttling in the key's usage"""
+        allowed = not settings.API_KEY_THROTTLE_ENABLED or super().allow_request(request, view)
+        usage.record(getattr(request, 'user', None), requests=1, throttled=int(not allowed))
+        return allowed
+
+
+@contextmanager
+def limits_disabled():
+    """
+    Turn off the API key rate limit, client throttling and load shedding
+
+    For commands that send many requests from one address and key to
+    measure the request path, such as benchmark_api; this process only.
+    """
+    previous = {name: getattr(settings, name) for name in LIMIT_SETTINGS}
+    for name in LIMIT_SETTINGS:
+        setattr(settings, name, False)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """'<count>/<period>' as DRF rates are written, to (count, seconds)"""
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+def client_address(request) -> str:
+    """
+    Client IP address
+
+    X-Forwarded-For is only trusted when REST_FRAMEWORK['NUM_PROXIES'] says
+    how many proxies append to it; otherwise clients could pick their own
+    address to dodge the throttle.
+    """
+    num_proxies = api_settings.NUM_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = forwarded.split(',')
+        return addresses[-min(num_proxies, len(addresses))].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_scopes(address: str) -> List[str]:
+    """Cache scopes for an address: the address itself and its subnet"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return [f'ip:{address}']
+    prefix = (settings.CLIENT_IPV4_SUBNET_PREFIX if ip.version == 4
+              else settings.CLIENT_IPV6_SUBNET_PREFIX)
+    subnet = ipaddress.ip_network(f'{ip}/{prefix}', strict=False)
+    return [f'ip:{ip}', f'net:{subnet}']
+
+
+def _limit(scope: str, ip_rate: str, subnet_rate: str) -> Tuple[int, int]:
+    return parse_rate(ip_rate if scope.startswith('ip:') else subnet_rate)
+
+
+def _hit(key: str, window: int, now: float) -> int:
+    """Count one event in the fixed window containing now; returns the count."""
+    key = f'{CLIENT_CACHE_PREFIX}{key}:{int(now // window)}'
+    if cache.add(key, 1, timeout=window):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, timeout=window)
+        return 1
+
+
+def check_client(request) -> Optional[int]:
+    """
+    Count a request against its client address and subnet
+
+    Returns None if it may proceed, otherwise the seconds to wait. Blocked
+    clients are turned away after a single cache read and are not counted.
+    """
+    now = time.time()
+    scopes = client_scopes(client_address(request))
+    blocks = cache.get_many([f'{CLIENT_CACHE_PREFIX}block:{scope}' for scope in scopes])
+    if blocks:
+        metrics.increment(BLOCKED)
+        return max(1, math.ceil(max(blocks.values()) - now))
+
+    for scope in scopes:
+        count, window = _limit(scope, settings.CLIENT_RATE_LIMIT,
+                               settings.CLIENT_SUBNET_RATE_LIMIT)
+        if _hit(f'requests:{scope}', window, now) > count:
+            metrics.increment(RATE_LIMITED)
+            return max(1, math.ceil(window - now % window))
+    return None
+
+
+def record_auth_failure(request) -> None:
+    """
+    Count a failed API key attempt against the client address and subnet
+
+    A scope that fails too often is blocked, for twice as long each time
+    it is blocked again within CLIENT_MAX_BLOCK_SECONDS.
+    """
+    now = time.time()
+    metrics.increment(AUTH_FAILURES)
+    for scope in client_scopes(client_address(request)):
+        count, window = _limit(scope, settings.CLIENT_AUTH_FAILURE_LIMIT,
+                               settings.CLIENT_SUBNET_AUTH_FAILURE_LIMIT)
+        if _hit(f'failures:{scope}', window, now) != count + 1:
+            continue
+        strikes_key = f'{CLIENT_CACHE_PREFIX}strikes:{scope}'
+        strikes = cache.get(strikes_key, 0) + 1
+        cache.set(strikes_key, strikes, timeout=settings.CLIENT_MAX_BLOCK_SECONDS)
+        duration = min(settings.CLIENT_BLOCK_SECONDS * 2 ** (strikes - 1),
+                       settings.CLIENT_MAX_BLOCK_SECONDS)
+        cache.set(f'{CLIENT_CACHE_PREFIX}block:{scope}', now + duration, timeout=duration)
+        logger.warning(f"Blocked {scope} for {duration}s after repeated invalid API keys")
@@ -0,0 +1,143 @@
+import codecs
+import csv
+import io
+import logging
+from typing import Iterable, Iterator, List, Optional
+from django.http.multipartparser import (
+    FILE, ChunkIter, LazyStream, MultiPartParserError, Parser, exhaust
+)
+from django.utils.http import parse_header_parameters
+from .formats import plain_error
+from .logsinks import write_logs
+from .models import ApiKey
+from .services import validate_and_sample
+from . import usage
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FIELD = 'file'
+READ_CHUNK_SIZE = 64 * 1024
+# Longer lines are rejected rather than buffered
+MAX_LINE_LENGTH = 64 * 1024
+ID_COLUMN = 'national_id'
+ANNOTATION_COLUMNS = ['valid', 'error', 'birth_year', 'birth_date', 'gender', 'governorate']
+
+
+def get_boundary(content_type: str) -> Optional[bytes]:
+    """Multipart boundary from a Content-Type header, or None."""
+    media_type, params = parse_header_parameters(content_type)
+    if media_type != 'multipart/form-data' or not params.get('boundary'):
+        return None
+    return params['boundary'].encode('ascii', 'ignore') or None
+
+
+def iter_multipart_file(stream, boundary: bytes, field_name: str = UPLOAD_FIELD) -> Iterator[bytes]:
+    """
+    Pull the content of one uploaded file out of a multipart body
+
+    Unlike request.FILES, which hands the whole body to upload handlers
+    before the view runs, this reads the request as the caller consumes
+    the returned chunks, so nothing is buffered beyond one read.
+    """
+    parser = Parser(LazyStream(ChunkIter(stream, READ_CHUNK_SIZE)), boundary)
+    for item_type, meta_data, field_stream in parser:
+        _, params = meta_data.get('content-disposition', ('', {}))
+        if item_type == FILE and params.get('name') == field_name.encode():
+            yield from field_stream
+            exhaust(field_stream)
+            return
+        exhaust(field_stream)
+    raise MultiPartParserError(f"No '{field_name}' file in the upload")
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Decode byte chunks into text lines, keeping their line endings."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        # Only split on \n; csv handles \r\n and other characters are data
+        lines = pending.split('\n')
+        pending = lines.pop()
+        if len(pending) > MAX_LINE_LENGTH:
+            raise ValueError(f"CSV line longer than {MAX_LINE_LENGTH} characters")
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _annotations(result) -> List[str]:
+    data = result.data or {}
+    return [
+        'true' if result.is_valid else 'false',
+        plain_error(result.error) if result.error else '',
+        str(data.get('birth_year', '')),
+        data.get('birth_date', ''),
+        data.get('gender', ''),
+        data.get('governorate', ''),
+    ]
+
+
+def annotate_csv(lines: Iterable[str], api_key: ApiKey, chunk_rows: int) -> Iterator[bytes]:
+    """
+    Validate the ID column of CSV rows and yield the annotated CSV
+
+    The ID column is the one headed ``national_id`` if the first row has
+    one (the header is echoed with the annotation columns appended),
+    otherwise the first column. Rows are validated and logged chunk_rows at
+    a time and each chunk is yielded as encoded CSV; blank rows are dropped.
+    """
+    reader = csv.reader(lines)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    column = 0
+    first_row = next(reader, None)
+    rows = []
+    if first_row is not None:
+        header = [cell.strip().lower() for cell in first_row]
+        if ID_COLUMN in header:
+            column = header.index(ID_COLUMN)
+            writer.writerow(first_row + ANNOTATION_COLUMNS)
+        elif first_row:
+            rows.append(first_row)
+
+    def flush(rows):
+        logs = []
+        valid_count = 0
+        for row in rows:
+            national_id = row[column].strip() if column < len(row) else ''
+            result, log_entry = validate_and_sample(national_id, api_key)
+            writer.writerow(row + _annotations(result))
+            valid_count += result.is_valid
+            if log_entry is not None:
+                logs.append(log_entry)
+        if logs:
+            write_logs(logs)
+        usage.record(api_key, valid=valid_count, invalid=len(rows) - valid_count)
+        output = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return output
+
+    for row in reader:
+        if not row:
+            continue
+        rows.append(row)
+        if len(rows) >= chunk_rows:
+            yield flush(rows)
+            rows = []
+    yield flush(rows)
+
+
+def stream_annotated_csv(chunks: Iterable[bytes], api_key: ApiKey,
+                         chunk_rows: int) -> Iterator[bytes]:
+    """annotate_csv over uploaded bytes, logging errors that cut the stream short."""
+    try:
+        yield from annotate_csv(iter_lines(chunks), api_key, chunk_rows)
+    except (MultiPartParserError, ValueError, csv.Error) as e:
+        # The response has started; aborting it is the only way to signal this
+        logger.error(f"CSV upload aborted: {str(e)}")
+        raise
@@ -1,6 +1,18 @@
 from django.urls import path
-from .views import NationalIDView
+from .views import (
+    ApiKeyUsageView, NationalIDBatchView, NationalIDCSVUploadView,
+    NationalIDFastView, NationalIDView, ValidationJobDetailView, ValidationJobListView,
+    ValidationJobResultsView
+)
 
 urlpatterns = [
     path('national-id/', NationalIDView.as_view(), name='national_id'),
+    path('national-id/fast/', NationalIDFastView.as_view(), name='national_id_fast'),
+    path('national-id/batch/', NationalIDBatchView.as_view(), name='national_id_batch'),
+    path('national-id/csv/', NationalIDCSVUploadView.as_view(), name='national_id_csv'),
+    path('jobs/', ValidationJobListView.as_view(), name='validation_jobs'),
+    path('jobs/<uuid:job_id>/', ValidationJobDetailView.as_view(), name='validation_job'),
+    path('jobs/<uuid:job_id>/results/', ValidationJobResultsView.as_view(),
+         name='validation_job_results'),
+    path('usage/', ApiKeyUsageView.as_view(), name='api_key_usage'),
 ]
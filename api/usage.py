@@ -0,0 +1,44 @@
+from typing import Optional
+from django.conf import settings
+from django.utils import timezone
+from .bulk import CounterBuffer
+from .models import ApiKey, ApiKeyUsage
+
+COUNTER_FIELDS = ('requests', 'valid', 'invalid', 'throttled')
+
+
+class ApiKeyCounterBuffer(CounterBuffer):
+    """CounterBuffer for models keyed on api_key_id"""
+
+    def filter_rows(self, rows):
+        # Keys deleted since the request would fail the foreign key
+        existing = set(ApiKey.objects.filter(
+            pk__in={row['api_key_id'] for row in rows}
+        ).order_by().values_list('pk', flat=True))
+        return [row for row in rows if row['api_key_id'] in existing]
+
+
+class UsageBuffer(ApiKeyCounterBuffer):
+    def extra_fields(self):
+        return {'updated_at': timezone.now()}
+
+
+_buffer = UsageBuffer(ApiKeyUsage, ['api_key_id', 'date'], COUNTER_FIELDS,
+                      interval=lambda: settings.USAGE_FLUSH_INTERVAL)
+
+
+def record(api_key: Optional[ApiKey], **counts: int) -> None:
+    """
+    Count usage of an API key, e.g. ``record(key, valid=1)``
+
+    Counts are buffered in this process and written to ApiKeyUsage at most
+    every USAGE_FLUSH_INTERVAL seconds, in one bulk upsert. Long-running
+    processes call flush() on exit so no counts are lost.
+    """
+    if isinstance(api_key, ApiKey):
+        _buffer.add((api_key.pk, timezone.now().date()), **counts)
+
+
+def flush() -> None:
+    """Write this process's buffered usage to the database now."""
+    _buffer.flush()
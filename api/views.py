@@ -1,17 +1,57 @@
+import io
 import logging
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.http.multipartparser import ChunkIter
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import parse_header_parameters
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from .serializers import NationalIDSerializer
+from rest_framework import exceptions, status
+from .serializers import (
+    ApiKeyUsageQuerySerializer, ApiKeyUsageSerializer, NationalIDBatchSerializer,
+    NationalIDSerializer, ValidationJobSerializer, ValidationJobSubmitSerializer
+)
+from . import (
+    hotids, jobs, keyfilter, logsinks, metrics, middleware, profiling, querybudget, throttling,
+    uploads, usage
+)
+from .models import ApiKeyUsage, ValidationJob
 from .authentication import ApiKeyAuthentication
 from .permissions import HasApiKey
 from .throttling import ApiKeyRateThrottle
-from .services import process_validation_request
-from .constants import ResponseMessages
+from .parsers import default_json_parser
+from .renderers import ConstantPayload, default_json_renderer
+from .services import (
+    batch_result, process_validation_batch, process_validation_request, validation_result_payload
+)
+from .constants import INTERNAL_ERROR_MESSAGE, INVALID_REQUEST_MESSAGE, NATIONAL_ID_LENGTH
 
 logger = logging.getLogger(__name__)
 
 
+def invalid_request_payload(errors):
+    """Response body for a request that failed serializer validation."""
+    return {
+        "valid": False,
+        "error": INVALID_REQUEST_MESSAGE,
+        "details": errors
+    }
+
+
+INTERNAL_ERROR_PAYLOAD = ConstantPayload(
+    valid=False,
+    error=INTERNAL_ERROR_MESSAGE
+)
+
+
 class NationalIDView(APIView):
     """API view for national ID validation."""
 
@@ -26,11 +66,8 @@ class NationalIDView(APIView):
             serializer = NationalIDSerializer(data=request.data)
             if not serializer.is_valid():
                 logger.warning(f"Invalid request data: {serializer.errors}")
-                return Response({
-                    "valid": False,
-                    "error": "Invalid request data",
-                    "details": serializer.errors
-                }, status=status.HTTP_400_BAD_REQUEST)
+                return Response(invalid_request_payload(serializer.errors),
+                                status=status.HTTP_400_BAD_REQUEST)
 
             national_id = serializer.validated_data['national_id']
 
@@ -38,22 +75,312 @@ class NationalIDView(APIView):
             result, log_entry = process_validation_request(
                 national_id, request.user)
 
-            if result.is_valid:
-                response_data = {"valid": True,
-                                 "message": ResponseMessages.SUCCESS}
-                if result.data:
-                    response_data.update(result.data)
-                return Response(response_data, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    "valid": False,
-                    "error": result.error or ResponseMessages.VALIDATION_FAILED
-                }, status=status.HTTP_400_BAD_REQUEST)
+            response_data, response_status = validation_result_payload(result)
+            return Response(response_data, status=response_status)
 
         except Exception as e:
             logger.error(
                 f"Unexpected error in NationalIDView: {str(e)}", exc_info=True)
-            return Response({
-                "valid": False,
-                "error": "Internal server error"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response(INTERNAL_ERROR_PAYLOAD,
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class NationalIDBatchView(APIView):
+    """API view for validating several national IDs in one request."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def post(self, request):
+        """Validate each ID separately, reporting one result per ID."""
+        try:
+            serializer = NationalIDBatchSerializer(data=request.data)
+            if not serializer.is_valid():
+                logger.warning(f"Invalid batch request data: {serializer.errors}")
+                return Response(invalid_request_payload(serializer.errors),
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            national_ids = serializer.validated_data['national_ids']
+            results = process_validation_batch(national_ids, request.user)
+            return Response({"results": [batch_result(national_id, result)
+                                         for national_id, result in zip(national_ids, results)]},
+                            status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(
+                f"Unexpected error in NationalIDBatchView: {str(e)}", exc_info=True)
+            return Response(INTERNAL_ERROR_PAYLOAD,
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ValidationJobListView(APIView):
+    """API view for submitting background validation jobs."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def post(self, request):
+        """Store the submitted IDs and queue them for validation."""
+        try:
+            serializer = ValidationJobSubmitSerializer(data=request.data)
+            if not serializer.is_valid():
+                logger.warning(f"Invalid job request data: {serializer.errors}")
+                return Response(invalid_request_payload(serializer.errors),
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            uploaded_file = serializer.validated_data.get('file')
+            national_ids = (jobs.read_uploaded_ids(uploaded_file) if uploaded_file
+                            else serializer.validated_data['national_ids'])
+            job = ValidationJob(api_key=request.user,
+                                chunk_size=settings.JOB_CHUNK_SIZE)
+            job.total = jobs.write_input(job, national_ids)
+            if not job.total:
+                jobs.remove_job_files(job)
+                return Response(
+                    invalid_request_payload({"file": ["No national IDs were submitted."]}),
+                    status=status.HTTP_400_BAD_REQUEST)
+            job.save()
+            logger.info(f"Validation job {job.pk} submitted with {job.total} IDs")
+
+            jobs.enqueue(job.pk)
+            job.refresh_from_db()
+            return Response(ValidationJobSerializer(job).data,
+                            status=status.HTTP_202_ACCEPTED,
+                            headers={'Location': reverse('validation_job', args=[job.pk])})
+
+        except Exception as e:
+            logger.error(
+                f"Unexpected error in ValidationJobListView: {str(e)}", exc_info=True)
+            return Response(INTERNAL_ERROR_PAYLOAD,
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ValidationJobDetailView(APIView):
+    """API view for polling a validation job's progress."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ValidationJob, pk=job_id, api_key=request.user)
+        return Response(ValidationJobSerializer(job).data)
+
+
+class ValidationJobResultsView(APIView):
+    """API view streaming a job's results as JSON lines, one per ID."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The stream is always JSON lines, whatever the client accepts
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, job_id):
+        """Stream the chunks committed so far; complete once the job is."""
+        job = get_object_or_404(ValidationJob, pk=job_id, api_key=request.user)
+        response = StreamingHttpResponse(jobs.iter_results(job),
+                                         content_type='application/x-ndjson')
+        response['X-Job-Status'] = job.status
+        response['X-Job-Processed'] = str(job.processed)
+        return response
+
+
+class ApiKeyUsageView(APIView):
+    """API view reporting the calling key's daily usage."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def get(self, request):
+        """Daily counters and their totals, optionally between start and end."""
+        query = ApiKeyUsageQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(invalid_request_payload(query.errors),
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        days = ApiKeyUsage.objects.filter(api_key=request.user)
+        if 'start' in query.validated_data:
+            days = days.filter(date__gte=query.validated_data['start'])
+        if 'end' in query.validated_data:
+            days = days.filter(date__lte=query.validated_data['end'])
+        totals = days.aggregate(**{field: Sum(field) for field in usage.COUNTER_FIELDS})
+        return Response({
+            "totals": {field: value or 0 for field, value in totals.items()},
+            "days": ApiKeyUsageSerializer(days, many=True).data,
+        })
+
+
+class NationalIDCSVUploadView(APIView):
+    """API view validating an uploaded CSV and streaming it back annotated."""
+
+    authentication_classes = [ApiKeyAuthentication]
+    permission_classes = [HasApiKey]
+    throttle_classes = [ApiKeyRateThrottle]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The response is always CSV, whatever the client accepts
+        return super().perform_content_negotiation(request, force=True)
+
+    def post(self, request):
+        """
+        Accept a multipart ``file`` field or a raw text/csv body
+
+        The body is never read through request.data/FILES: rows are parsed,
+        validated and logged while the response streams, so memory use does
+        not grow with the upload.
+        """
+        media_type, _ = parse_header_parameters(request.content_type)
+        boundary = uploads.get_boundary(request.content_type)
+        if not boundary and media_type != 'text/csv':
+            raise exceptions.UnsupportedMediaType(media_type)
+        if request.stream is None:
+            return Response(invalid_request_payload(
+                {"file": ["No CSV data was uploaded."]}),
+                status=status.HTTP_400_BAD_REQUEST)
+
+        chunks = (uploads.iter_multipart_file(request.stream, boundary) if boundary
+                  else ChunkIter(request.stream, uploads.READ_CHUNK_SIZE))
+        response = StreamingHttpResponse(
+            uploads.stream_annotated_csv(chunks, request.user,
+                                         settings.CSV_UPLOAD_CHUNK_ROWS),
+            content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="validated.csv"'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class NationalIDFastView(View):
+    """
+    Plain Django view for single-ID validation.
+
+    Serves JSON POSTs without DRF's request wrapping, negotiation, parser
+    selection, serializer fields or Response rendering, while reusing the
+    same authentication, throttle, validation/logging service and renderer
+    so the response bytes match NationalIDView. Anything else (other
+    methods, content types, Accept headers or format overrides) is handed
+    to NationalIDView unchanged.
+    """
+
+    fallback_view = staticmethod(NationalIDView.as_view())
+    allowed_methods = ', '.join(NationalIDView().allowed_methods)
+    authentication = ApiKeyAuthentication()
+    permission = HasApiKey()
+    parser = default_json_parser()
+    renderer = default_json_renderer()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self._is_fast_path(request):
+            return self.fallback_view(request, *args, **kwargs)
+        try:
+            return self.handle(request)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+        except Exception as e:
+            logger.error(
+                f"Unexpected error in NationalIDFastView: {str(e)}", exc_info=True)
+            return self.render(INTERNAL_ERROR_PAYLOAD,
+                               status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _is_fast_path(request):
+        return (request.method == 'POST' and
+                request.content_type == 'application/json' and
+                request.headers.get('Accept', '*/*') in ('*/*', 'application/json') and
+                'format' not in request.GET)
+
+    def handle(self, request):
+        """Authenticate, throttle, parse and validate one national ID."""
+        auth_result = self.authentication.authenticate(request)
+        if auth_result is None:
+            raise exceptions.NotAuthenticated()
+        request.user = auth_result[0]
+        if not self.permission.has_permission(request, self):
+            raise exceptions.PermissionDenied()
+
+        throttle = ApiKeyRateThrottle()
+        if not throttle.allow_request(request, self):
+            raise exceptions.Throttled(throttle.wait())
+
+        try:
+            data = self._parse(request)
+        except exceptions.ParseError as e:
+            # NationalIDView reads request.data inside its catch-all handler,
+            # so malformed JSON is reported as an internal error there too
+            logger.error(
+                f"Unexpected error in NationalIDFastView: {str(e)}", exc_info=True)
+            return self.render(INTERNAL_ERROR_PAYLOAD,
+                               status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        national_id = data.get('national_id') if isinstance(data, dict) else None
+        if isinstance(national_id, str):
+            national_id = national_id.strip()
+        if not (isinstance(national_id, str) and
+                len(national_id) == NATIONAL_ID_LENGTH and national_id.isdigit()):
+            # Malformed input is rare; let the serializer produce the exact errors
+            serializer = NationalIDSerializer(data=data)
+            if not serializer.is_valid():
+                logger.warning(f"Invalid request data: {serializer.errors}")
+                return self.render(invalid_request_payload(serializer.errors),
+                                   status.HTTP_400_BAD_REQUEST)
+            national_id = serializer.validated_data['national_id']
+
+        result, log_entry = process_validation_request(national_id, request.user)
+        return self.render(*validation_result_payload(result))
+
+    def _parse(self, request):
+        # DRF treats an empty body as empty data rather than a parse error
+        if not request.body:
+            return {}
+        return self.parser.parse(io.BytesIO(request.body), 'application/json',
+                                 {'encoding': request.encoding or settings.DEFAULT_CHARSET})
+
+    def render(self, data, status_code, headers=None):
+        response = HttpResponse(self.renderer.render(data), status=status_code,
+                                content_type=self.renderer.media_type)
+        response['Allow'] = self.allowed_methods
+        patch_vary_headers(response, ['Accept'])
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    def error_response(self, exc):
+        """Render an API exception the way DRF's exception handler does."""
+        headers = {}
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = '%d' % exc.wait
+        status_code = exc.status_code
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # ApiKeyAuthentication sends no WWW-Authenticate header, so DRF
+            # coerces these to 403
+            status_code = status.HTTP_403_FORBIDDEN
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.render(data, status_code, headers)
+
+
+METRIC_NAMES = (keyfilter.METRIC_NAMES + throttling.METRIC_NAMES +
+                logsinks.METRIC_NAMES + middleware.METRIC_NAMES + profiling.METRIC_NAMES +
+                querybudget.METRIC_NAMES)
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class MetricsView(View):
+    """
+    Operational counters and the most validated national IDs, for staff
+
+    Uses the admin session rather than API keys, since the hot ID list
+    contains other clients' national IDs.
+    """
+
+    def get(self, request):
+        return JsonResponse({
+            "counters": metrics.get_counts(METRIC_NAMES),
+            "hot_ids": [{"national_id": national_id, "count": count}
+                        for national_id, count in hotids.hot_ids.top()],
+            "hot_id_window_seconds": settings.HOT_ID_WINDOW,
+        })
@@ -0,0 +1,162 @@
+import io
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver, reverse
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Valid ID pushed through the validator, serializers and renderer
+SAMPLE_NATIONAL_ID = '30307020102113'
+
+
+def prepare() -> Dict[str, float]:
+    """
+    Build the lazily created in-memory state of the API without I/O
+
+    Run from ApiConfig.ready(), so under ``gunicorn --preload`` it happens
+    once in the master and forked workers share the result copy-on-write.
+    Imports the views and serializers, reads DRF's settings and runs a
+    sample ID through the validator, serializers, cipher and renderer.
+    """
+    timings = {}
+    try:
+        _prepare(timings)
+    except Exception as e:
+        logger.warning(f"Warm-up preparation failed: {str(e)}")
+    logger.debug(f"Prepared in {sum(timings.values()):.1f} ms: {timings}")
+    return timings
+
+
+def _prepare(timings):
+    with _step(timings, 'imports'):
+        from . import views  # noqa: F401
+        from rest_framework.settings import api_settings
+        for name in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+                     'DEFAULT_CONTENT_NEGOTIATION_CLASS', 'EXCEPTION_HANDLER',
+                     'UNAUTHENTICATED_USER'):
+            getattr(api_settings, name)
+    with _step(timings, 'validation'):
+        from .serializers import NationalIDBatchSerializer, NationalIDSerializer
+        from .services import validate_national_id, validation_result_payload
+        NationalIDSerializer(data={'national_id': SAMPLE_NATIONAL_ID}).is_valid()
+        NationalIDBatchSerializer(data={'national_ids': [SAMPLE_NATIONAL_ID]}).is_valid()
+        payload, _ = validation_result_payload(validate_national_id(SAMPLE_NATIONAL_ID))
+    with _step(timings, 'rendering'):
+        from .parsers import default_json_parser
+        from .renderers import default_json_renderer
+        default_json_renderer().render(payload)
+        default_json_parser()
+    with _step(timings, 'encryption'):
+        from .encryption import get_keyring
+        get_keyring()
+
+
+def warm_up(application) -> Dict[str, float]:
+    """
+    Finish warming a loaded WSGI application before it serves traffic
+
+    Called from wsgi.py after prepare() has run. Resolves the URLconf,
+    builds the API key filter from the database and sends a request
+    without an API key through the whole middleware and view stack.
+    Database and cache connections are closed afterwards so forked workers
+    open their own.
+    """
+    timings = {}
+    start = time.perf_counter()
+    try:
+        with _step(timings, 'urls'):
+            get_resolver()._populate()
+            path = reverse('national_id')
+        with _step(timings, 'key_filter'):
+            if settings.API_KEY_FILTER_ENABLED:
+                from .keyfilter import key_filter
+                key_filter.warm()
+        if settings.WARMUP_REQUEST_ENABLED:
+            # The request is refused for lacking an API key; not worth a warning
+            request_logger = logging.getLogger('django.request')
+            level = request_logger.level
+            request_logger.setLevel(logging.ERROR)
+            try:
+                with _step(timings, 'request'):
+                    status = wsgi_request(application, 'POST', path,
+                                          json.dumps({'national_id': SAMPLE_NATIONAL_ID}).encode())
+            finally:
+                request_logger.setLevel(level)
+            if not status.startswith('4'):
+                logger.warning(f"Warm-up request to {path} returned {status}")
+    except Exception as e:
+        # Workers still start cold rather than not at all
+        logger.warning(f"Warm-up failed: {str(e)}")
+    finally:
+        connections.close_all()
+        caches.close_all()
+    timings['total'] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Warm-up finished in {timings['total']} ms "
+                f"({', '.join(f'{name}={ms} ms' for name, ms in timings.items() if name != 'total')}), "
+                f"max RSS {max_rss_mb()} MB")
+    return timings
+
+
+def wsgi_request(application, method: str, path: str, body: bytes = b'',
+                 headers: Optional[Dict[str, str]] = None) -> str:
+    """Call a WSGI application as a server would; returns the status line."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'SERVER_NAME': hosts[0] if hosts else 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    statuses = []
+
+    def start_response(status, response_headers, exc_info=None):
+        statuses.append(status)
+
+    response = application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return statuses[0]
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process, where the platform reports it"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+@contextmanager
+def _step(timings, name):
+    """Record how long the block took, in milliseconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
@@ -11,6 +11,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv(
     'SECRET_KEY', 'django-insecure-e-e*0y@8*ly!ri14%r1^sn@qernk-6#e!k2h-3i(wvp9njlv-5')
 
+# Fernet key encrypting stored API keys; keys it replaced stay readable in the
+# comma-separated ENCRYPTION_KEYS_PREVIOUS until rotate_encryption_key has run.
+# Unset, a key derived from SECRET_KEY is used.
+ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
+ENCRYPTION_KEYS_PREVIOUS = [
+    key.strip() for key in os.getenv('ENCRYPTION_KEYS_PREVIOUS', '').split(',') if key.strip()
+]
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
@@ -31,6 +39,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
+    'api.middleware.LoadSheddingMiddleware',
+    'api.middleware.ClientThrottleMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,13 +73,76 @@ WSGI_APPLICATION = 'id_validator.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_PROFILE=production keeps connections open between requests and tunes
+# SQLite for a read-heavy workload; with PostgreSQL it uses a psycopg pool.
+DB_PROFILE = os.getenv('DB_PROFILE', 'default')
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+
+# WAL lets readers proceed while a log INSERT holds the write lock, and
+# IMMEDIATE transactions wait on busy_timeout instead of failing on upgrade
+SQLITE_PRAGMAS = [
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    f"busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+]
+if DB_PROFILE == 'production':
+    SQLITE_PRAGMAS += [
+        f"mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        # Negative values are KiB rather than pages
+        f"cache_size={int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))}",
+        'temp_store=MEMORY',
+    ]
+
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(f'PRAGMA {pragma}' for pragma in SQLITE_PRAGMAS),
+    'transaction_mode': 'IMMEDIATE',
 }
 
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'id_validator'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', ''),
+        }
+    }
+    if DB_PROFILE == 'production':
+        # Pooled connections replace CONN_MAX_AGE (requires psycopg[pool])
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+            },
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': SQLITE_OPTIONS,
+        }
+    }
+    if DB_PROFILE == 'production':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+        })
+
+# Optional dedicated database for validation logs, see api.routers.LogRouter
+LOG_DATABASE_ALIAS = 'logs'
+LOG_DATABASE_NAME = os.getenv('LOG_DATABASE_NAME')
+if LOG_DATABASE_NAME:
+    DATABASES[LOG_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': LOG_DATABASE_NAME,
+    }
+
+DATABASE_ROUTERS = ['api.routers.LogRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,6 +180,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],
     'DEFAULT_PERMISSION_CLASSES': [],
+    # Same output as DRF's JSON classes; faster when orjson is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        # Opt-in compact formats, selected with Accept or ?format=
+        'api.renderers.CompactJSONRenderer',
+        'api.renderers.BinaryRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'api.throttling.ApiKeyRateThrottle',
     ],
@@ -112,3 +200,172 @@ REST_FRAMEWORK = {
         'api_key': os.getenv('DEFAULT_RATE_LIMIT', '100/minute'),
     }
 }
+
+# Per-key rate limit of DEFAULT_THROTTLE_RATES['api_key']; off only for
+# benchmarks and profiling (benchmark_api/profile_memory --no-throttle)
+API_KEY_THROTTLE_ENABLED = os.getenv('API_KEY_THROTTLE_ENABLED', 'True').lower() == 'true'
+
+# Maximum number of IDs in one batch request
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', '100'))
+
+# Pre-authentication throttling by client address and subnet, using fixed
+# window counters in the cache (share it between processes in production).
+# X-Forwarded-For is only used when REST_FRAMEWORK['NUM_PROXIES'] is set.
+CLIENT_THROTTLE_ENABLED = os.getenv('CLIENT_THROTTLE_ENABLED', 'True').lower() == 'true'
+CLIENT_THROTTLE_PATH_PREFIX = os.getenv('CLIENT_THROTTLE_PATH_PREFIX', '/api/')
+CLIENT_RATE_LIMIT = os.getenv('CLIENT_RATE_LIMIT', '600/minute')
+CLIENT_SUBNET_RATE_LIMIT = os.getenv('CLIENT_SUBNET_RATE_LIMIT', '3000/minute')
+CLIENT_IPV4_SUBNET_PREFIX = int(os.getenv('CLIENT_IPV4_SUBNET_PREFIX', '24'))
+CLIENT_IPV6_SUBNET_PREFIX = int(os.getenv('CLIENT_IPV6_SUBNET_PREFIX', '64'))
+# Invalid API keys beyond these rates block the address or subnet for
+# CLIENT_BLOCK_SECONDS, doubling on each repeat up to CLIENT_MAX_BLOCK_SECONDS
+CLIENT_AUTH_FAILURE_LIMIT = os.getenv('CLIENT_AUTH_FAILURE_LIMIT', '20/minute')
+CLIENT_SUBNET_AUTH_FAILURE_LIMIT = os.getenv('CLIENT_SUBNET_AUTH_FAILURE_LIMIT', '100/minute')
+CLIENT_BLOCK_SECONDS = int(os.getenv('CLIENT_BLOCK_SECONDS', '60'))
+CLIENT_MAX_BLOCK_SECONDS = int(os.getenv('CLIENT_MAX_BLOCK_SECONDS', '86400'))
+
+# Filter of active API key hashes used to reject unknown keys without a query.
+# Shared between processes through CACHES['default'] and only trusted with a
+# shared cache backend (Redis, Memcached). With the default per-process cache,
+# keys created in another process are missing from the filter until
+# API_KEY_FILTER_MAX_AGE, so filter misses are checked against the database.
+API_KEY_FILTER_ENABLED = os.getenv('API_KEY_FILTER_ENABLED', 'True').lower() == 'true'
+API_KEY_FILTER_ERROR_RATE = float(os.getenv('API_KEY_FILTER_ERROR_RATE', '0.001'))
+# Seconds between checks for key changes, and before a forced rebuild
+API_KEY_FILTER_CHECK_INTERVAL = float(os.getenv('API_KEY_FILTER_CHECK_INTERVAL', '1'))
+API_KEY_FILTER_MAX_AGE = int(os.getenv('API_KEY_FILTER_MAX_AGE', '60'))
+# Hashes that passed the filter but matched no active key, remembered per process
+API_KEY_NEGATIVE_CACHE_SIZE = int(os.getenv('API_KEY_NEGATIVE_CACHE_SIZE', '10000'))
+
+# Seconds API key usage counts are buffered per process before being
+# written to ApiKeyUsage
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '10'))
+
+# Hot national IDs: a per-process count-min sketch of HOT_ID_SKETCH_DEPTH rows
+# of HOT_ID_SKETCH_WIDTH counters per HOT_ID_WINDOW seconds, shared through the
+# cache every HOT_ID_PUBLISH_INTERVAL seconds. An ID is hot once validated
+# HOT_ID_THRESHOLD times in a window; the HOT_ID_TOP_K most validated are listed
+HOT_ID_ENABLED = os.getenv('HOT_ID_ENABLED', 'True').lower() == 'true'
+HOT_ID_SKETCH_WIDTH = int(os.getenv('HOT_ID_SKETCH_WIDTH', '2048'))
+HOT_ID_SKETCH_DEPTH = int(os.getenv('HOT_ID_SKETCH_DEPTH', '4'))
+HOT_ID_WINDOW = int(os.getenv('HOT_ID_WINDOW', '300'))
+HOT_ID_PUBLISH_INTERVAL = float(os.getenv('HOT_ID_PUBLISH_INTERVAL', '5'))
+HOT_ID_THRESHOLD = int(os.getenv('HOT_ID_THRESHOLD', '100'))
+HOT_ID_TOP_K = int(os.getenv('HOT_ID_TOP_K', '50'))
+
+# Keep one NationalIDStats row per national ID and API key (first and last
+# seen, count, last outcome), upserted from per-process counters every
+# NATIONAL_ID_STATS_FLUSH_INTERVAL seconds
+NATIONAL_ID_STATS_ENABLED = os.getenv('NATIONAL_ID_STATS_ENABLED', 'False').lower() == 'true'
+NATIONAL_ID_STATS_FLUSH_INTERVAL = float(os.getenv('NATIONAL_ID_STATS_FLUSH_INTERVAL', '10'))
+
+# Rows validated and logged per bulk insert in CSV uploads
+CSV_UPLOAD_CHUNK_ROWS = int(os.getenv('CSV_UPLOAD_CHUNK_ROWS', '1000'))
+
+# Where validation logs go: comma-separated sink names (database, jsonl,
+# null) or dotted paths to LogSink factories; several sinks fan out
+LOG_SINK = os.getenv('LOG_SINK', 'database')
+# jsonl sink: per-process files rotated by size or age for import_logs
+LOG_SINK_DIR = os.getenv('LOG_SINK_DIR', str(BASE_DIR / 'log_spool'))
+LOG_SINK_MAX_BYTES = int(os.getenv('LOG_SINK_MAX_BYTES', str(64 * 1024 * 1024)))
+LOG_SINK_MAX_AGE = int(os.getenv('LOG_SINK_MAX_AGE', '3600'))
+# always, interval (on every buffer flush) or never
+LOG_SINK_FSYNC = os.getenv('LOG_SINK_FSYNC', 'interval')
+LOG_SINK_FLUSH_INTERVAL = float(os.getenv('LOG_SINK_FLUSH_INTERVAL', '1'))
+LOG_SINK_BUFFER_ROWS = int(os.getenv('LOG_SINK_BUFFER_ROWS', '1000'))
+# Circuit breaker around the log sink: opens for LOG_BREAKER_OPEN_SECONDS once
+# LOG_BREAKER_FAILURE_RATE of the last LOG_BREAKER_WINDOW writes (at least
+# LOG_BREAKER_MIN_CALLS) failed or took LOG_BREAKER_SLOW_CALL_SECONDS or more
+LOG_BREAKER_ENABLED = os.getenv('LOG_BREAKER_ENABLED', 'True').lower() == 'true'
+LOG_BREAKER_WINDOW = int(os.getenv('LOG_BREAKER_WINDOW', '20'))
+LOG_BREAKER_MIN_CALLS = int(os.getenv('LOG_BREAKER_MIN_CALLS', '5'))
+LOG_BREAKER_FAILURE_RATE = float(os.getenv('LOG_BREAKER_FAILURE_RATE', '0.5'))
+LOG_BREAKER_SLOW_CALL_SECONDS = float(os.getenv('LOG_BREAKER_SLOW_CALL_SECONDS', '0.5'))
+LOG_BREAKER_OPEN_SECONDS = float(os.getenv('LOG_BREAKER_OPEN_SECONDS', '30'))
+# Entries that could not be written are spilled here and replayed into the
+# sink once it recovers; a background thread retries replaying spill files
+# (from any process) every LOG_SPILL_REPLAY_INTERVAL seconds
+LOG_SPILL_DIR = os.getenv('LOG_SPILL_DIR', str(BASE_DIR / 'log_spill'))
+LOG_SPILL_REPLAY_INTERVAL = float(os.getenv('LOG_SPILL_REPLAY_INTERVAL', '30'))
+
+# Load shedding: API requests get 503 while this many are in flight in the
+# process or this many log entries wait to be persisted; Retry-After starts
+# at LOAD_SHED_RETRY_AFTER seconds and grows with the overload
+LOAD_SHED_ENABLED = os.getenv('LOAD_SHED_ENABLED', 'True').lower() == 'true'
+LOAD_SHED_PATH_PREFIX = os.getenv('LOAD_SHED_PATH_PREFIX', '/api/')
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT', '64'))
+LOAD_SHED_MAX_LOG_QUEUE = int(os.getenv('LOAD_SHED_MAX_LOG_QUEUE', '10000'))
+LOAD_SHED_RETRY_AFTER = int(os.getenv('LOAD_SHED_RETRY_AFTER', '5'))
+
+# Profile API requests under cProfile: those with an X-Profile-Token issued
+# from the admin (valid for PROFILE_TOKEN_MAX_AGE seconds) and a random
+# PROFILE_SAMPLE_RATE of the rest. The newest PROFILE_MAX_FILES profiles are
+# kept in PROFILE_DIR, which API and admin workers must share.
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'False').lower() == 'true'
+PROFILE_PATH_PREFIX = os.getenv('PROFILE_PATH_PREFIX', '/api/')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', '3600'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(BASE_DIR / 'profiles'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '100'))
+
+# Server-Timing header with query count and time on API responses. Requests
+# running more queries than their endpoint's budget (by URL name, e.g.
+# QUERY_BUDGETS=national_id=2,national_id_batch=3) fail when enforced and
+# are logged otherwise.
+QUERY_TIMING_ENABLED = os.getenv('QUERY_TIMING_ENABLED', 'True').lower() == 'true'
+QUERY_TIMING_PATH_PREFIX = os.getenv('QUERY_TIMING_PATH_PREFIX', '/api/')
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', str(DEBUG)).lower() == 'true'
+QUERY_BUDGETS = {
+    # API key lookup and one log INSERT
+    'national_id': 2,
+    'national_id_fast': 2,
+    'national_id_batch': 2,
+    'api_key_usage': 3,
+    **{
+        name.strip(): int(budget)
+        for name, budget in (
+            item.split('=') for item in os.getenv('QUERY_BUDGETS', '').split(',') if item.strip()
+        )
+    },
+}
+
+# Build lazily created state (views, serializers, DRF settings, cipher, URL
+# resolver, API key filter) at startup and send one request without an API
+# key through the stack, so the first real requests are not slow. With
+# gunicorn --preload this happens before workers fork.
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'True').lower() == 'true'
+WARMUP_REQUEST_ENABLED = os.getenv('WARMUP_REQUEST_ENABLED', 'True').lower() == 'true'
+
+# Fraction of results logged per outcome: 'valid', 'invalid' (all errors) or a
+# lowercase error code name such as 'invalid_century', e.g.
+# LOG_SAMPLE_RATES=valid=0.05,invalid=1. Unlisted outcomes are always logged;
+# ApiKey.log_sample_rate overrides the rate of valid results per key.
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.split('=') for item in os.getenv('LOG_SAMPLE_RATES', '').split(',') if item.strip()
+    )
+}
+# Changing the salt changes which IDs fall in the sample
+LOG_SAMPLE_SALT = os.getenv('LOG_SAMPLE_SALT', '')
+
+# Monthly log partitions, created by `partition_logs --convert`. Set to True
+# once converted so SQLite hands out log ids itself; partition_logs keeps
+# LOG_PARTITION_MONTHS_AHEAD months ready and drops partitions older than
+# LOG_PARTITION_RETENTION_MONTHS (0 keeps everything)
+LOG_PARTITIONING = os.getenv('LOG_PARTITIONING', 'False').lower() == 'true'
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv('LOG_PARTITION_MONTHS_AHEAD', '2'))
+LOG_PARTITION_RETENTION_MONTHS = int(os.getenv('LOG_PARTITION_RETENTION_MONTHS', '0'))
+
+# Log archival
+LOG_ARCHIVE_DIR = os.getenv('LOG_ARCHIVE_DIR', str(BASE_DIR / 'log_archive'))
+LOG_ARCHIVE_COMPRESSION = os.getenv('LOG_ARCHIVE_COMPRESSION', 'gzip')
+LOG_ARCHIVE_AFTER_DAYS = int(os.getenv('LOG_ARCHIVE_AFTER_DAYS', '90'))
+
+# Background validation jobs
+JOB_DIR = os.getenv('JOB_DIR', str(BASE_DIR / 'jobs'))
+# Worker threads per process; 0 processes jobs inline in the submitting request
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', '10000'))
+# Seconds without progress after which a running job is taken over
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '300'))
@@ -0,0 +1,50 @@
+"""
+Settings for API-only worker nodes
+
+Serves /api/v1/ with API key authentication only: no admin, sessions,
+messages or templates in the app and middleware stacks. Run the admin on
+separate workers with the default ``id_validator.settings`` module.
+
+    DJANGO_SETTINGS_MODULE=id_validator.settings_api gunicorn id_validator.wsgi
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in (
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+# Only needed by the admin's session logins and HTML pages; new middleware
+# in the base settings runs on API workers too unless listed here
+ADMIN_ONLY_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+MIDDLEWARE = [m for m in MIDDLEWARE if m not in ADMIN_ONLY_MIDDLEWARE]
+
+ROOT_URLCONF = 'id_validator.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.CompactJSONRenderer',
+        'api.renderers.BinaryRenderer',
+    ],
+    # request.user is the ApiKey or None; never load django.contrib.auth
+    'UNAUTHENTICATED_USER': None,
+}
@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
+from api.views import MetricsView
 
 
 def home(request):
@@ -12,5 +13,7 @@ def home(request):
 urlpatterns = [
     path('', home, name='home'),
     path('admin/', admin.site.urls),
+    # Needs the admin session, so not part of api.urls served by API nodes
+    path('api/v1/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/v1/', include('api.urls')),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
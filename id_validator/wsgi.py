@@ -7,6 +7,8 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
+import atexit
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +16,23 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'id_validator.settings')
 
 application = get_wsgi_application()
+
+# Write buffered API key usage, log entries, sampling counts and ID stats
+# when the worker exits
+from api import idstats, logsinks, sampling, usage  # noqa: E402
+
+atexit.register(usage.flush)
+atexit.register(sampling.flush)
+atexit.register(idstats.flush)
+atexit.register(logsinks.close_log_sink)
+
+# Finish warming up before serving; with gunicorn --preload this runs once in
+# the master and workers share the result. gc.freeze() keeps the collector
+# from touching (and so copying) the shared objects in every worker.
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ENABLED:
+    from api import warmup  # noqa: E402
+
+    warmup.warm_up(application)
+    gc.freeze()